@@ -1,8 +1,8 @@
 import os
+import asyncio
 import traceback
 from telegram import Update
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes
-from google.cloud import dialogflow_v2 as dialogflow
 
 from dotenv import load_dotenv
 load_dotenv()
@@ -12,27 +12,50 @@ TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 DIALOGFLOW_PROJECT_ID = os.getenv("DIALOGFLOW_PROJECT_ID")
 GOOGLE_APPLICATION_CREDENTIALS = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")  # Path al JSON de credenciales
 
-import tempfile
-from helpers.utils import speech_to_text, text_to_speech
+from helpers.utils import (
+    STTBusyError,
+    TTS_STREAMING,
+    speech_to_text_async,
+    text_to_speech,
+    text_to_speech_stream,
+    warm_up_stt,
+)
+from helpers.dialogflow_client import DialogflowClient
 
 # ============== CLIENTE DIALOGFLOW ==============
-session_client = dialogflow.SessionsClient()
+# Async, con timeout por llamada y concurrencia acotada (ver helpers/dialogflow_client.py)
+dialogflow_client = DialogflowClient(project_id=DIALOGFLOW_PROJECT_ID)
 
 
-def detect_intent_text(project_id: str, session_id: str, text: str, language_code: str = "es"):
+async def detect_intent_text(session_id: str, text: str, language_code: str = "es"):
     """
     Envía texto a Dialogflow y obtiene la respuesta.
     """
-    session = session_client.session_path(project_id, session_id)
-    
-    text_input = dialogflow.TextInput(text=text, language_code=language_code)
-    query_input = dialogflow.QueryInput(text=text_input)
-    
-    response = session_client.detect_intent(
-        request={"session": session, "query_input": query_input}
-    )
-    
-    return response.query_result
+    return await dialogflow_client.detect_intent_text(session_id, text, language_code=language_code)
+
+
+async def reply_voice_streamed(message, text: str):
+    """
+    Envía la respuesta como varias notas de voz, una por frase.
+    La primera sale en cuanto está sintetizada; mientras se envía, la siguiente
+    frase ya se está sintetizando en segundo plano.
+    """
+    segments = text_to_speech_stream(text)
+    next_audio = asyncio.create_task(asyncio.to_thread(next, segments, None))
+    first = True
+    try:
+        while True:
+            audio = await next_audio
+            if audio is None:
+                break
+            next_audio = asyncio.create_task(asyncio.to_thread(next, segments, None))
+            await message.reply_voice(voice=audio, caption="Respuesta en audio" if first else None)
+            first = False
+    finally:
+        # Si falla un envío (o se cancela el handler) la frase que se estaba sintetizando
+        # se descarta: se cancela la tarea y se recoge su resultado para que no quede suelta
+        next_audio.cancel()
+        await asyncio.gather(next_audio, return_exceptions=True)
 
 
 # ============== HANDLERS DE TELEGRAM ==============
@@ -60,8 +83,7 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         print(f"[TEXT] Usuario {user_id}: {user_text}")
         
         # Enviar a Dialogflow
-        query_result = detect_intent_text(
-            project_id=DIALOGFLOW_PROJECT_ID,
+        query_result = await detect_intent_text(
             session_id=str(user_id),
             text=user_text
         )
@@ -77,6 +99,11 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Enviar respuesta al usuario
         await update.message.reply_text(response_text)
         
+    except asyncio.TimeoutError:
+        print(f"[DF] Timeout consultando Dialogflow para el usuario {user_id}")
+        await update.message.reply_text(
+            "El servicio está tardando más de lo normal. Inténtalo de nuevo en unos segundos."
+        )
     except Exception as e:
         print(f"Error en handle_text: {e}")
         await update.message.reply_text(
@@ -104,24 +131,12 @@ async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # 2. Convertir audio a texto (STT)
         await update.message.chat.send_action(action="typing")
         
-        # Guardar en archivo temporal con contexto para asegurar que se cierra
-        # Crear carpeta si no existe
-        audio_dir = os.path.join(os.path.dirname(__file__), "audios")
-        os.makedirs(audio_dir, exist_ok=True)
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".ogg", dir=audio_dir)
-        temp_file.write(bytes(audio_bytes))
-        temp_file.close()
-        temp_audio_path = os.path.join(audio_dir, temp_file.name)
-        print("Guardando archivo temporal en:", temp_audio_path)
-
+        # El audio se decodifica en memoria dentro del worker de STT (sin ficheros temporales)
         try:
-            user_text = speech_to_text(temp_audio_path)
-        finally:
-            # Limpiar archivo temporal
-            try:
-                os.unlink(temp_audio_path)
-            except Exception as cleanup_error:
-                print(f"⚠️ No se pudo eliminar archivo temporal: {cleanup_error}")
+            user_text = await speech_to_text_async(bytes(audio_bytes))
+        except STTBusyError:
+            await update.message.reply_text("Ahora mismo estoy procesando muchos audios. Inténtalo de nuevo en unos segundos. 🎤")
+            return
         
         if not user_text:
             await update.message.reply_text("No he podido entender el audio. Intenta de nuevo. 🎤")
@@ -130,8 +145,7 @@ async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
         print(f"[STT] Usuario {user_id}: {user_text}")
         
         # 3. Enviar texto a Dialogflow
-        query_result = detect_intent_text(
-            project_id=DIALOGFLOW_PROJECT_ID,
+        query_result = await detect_intent_text(
             session_id=str(user_id),
             text=user_text
         )
@@ -143,27 +157,26 @@ async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not response_text:
             response_text = "Lo siento, no he entendido tu consulta."
 
-        # 4. Enviar respuesta en audio (TTS)
+        # 4. Enviar respuesta en audio (TTS), sin pasar por disco
         await update.message.chat.send_action(action="upload_audio")
         try:
-            text_to_speech(response_text)
-            audio_path = os.path.join(audio_dir, "test.wav")
-            with open(audio_path, "rb") as audio_file:
+            if TTS_STREAMING:
+                await reply_voice_streamed(update.message, response_text)
+            else:
+                reply_audio = await asyncio.to_thread(text_to_speech, response_text)
                 await update.message.reply_voice(
-                    voice=audio_file,
+                    voice=reply_audio,
                     caption="Respuesta en audio"
                 )
         except Exception as tts_error:
             print(f"Error generando o enviando audio: {tts_error}")
             await update.message.reply_text("No se pudo generar la respuesta en audio.")
-        finally:
-            # Intentar borrar el archivo de audio generado
-            try:
-                if os.path.exists(audio_path):
-                    os.remove(audio_path)
-            except Exception as audio_rm_error:
-                print(f"⚠️ No se pudo eliminar test.wav: {audio_rm_error}")
 
+    except asyncio.TimeoutError:
+        print(f"[DF] Timeout consultando Dialogflow para el usuario {user_id}")
+        await update.message.reply_text(
+            "El servicio está tardando más de lo normal. Inténtalo de nuevo en unos segundos."
+        )
     except Exception as e:
         print(f"Error en handle_voice: {e}")
         traceback.print_exc()
@@ -185,6 +198,9 @@ def main():
     application.add_handler(CommandHandler("start", start))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
     application.add_handler(MessageHandler(filters.VOICE, handle_voice))
+
+    # Cargar Whisper en segundo plano para que el primer audio no pague la carga del modelo
+    warm_up_stt()
     
     # Iniciar el bot
     print("🤖 Bot iniciado. Esperando mensajes...")
@@ -1,31 +1,99 @@
 import os
 from dataclasses import dataclass
-from qdrant_client import QdrantClient
 
 from dotenv import load_dotenv
 load_dotenv()
 
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 
 @dataclass
 class Settings:
     # Qdrant Configuration
     qdrant_url: str = os.getenv("QDRANT_URL", "http://localhost:6333")
     qdrant_collection: str = os.getenv("QDRANT_COLLECTION", "clients_info_energix")
+    qdrant_api_key: str = os.getenv("QDRANT_API_KEY") or None
+    qdrant_prefer_grpc: bool = os.getenv("QDRANT_PREFER_GRPC", "0") == "1"
+    qdrant_grpc_port: int = int(os.getenv("QDRANT_GRPC_PORT", "6334"))
+    qdrant_timeout: int = int(os.getenv("QDRANT_TIMEOUT", "5"))  # segundos por petición
+    qdrant_pool_size: int = int(os.getenv("QDRANT_POOL_SIZE", "16"))  # conexiones (REST) / canales (gRPC)
     persist_db_dir: str = os.getenv("DB_DIR", "src/rag/vector_db")
 
+    # Vector store: "qdrant" o "numpy" (local, matriz .npy en mmap; sin servidor)
+    vector_store_backend: str = os.getenv("VECTOR_STORE_BACKEND", "qdrant").strip().lower()
+    numpy_store_dir: str = os.getenv("NUMPY_STORE_DIR", os.path.join(APP_DIR, "data", "vector_store"))
+
     # LLM Configuration
     llm_model_name: str = os.getenv("LLM_MODEL", "gpt-4o-mini")
     temperature: float = float(os.getenv("LLM_TEMPERATURE", "0.0"))
     llm_max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    # Modelo para la banda de baja confianza (por defecto el mismo, con menos contexto y tokens)
+    llm_cheap_model_name: str = os.getenv("LLM_CHEAP_MODEL", os.getenv("LLM_MODEL", "gpt-4o-mini"))
+    llm_cheap_max_tokens: int = int(os.getenv("LLM_CHEAP_MAX_TOKENS", "256"))
 
     # Embedding Configuration
     embedding_model_name: str = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    # Prefijo de las preguntas para modelos asimétricos (p. ej. "query: " en e5); vacío en MiniLM
+    embedding_query_prefix: str = os.getenv("EMBEDDING_QUERY_PREFIX", "")
+    # Caché persistente de embeddings (modelo + hash del texto): indexador, ingesta y preguntas
+    embedding_cache_enabled: bool = os.getenv("EMBEDDING_CACHE", "1") == "1"
+    embedding_cache_dir: str = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(APP_DIR, "data", "embedding_cache"))
+    embedding_cache_max_mb: int = int(os.getenv("EMBEDDING_CACHE_MAX_MB", "1024"))  # al llegar deja de crecer
+
+    # Chunking del indexador: "tokens" (tokenizer del modelo, frases/párrafos) o "chars" (split_text)
+    chunker: str = os.getenv("CHUNKER", "tokens").strip().lower()
+    chunk_max_tokens: int = int(os.getenv("CHUNK_MAX_TOKENS", "256"))  # ventana del modelo, con [CLS]/[SEP]
+    chunk_overlap_tokens: int = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
 
     # General Configuration
     threshold: float = float(os.getenv("THRESHOLD", "0.82"))
     k_docs: int = int(os.getenv("K_DOCS", 3))
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
 
-    qdrant_client = QdrantClient(url=qdrant_url)
+    # Atajos de la cadena RAG
+    # Sin documentos por encima del threshold: respuesta fija, sin llamar al LLM
+    rag_short_circuit: bool = os.getenv("RAG_SHORT_CIRCUIT", "1") == "1"
+    rag_no_info_answer: str = os.getenv(
+        "RAG_NO_INFO_ANSWER",
+        "Lo siento, no dispongo de información sobre esa consulta en la documentación de Energix. "
+        "¿Puedo ayudarte con algo relacionado con tu factura, pagos o tu suministro?",
+    )
+    # Mejor score en [threshold, threshold + band): se responde con el modelo barato y solo el mejor documento (0 = desactivado)
+    rag_low_confidence_band: float = float(os.getenv("RAG_LOW_CONFIDENCE_BAND", "0"))
+
+    # Recuperación híbrida: BM25 (léxico) + denso, combinados con reciprocal rank fusion
+    rag_hybrid_enabled: bool = os.getenv("RAG_HYBRID", "1") == "1"
+    bm25_index_path: str = os.getenv("BM25_INDEX_PATH", os.path.join(APP_DIR, "data", "bm25_index.json"))
+    rag_hybrid_candidates: int = int(os.getenv("RAG_HYBRID_CANDIDATES", "20"))  # candidatos por lista antes de fusionar
+    rag_rrf_k: int = int(os.getenv("RAG_RRF_K", "60"))
+    rag_bm25_min_score: float = float(os.getenv("RAG_BM25_MIN_SCORE", "2.0"))
+
+    # Consultas en lote (/rag/batch)
+    rag_batch_max_questions: int = int(os.getenv("RAG_BATCH_MAX_QUESTIONS", "500"))
+    rag_batch_max_concurrency: int = int(os.getenv("RAG_BATCH_MAX_CONCURRENCY", "8"))  # generaciones LLM simultáneas
+
+    # Warm-up de los servicios RAG al arrancar la API: "background", "blocking" u "off"
+    rag_warmup_mode: str = os.getenv("RAG_WARMUP", "background").strip().lower()
+    rag_warmup_retry: float = float(os.getenv("RAG_WARMUP_RETRY", "10"))  # segundos entre reintentos
+
+    # Query embeddings: caché LRU + micro-batching
+    query_embedding_cache_size: int = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+    query_embedding_batch_window_ms: float = float(os.getenv("QUERY_EMBEDDING_BATCH_WINDOW_MS", "5"))
+    query_embedding_max_batch: int = int(os.getenv("QUERY_EMBEDDING_MAX_BATCH", "32"))
+
+    # Semantic cache (RAG)
+    semantic_cache_enabled: bool = os.getenv("SEMANTIC_CACHE", "1") == "1"
+    semantic_cache_max_entries: int = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+    semantic_cache_ttl: float = float(os.getenv("SEMANTIC_CACHE_TTL", "86400"))  # segundos
+    semantic_cache_max_distance: float = float(os.getenv("SEMANTIC_CACHE_MAX_DISTANCE", "0.05"))  # distancia coseno
+    # El indexador actualiza este fichero al terminar; la caché se invalida al cambiar su mtime
+    rag_index_stamp_path: str = os.getenv("RAG_INDEX_STAMP", os.path.join(APP_DIR, "data", "rag_index.stamp"))
+
+    # Ingesta de documentos en segundo plano (POST /rag/documents)
+    ingest_workers: int = int(os.getenv("INGEST_WORKERS", "1"))
+    ingest_batch_size: int = int(os.getenv("INGEST_BATCH_SIZE", "16"))  # chunks por lote de embeddings/upsert
+    ingest_max_yield: float = float(os.getenv("INGEST_MAX_YIELD", "30"))  # segundos máximos cediendo el paso a /rag/query
+    ingest_upload_dir: str = os.getenv("INGEST_UPLOAD_DIR", os.path.join(APP_DIR, "data", "uploads"))
+    ingest_max_upload_mb: int = int(os.getenv("INGEST_MAX_UPLOAD_MB", "50"))  # tamaño máximo por fichero subido
 
 SETTINGS = Settings()
\ No newline at end of file
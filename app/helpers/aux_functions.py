@@ -5,6 +5,7 @@ import locale
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
+from helpers.billing_store import BillingStore
 
 # Convertir el periodo (YYYY-MM) a "mes de año" en español
 try:
@@ -54,16 +55,10 @@ def texto_a_periodo(texto: str) -> Optional[str]:
 
 
 
-def find_customer_by_dni_last4(dni_last4: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-    dni_last4 = str(dni_last4).strip().upper()
-    for c in data.get("customers", []):
-        # Prefer explicit field if present
-        if str(c.get("dni_last4", "")).strip().upper() == dni_last4:
-            return c
-        account_dni = str(c.get("account_dni", "")).strip().upper()
-        if account_dni.endswith(dni_last4):
-            return c
-    return None
+def find_customer_by_dni_last4(dni_last4: str, data: BillingStore) -> Optional[Dict[str, Any]]:
+    # Lookup O(1) en el índice por sufijo; si hay colisión devuelve el primero
+    customers = data.find_customers_by_dni_suffix(dni_last4)
+    return customers[0] if customers else None
 
 def format_eur(amount: float) -> str:
     # Simple formatting Spanish style (comma decimal)
@@ -133,7 +128,7 @@ def normalize_cups_last6(value: Optional[str]) -> Optional[str]:
     return None
 
 
-def identify_user(data: Dict[str, Any], params: Dict[str, Any]) -> tuple[str, Dict[str, Any]]:
+def identify_user(data: BillingStore, params: Dict[str, Any]) -> tuple[str, Dict[str, Any]]:
     """
     status:
       - OK: user_id + cups_id resueltos
@@ -156,38 +151,40 @@ def identify_user(data: Dict[str, Any], params: Dict[str, Any]) -> tuple[str, Di
             "message": "Para continuar necesito los ultimos 4 digitos y letra del DNI (ej: 5678Z)."
         }
 
-    customer = find_customer_by_dni_last4(dni_last4, data)
-    if not customer:
+    customers = data.find_customers_by_dni_suffix(dni_last4)
+    if not customers:
         return "NEED_DNI", {
             "message": "No encuentro ese DNI parcial. Puedes revisarlo y repetirlo?"
         }
 
-    user_id = customer.get("user_id")
-    supplies = [s for s in data.get("supplies", []) if s.get("user_id") == user_id]
+    if len(customers) == 1:
+        user_id = customers[0].get("user_id")
+        supplies = data.get_supplies(user_id)
 
-    if len(supplies) == 1:
-        return "OK", {"user_id": user_id, "cups_id": supplies[0].get("cups_id")}
+        if len(supplies) == 1:
+            return "OK", {"user_id": user_id, "cups_id": supplies[0].get("cups_id")}
 
-    if not cups_last6:
+        if not cups_last6:
+            return "NEED_CUPS", {
+                "user_id": user_id,
+                "message": "Tienes varios suministros. Indica el CUPS (ES + 6 caracteres) o los ultimos 6 caracteres."
+            }
+    elif not cups_last6:
+        # Varios titulares comparten los 4 dígitos + letra: el CUPS desambigua
         return "NEED_CUPS", {
-            "user_id": user_id,
-            "message": "Tienes varios suministros. Indica el CUPS (ES + 6 caracteres) o los ultimos 6 caracteres."
+            "message": "Necesito tambien el CUPS (ES + 6 caracteres) o sus ultimos 6 caracteres para identificarte."
         }
 
-    supply = None
-    for s in supplies:
-        cups = str(s.get("cups", "")).upper()
-        if cups[-6:] == cups_last6:
-            supply = s
-            break
+    candidate_ids = {c.get("user_id") for c in customers}
+    matches = [s for s in data.find_supplies_by_cups_suffix(cups_last6) if s.get("user_id") in candidate_ids]
 
-    if not supply:
-        return "NEED_CUPS", {
-            "user_id": user_id,
-            "message": "Ese CUPS no coincide con tus suministros. Dime los ultimos 6 caracteres correctos."
-        }
+    if len(matches) != 1:
+        resp = {"message": "Ese CUPS no coincide con tus suministros. Dime los ultimos 6 caracteres correctos."}
+        if len(customers) == 1:
+            resp["user_id"] = customers[0].get("user_id")
+        return "NEED_CUPS", resp
 
     return "OK", {
-        "user_id": user_id,
-        "cups_id": supply.get("cups_id"),
+        "user_id": matches[0].get("user_id"),
+        "cups_id": matches[0].get("cups_id"),
     }
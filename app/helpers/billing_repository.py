@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import bisect
+import json
+import os
+import threading
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Tuple
+
+from helpers.billing_store import BillingBackend, BillingStore
+
+
+"""
+
+REPOSITORIO DE FACTURACIÓN
+
+    Carga el JSON de facturación una sola vez y construye índices hash para que
+    los handlers no tengan que recorrer las listas completas en cada petición:
+
+        - clientes por user_id
+        - suministros por user_id
+        - facturas por (user_id, cups_id)
+        - clientes por sufijo de DNI (4 dígitos + letra)
+        - suministros por sufijo de CUPS (6 últimos caracteres)
+
+    Los índices por sufijo guardan listas: varios clientes pueden compartir los
+    mismos 4 dígitos + letra, y varios CUPS los mismos 6 últimos caracteres.
+
+    Además se materializa un resumen de deuda por (user_id, cups_id) con el número
+    de facturas pendientes, el total adeudado y las pendientes ya ordenadas, de modo
+    que los intents de estado de cuenta son lecturas directas. set_invoice_status()
+    lo mantiene al día de forma incremental, publicando un snapshot nuevo en vez de
+    modificar el vigente. Es de uso interno: la API no expone ninguna escritura.
+
+    Si el fichero cambia en disco (mtime distinto), se reconstruye un snapshot
+    nuevo y se sustituye de forma atómica: las peticiones en curso siguen
+    trabajando con el snapshot que ya tenían.
+
+"""
+
+SupplyKey = Tuple[Any, Any]
+
+DNI_SUFFIX_LEN = 5   # 4 dígitos + letra
+CUPS_SUFFIX_LEN = 6
+
+
+def dni_suffix(value: Any) -> str:
+    value = str(value or "").strip().upper().replace(" ", "").replace("-", "")
+    return value[-DNI_SUFFIX_LEN:] if len(value) >= DNI_SUFFIX_LEN else ""
+
+
+def cups_suffix(value: Any) -> str:
+    value = str(value or "").strip().upper()
+    return value[-CUPS_SUFFIX_LEN:] if len(value) >= CUPS_SUFFIX_LEN else ""
+
+
+# -----------------------------
+# Resumen de deuda por suministro
+# -----------------------------
+
+UNPAID_STATUSES = ("DUE", "OVERDUE")
+UNPAID_TOP_N = 3
+
+
+def invoice_is_unpaid(inv: Dict[str, Any]) -> bool:
+    return inv.get("status") in UNPAID_STATUSES
+
+
+def _unpaid_sort_key(inv: Dict[str, Any]) -> Tuple[str, str]:
+    return (inv.get("due_date", ""), inv.get("issue_date", ""))
+
+
+@dataclass(frozen=True)
+class DebtSummary:
+    """
+    Facturas pendientes de un suministro, ordenadas de más reciente a más antigua
+    (por due_date, issue_date). Es inmutable: cada cambio devuelve un resumen nuevo.
+    """
+    unpaid: Tuple[Dict[str, Any], ...] = ()
+    total_due: float = 0.0
+
+    @property
+    def unpaid_count(self) -> int:
+        return len(self.unpaid)
+
+    def top(self, n: int = UNPAID_TOP_N) -> Tuple[Dict[str, Any], ...]:
+        return self.unpaid[:n]
+
+    @classmethod
+    def from_invoices(cls, invoices: List[Dict[str, Any]]) -> "DebtSummary":
+        unpaid = sorted((i for i in invoices if invoice_is_unpaid(i)), key=_unpaid_sort_key, reverse=True)
+        return cls(unpaid=tuple(unpaid), total_due=round(sum(float(i["amount"]) for i in unpaid), 2))
+
+    def with_invoice(self, inv: Dict[str, Any]) -> "DebtSummary":
+        # Orden descendente: buscamos la posición sobre la clave invertida
+        keys = [_unpaid_sort_key(i) for i in reversed(self.unpaid)]
+        pos = len(self.unpaid) - bisect.bisect_right(keys, _unpaid_sort_key(inv))
+        unpaid = self.unpaid[:pos] + (inv,) + self.unpaid[pos:]
+        return DebtSummary(unpaid=unpaid, total_due=round(self.total_due + float(inv["amount"]), 2))
+
+    def without_invoice(self, invoice_id: Any) -> "DebtSummary":
+        removed = [i for i in self.unpaid if i.get("invoice_id") == invoice_id]
+        if not removed:
+            return self
+        unpaid = tuple(i for i in self.unpaid if i.get("invoice_id") != invoice_id)
+        total = self.total_due - sum(float(i["amount"]) for i in removed)
+        return DebtSummary(unpaid=unpaid, total_due=round(total, 2) if unpaid else 0.0)
+
+
+EMPTY_DEBT = DebtSummary()
+
+
+@dataclass(frozen=True)
+class BillingSnapshot(BillingStore):
+    mtime: float
+    customers: List[Dict[str, Any]] = field(default_factory=list)
+    customers_by_id: Dict[Any, Dict[str, Any]] = field(default_factory=dict)
+    supplies_by_user: Dict[Any, List[Dict[str, Any]]] = field(default_factory=dict)
+    invoices_by_supply: Dict[SupplyKey, List[Dict[str, Any]]] = field(default_factory=dict)
+    customers_by_dni_suffix: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    supplies_by_cups_suffix: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    invoices_by_id: Dict[Any, Dict[str, Any]] = field(default_factory=dict)
+    debt_by_supply: Dict[SupplyKey, DebtSummary] = field(default_factory=dict)
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Any], mtime: float = 0.0) -> "BillingSnapshot":
+        customers = list(data.get("customers", []))
+
+        customers_by_id: Dict[Any, Dict[str, Any]] = {}
+        customers_by_dni_suffix: Dict[str, List[Dict[str, Any]]] = {}
+        for c in customers:
+            customers_by_id.setdefault(c.get("user_id"), c)
+            # Si el cliente trae dni_last4 explícito se indexa también por él
+            keys = {dni_suffix(c.get("dni_last4")), dni_suffix(c.get("account_dni"))}
+            for key in keys - {""}:
+                customers_by_dni_suffix.setdefault(key, []).append(c)
+
+        supplies_by_user: Dict[Any, List[Dict[str, Any]]] = {}
+        supplies_by_cups_suffix: Dict[str, List[Dict[str, Any]]] = {}
+        for s in data.get("supplies", []):
+            supplies_by_user.setdefault(s.get("user_id"), []).append(s)
+            key = cups_suffix(s.get("cups"))
+            if key:
+                supplies_by_cups_suffix.setdefault(key, []).append(s)
+
+        invoices_by_supply: Dict[SupplyKey, List[Dict[str, Any]]] = {}
+        invoices_by_id: Dict[Any, Dict[str, Any]] = {}
+        for i in data.get("invoices", []):
+            invoices_by_supply.setdefault((i.get("user_id"), i.get("cups_id")), []).append(i)
+            invoices_by_id[i.get("invoice_id")] = i
+
+        debt_by_supply = {key: DebtSummary.from_invoices(invs) for key, invs in invoices_by_supply.items()}
+
+        return cls(
+            mtime=mtime,
+            customers=customers,
+            customers_by_id=customers_by_id,
+            supplies_by_user=supplies_by_user,
+            invoices_by_supply=invoices_by_supply,
+            customers_by_dni_suffix=customers_by_dni_suffix,
+            supplies_by_cups_suffix=supplies_by_cups_suffix,
+            invoices_by_id=invoices_by_id,
+            debt_by_supply=debt_by_supply,
+        )
+
+    def get_customer(self, user_id: Any) -> Optional[Dict[str, Any]]:
+        return self.customers_by_id.get(user_id)
+
+    def get_supplies(self, user_id: Any) -> List[Dict[str, Any]]:
+        return self.supplies_by_user.get(user_id, [])
+
+    def get_invoices(self, user_id: Any, cups_id: Any) -> List[Dict[str, Any]]:
+        return self.invoices_by_supply.get((user_id, cups_id), [])
+
+    def get_debt_summary(self, user_id: Any, cups_id: Any) -> DebtSummary:
+        return self.debt_by_supply.get((user_id, cups_id), EMPTY_DEBT)
+
+    def find_customers_by_dni_suffix(self, dni_last4: str) -> List[Dict[str, Any]]:
+        return self.customers_by_dni_suffix.get(dni_suffix(dni_last4), [])
+
+    def find_supplies_by_cups_suffix(self, cups_last6: str) -> List[Dict[str, Any]]:
+        return self.supplies_by_cups_suffix.get(cups_suffix(cups_last6), [])
+
+
+class BillingRepository(BillingBackend):
+    """
+    Mantiene en memoria el snapshot vigente de los datos de facturación.
+    snapshot() solo hace un stat() del fichero; recarga únicamente si cambia el mtime.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._snapshot = self._load()
+
+    def _load(self) -> BillingSnapshot:
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return BillingSnapshot.from_data(data, mtime=mtime)
+
+    def snapshot(self) -> BillingSnapshot:
+        current = self._snapshot
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            # Si el fichero desaparece momentáneamente seguimos con los datos que ya tenemos
+            return current
+
+        if mtime == current.mtime:
+            return current
+
+        with self._lock:
+            # Otro hilo puede haber recargado mientras esperábamos el lock
+            if self._snapshot.mtime != mtime:
+                try:
+                    self._snapshot = self._load()
+                    print(f"[billing] Datos recargados desde {self.path}")
+                except (OSError, ValueError) as e:
+                    # Fichero a medio escribir: mantenemos el snapshot anterior y reintentamos en la siguiente petición
+                    print(f"[billing] No se pudieron recargar los datos: {e}")
+            return self._snapshot
+
+    def set_invoice_status(self, invoice_id: Any, status: str) -> Optional[Dict[str, Any]]:
+        """
+        Cambia el estado de una factura y actualiza solo el resumen de su suministro.
+        El cambio vive en memoria: si el JSON cambia en disco, la recarga manda.
+        """
+        with self._lock:
+            snap = self._snapshot
+            current = snap.invoices_by_id.get(invoice_id)
+            if current is None:
+                return None
+            if current.get("status") == status:
+                return current
+
+            updated = {**current, "status": status}
+            key = (current.get("user_id"), current.get("cups_id"))
+
+            summary = snap.debt_by_supply.get(key, EMPTY_DEBT)
+            if invoice_is_unpaid(current):
+                summary = summary.without_invoice(invoice_id)
+            if invoice_is_unpaid(updated):
+                summary = summary.with_invoice(updated)
+
+            # El snapshot vigente no se toca (lo comparten peticiones en curso sin lock):
+            # se construye uno nuevo con los índices afectados y se publica con una asignación
+            self._snapshot = replace(
+                snap,
+                invoices_by_supply={
+                    **snap.invoices_by_supply,
+                    key: [updated if i is current else i for i in snap.invoices_by_supply.get(key, [])],
+                },
+                invoices_by_id={**snap.invoices_by_id, invoice_id: updated},
+                debt_by_supply={**snap.debt_by_supply, key: summary},
+            )
+            return updated
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from helpers.billing_repository import DebtSummary
+
+
+"""
+
+ALMACÉN DE FACTURACIÓN
+
+    Interfaz común para los backends de datos de facturación:
+
+        - BillingStore: consultas de lectura que usan identify_user y los handlers.
+        - BillingBackend: origen de datos configurado; snapshot() devuelve el
+          BillingStore con el que se atiende una petición.
+
+    Backends disponibles (BILLING_BACKEND):
+
+        - json: fichero JSON cargado en memoria con índices (helpers/billing_repository.py)
+        - sqlite: base de datos SQLite con índices (helpers/sqlite_billing_store.py)
+
+"""
+
+
+class BillingStore(ABC):
+
+    @abstractmethod
+    def get_customer(self, user_id: Any) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def get_supplies(self, user_id: Any) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def get_invoices(self, user_id: Any, cups_id: Any) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def get_debt_summary(self, user_id: Any, cups_id: Any) -> "DebtSummary":
+        ...
+
+    @abstractmethod
+    def find_customers_by_dni_suffix(self, dni_last4: str) -> List[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def find_supplies_by_cups_suffix(self, cups_last6: str) -> List[Dict[str, Any]]:
+        ...
+
+
+class BillingBackend(ABC):
+
+    @abstractmethod
+    def snapshot(self) -> BillingStore:
+        ...
+
+    @abstractmethod
+    def set_invoice_status(self, invoice_id: Any, status: str) -> Optional[Dict[str, Any]]:
+        ...
+
+
+def create_billing_backend(backend: str, json_path: str, db_path: str) -> BillingBackend:
+    backend = (backend or "json").strip().lower()
+    if backend == "json":
+        from helpers.billing_repository import BillingRepository
+        return BillingRepository(json_path)
+    if backend == "sqlite":
+        from helpers.sqlite_billing_store import SqliteBillingStore
+        return SqliteBillingStore(db_path)
+    raise ValueError(f"BILLING_BACKEND no soportado: '{backend}' (usa 'json' o 'sqlite')")
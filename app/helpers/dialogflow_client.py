@@ -0,0 +1,107 @@
+import os
+import asyncio
+import random
+from types import SimpleNamespace
+from typing import Optional
+
+from dotenv import load_dotenv
+load_dotenv()
+
+
+"""
+
+CLIENTE DIALOGFLOW (ASYNC)
+
+    detect_intent se hace con SessionsAsyncClient, así una llamada a Dialogflow
+    no bloquea el event loop del bot mientras se atiende al resto de chats.
+
+        - DIALOGFLOW_TIMEOUT: segundos máximos por llamada, incluida la espera
+          por una plaza de concurrencia
+        - DIALOGFLOW_MAX_CONCURRENCY: llamadas simultáneas como máximo
+        - DIALOGFLOW_FAKE=1: usa FakeSessionsAsyncClient (sin red ni credenciales)
+          para medir el throughput del bot en local, p.ej. con scripts/bench_dialogflow.py
+
+"""
+
+DIALOGFLOW_TIMEOUT = float(os.getenv("DIALOGFLOW_TIMEOUT", "10"))
+DIALOGFLOW_MAX_CONCURRENCY = int(os.getenv("DIALOGFLOW_MAX_CONCURRENCY", "32"))
+DIALOGFLOW_FAKE = os.getenv("DIALOGFLOW_FAKE", "0") == "1"
+DIALOGFLOW_FAKE_LATENCY = float(os.getenv("DIALOGFLOW_FAKE_LATENCY", "0.3"))  # segundos por llamada
+
+
+class FakeSessionsAsyncClient:
+    """
+    Sustituto local de dialogflow.SessionsAsyncClient.
+    Simula la latencia de red y responde con un eco del texto recibido.
+    """
+
+    def __init__(self, latency: float = DIALOGFLOW_FAKE_LATENCY, jitter: float = 0.2):
+        self.latency = latency
+        self.jitter = jitter
+
+    @staticmethod
+    def session_path(project: str, session: str) -> str:
+        return f"projects/{project}/agent/sessions/{session}"
+
+    async def detect_intent(self, request: dict, timeout: Optional[float] = None):
+        await asyncio.sleep(self.latency * random.uniform(1 - self.jitter, 1 + self.jitter))
+        text = request["query_input"]["text"]["text"]
+        return SimpleNamespace(
+            query_result=SimpleNamespace(
+                query_text=text,
+                fulfillment_text=f"(fake) {text}",
+                intent=SimpleNamespace(display_name="Fake.Echo"),
+            )
+        )
+
+
+class DialogflowClient:
+
+    def __init__(
+        self,
+        project_id: str,
+        timeout: float = DIALOGFLOW_TIMEOUT,
+        max_concurrency: int = DIALOGFLOW_MAX_CONCURRENCY,
+        fake: bool = DIALOGFLOW_FAKE,
+        session_client=None,
+    ):
+        self.project_id = project_id
+        self.timeout = timeout
+        self.fake = fake or isinstance(session_client, FakeSessionsAsyncClient)
+        self._client = session_client
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def _get_client(self):
+        # El cliente gRPC async se crea dentro del event loop que lo va a usar
+        if self._client is None:
+            if self.fake:
+                self._client = FakeSessionsAsyncClient()
+            else:
+                from google.cloud import dialogflow_v2 as dialogflow
+                self._client = dialogflow.SessionsAsyncClient()
+        return self._client
+
+    def _build_query_input(self, text: str, language_code: str):
+        if self.fake:
+            return {"text": {"text": text, "language_code": language_code}}
+        from google.cloud import dialogflow_v2 as dialogflow
+        return dialogflow.QueryInput(text=dialogflow.TextInput(text=text, language_code=language_code))
+
+    async def detect_intent_text(self, session_id: str, text: str, language_code: str = "es"):
+        """
+        Envía texto a Dialogflow y devuelve el query_result.
+        Lanza asyncio.TimeoutError si la llamada (con la espera en cola) supera self.timeout.
+        """
+        client = self._get_client()
+        request = {
+            "session": client.session_path(self.project_id, session_id),
+            "query_input": self._build_query_input(text, language_code),
+        }
+        # La espera por el semáforo cuenta dentro del timeout: con todas las plazas
+        # ocupadas el usuario recibe el aviso de "está tardando" en vez de quedarse en cola
+        response = await asyncio.wait_for(self._detect_intent(client, request), timeout=self.timeout)
+        return response.query_result
+
+    async def _detect_intent(self, client, request: dict):
+        async with self._semaphore:
+            return await client.detect_intent(request=request, timeout=self.timeout)
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from helpers.billing_repository import DebtSummary, cups_suffix, dni_suffix
+from helpers.billing_store import BillingBackend, BillingStore
+
+
+"""
+
+BACKEND SQLITE DE FACTURACIÓN
+
+    Los datos viven en un fichero SQLite (sin servidor externo) y solo se leen
+    las filas que necesita cada intent, gracias a los índices:
+
+        - customers.user_id (PK) y dni_suffixes(suffix, user_id)
+        - supplies(user_id) y supplies(cups_suffix)
+        - invoices(user_id, cups_id) y un índice parcial de facturas pendientes
+          ordenado por due_date para el resumen de deuda
+
+    Cada registro guarda también el JSON original (columna data), así los handlers
+    reciben los mismos dicts que con el backend JSON.
+
+    sqlite3 cachea las sentencias compiladas por conexión: cada consulta de abajo
+    se prepara una vez por hilo y se reutiliza en las siguientes peticiones.
+    Hay una conexión por hilo porque las consultas se ejecutan fuera del event
+    loop, en el threadpool del webhook.
+
+    Importación desde el JSON actual:
+        uv run -m scripts.import_billing_json data/sample_data.json data/billing.db
+
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    user_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS dni_suffixes (
+    suffix TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    PRIMARY KEY (suffix, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS supplies (
+    cups_id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    cups_suffix TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_supplies_user ON supplies(user_id);
+CREATE INDEX IF NOT EXISTS idx_supplies_cups_suffix ON supplies(cups_suffix);
+CREATE TABLE IF NOT EXISTS invoices (
+    invoice_id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    cups_id INTEGER NOT NULL,
+    status TEXT,
+    issue_date TEXT,
+    due_date TEXT,
+    amount REAL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_invoices_supply ON invoices(user_id, cups_id);
+CREATE INDEX IF NOT EXISTS idx_invoices_unpaid ON invoices(user_id, cups_id, due_date DESC, issue_date DESC)
+    WHERE status IN ('DUE', 'OVERDUE');
+"""
+
+# -----------------------------
+# Consultas por intent
+# -----------------------------
+
+SQL_CUSTOMER_BY_ID = "SELECT data FROM customers WHERE user_id = ?"
+SQL_CUSTOMERS_BY_DNI_SUFFIX = (
+    "SELECT c.data FROM dni_suffixes d JOIN customers c ON c.user_id = d.user_id WHERE d.suffix = ?"
+)
+SQL_SUPPLIES_BY_USER = "SELECT data FROM supplies WHERE user_id = ? ORDER BY rowid"
+SQL_SUPPLIES_BY_CUPS_SUFFIX = "SELECT data FROM supplies WHERE cups_suffix = ? ORDER BY rowid"
+SQL_INVOICES_BY_SUPPLY = "SELECT data FROM invoices WHERE user_id = ? AND cups_id = ? ORDER BY rowid"
+# El WHERE repite literalmente el del índice parcial para que SQLite lo use
+# (mismos estados que UNPAID_STATUSES en billing_repository)
+SQL_UNPAID_BY_SUPPLY = (
+    "SELECT data FROM invoices WHERE user_id = ? AND cups_id = ? AND status IN ('DUE', 'OVERDUE') "
+    "ORDER BY due_date DESC, issue_date DESC"
+)
+SQL_INVOICE_BY_ID = "SELECT data FROM invoices WHERE invoice_id = ?"
+SQL_UPDATE_INVOICE_STATUS = (
+    "UPDATE invoices SET status = ?, data = json_set(data, '$.status', ?) WHERE invoice_id = ?"
+)
+
+
+def _rows_to_dicts(rows: Iterable[Tuple[str]]) -> List[Dict[str, Any]]:
+    return [json.loads(r[0]) for r in rows]
+
+
+class SqliteBillingStore(BillingStore, BillingBackend):
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        # Falla al arrancar (y no en la primera petición) si la base no existe o no tiene esquema
+        self._conn().execute("SELECT 1 FROM customers LIMIT 1")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=rw", uri=True, cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def snapshot(self) -> "SqliteBillingStore":
+        # Cada consulta lee el estado actual de la base; no hay snapshot en memoria que recargar
+        return self
+
+    def get_customer(self, user_id: Any) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(SQL_CUSTOMER_BY_ID, (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_supplies(self, user_id: Any) -> List[Dict[str, Any]]:
+        return _rows_to_dicts(self._conn().execute(SQL_SUPPLIES_BY_USER, (user_id,)))
+
+    def get_invoices(self, user_id: Any, cups_id: Any) -> List[Dict[str, Any]]:
+        return _rows_to_dicts(self._conn().execute(SQL_INVOICES_BY_SUPPLY, (user_id, cups_id)))
+
+    def get_debt_summary(self, user_id: Any, cups_id: Any) -> DebtSummary:
+        unpaid = _rows_to_dicts(self._conn().execute(SQL_UNPAID_BY_SUPPLY, (user_id, cups_id)))
+        return DebtSummary(unpaid=tuple(unpaid), total_due=round(sum(float(i["amount"]) for i in unpaid), 2))
+
+    def find_customers_by_dni_suffix(self, dni_last4: str) -> List[Dict[str, Any]]:
+        return _rows_to_dicts(self._conn().execute(SQL_CUSTOMERS_BY_DNI_SUFFIX, (dni_suffix(dni_last4),)))
+
+    def find_supplies_by_cups_suffix(self, cups_last6: str) -> List[Dict[str, Any]]:
+        return _rows_to_dicts(self._conn().execute(SQL_SUPPLIES_BY_CUPS_SUFFIX, (cups_suffix(cups_last6),)))
+
+    def set_invoice_status(self, invoice_id: Any, status: str) -> Optional[Dict[str, Any]]:
+        conn = self._conn()
+        with conn:
+            cur = conn.execute(SQL_UPDATE_INVOICE_STATUS, (status, status, invoice_id))
+            if cur.rowcount == 0:
+                return None
+        row = conn.execute(SQL_INVOICE_BY_ID, (invoice_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+
+# -----------------------------
+# Importación desde JSON
+# -----------------------------
+
+IMPORT_SECTIONS = ("customers", "supplies", "invoices")
+IMPORT_BATCH_SIZE = 5000
+
+
+def _import_customers(conn: sqlite3.Connection, customers: List[Dict[str, Any]]) -> None:
+    conn.executemany(
+        "INSERT OR REPLACE INTO customers (user_id, data) VALUES (?, ?)",
+        ((c.get("user_id"), json.dumps(c, ensure_ascii=False)) for c in customers),
+    )
+    # Los sufijos se regeneran: si el DNI ha cambiado, el sufijo anterior ya no debe encontrarlo
+    conn.executemany("DELETE FROM dni_suffixes WHERE user_id = ?", ((c.get("user_id"),) for c in customers))
+    conn.executemany(
+        "INSERT OR IGNORE INTO dni_suffixes (suffix, user_id) VALUES (?, ?)",
+        (
+            (key, c.get("user_id"))
+            for c in customers
+            for key in {dni_suffix(c.get("dni_last4")), dni_suffix(c.get("account_dni"))} - {""}
+        ),
+    )
+
+
+def _import_supplies(conn: sqlite3.Connection, supplies: List[Dict[str, Any]]) -> None:
+    conn.executemany(
+        "INSERT OR REPLACE INTO supplies (cups_id, user_id, cups_suffix, data) VALUES (?, ?, ?, ?)",
+        (
+            (s.get("cups_id"), s.get("user_id"), cups_suffix(s.get("cups")), json.dumps(s, ensure_ascii=False))
+            for s in supplies
+        ),
+    )
+
+
+def _import_invoices(conn: sqlite3.Connection, invoices: List[Dict[str, Any]]) -> None:
+    conn.executemany(
+        "INSERT OR REPLACE INTO invoices (invoice_id, user_id, cups_id, status, issue_date, due_date, amount, data) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            (
+                i.get("invoice_id"), i.get("user_id"), i.get("cups_id"), i.get("status"),
+                i.get("issue_date"), i.get("due_date"), i.get("amount"), json.dumps(i, ensure_ascii=False),
+            )
+            for i in invoices
+        ),
+    )
+
+
+_IMPORTERS = {
+    "customers": _import_customers,
+    "supplies": _import_supplies,
+    "invoices": _import_invoices,
+}
+
+
+def import_json_records(
+    records: Iterable[Tuple[str, Dict[str, Any]]], db_path: str, batch_size: int = IMPORT_BATCH_SIZE,
+) -> Dict[str, int]:
+    """
+    Crea (o rellena) la base SQLite a partir de pares (sección, registro), con sección
+    customers / supplies / invoices. Se insertan por lotes de batch_size, así que los
+    registros pueden venir de un generador sin tener el fichero entero en memoria.
+    Reimportar sustituye los registros con la misma clave.
+    """
+    counts = {section: 0 for section in IMPORT_SECTIONS}
+    batches: Dict[str, List[Dict[str, Any]]] = {section: [] for section in IMPORT_SECTIONS}
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.executescript(SCHEMA)
+        with conn:
+            for section, record in records:
+                batch = batches.get(section)
+                if batch is None:
+                    continue
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    _IMPORTERS[section](conn, batch)
+                    counts[section] += len(batch)
+                    batch.clear()
+            for section, batch in batches.items():
+                if batch:
+                    _IMPORTERS[section](conn, batch)
+                    counts[section] += len(batch)
+        conn.execute("ANALYZE")
+        return counts
+    finally:
+        conn.close()
+
+
+def import_json_data(data: Dict[str, Any], db_path: str) -> Dict[str, int]:
+    """Igual que import_json_records, con el JSON de sample_data.json ya cargado."""
+    return import_json_records(
+        ((section, record) for section in IMPORT_SECTIONS for record in data.get(section, [])), db_path,
+    )
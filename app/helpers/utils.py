@@ -1,4 +1,9 @@
 import os
+import re
+import asyncio
+import subprocess
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -8,39 +13,193 @@ if ffmpeg_path:
     os.environ["FFMPEG_BINARY"] = ffmpeg_path
 
 
+import numpy as np
 import torch
-import scipy
 import whisper
 from markitdown import MarkItDown
 from transformers import VitsModel, AutoTokenizer
 
 WHISPER_MODEL = "turbo"
-AUDIO_FILE = "test.wav"
+TTS_MODEL = "facebook/mms-tts-spa"
+FFMPEG = os.getenv("FFMPEG_BINARY", "ffmpeg")
 
+# Respuestas por voz en streaming: se sintetiza y envía frase a frase.
+# Las frases más cortas que TTS_MIN_SEGMENT_CHARS se agrupan con la siguiente.
+TTS_STREAMING = os.getenv("TTS_STREAMING", "1") == "1"
+TTS_MIN_SEGMENT_CHARS = int(os.getenv("TTS_MIN_SEGMENT_CHARS", "40"))
+SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?…])\s+|\n+")
 
-def text_to_speech(text):
-    model = VitsModel.from_pretrained("facebook/mms-tts-spa")
-    tokenizer = AutoTokenizer.from_pretrained("facebook/mms-tts-spa")
+# Pool de transcripción: cada worker mantiene su propio modelo Whisper residente
+# (transcribe() instala hooks en el modelo, así que no se comparte entre hilos)
+STT_WORKERS = int(os.getenv("STT_WORKERS", "1"))
+STT_MAX_PENDING = int(os.getenv("STT_MAX_PENDING", "8"))  # audios en cola además de los que se procesan
+
+
+# ============== TTS ==============
+
+_tts_model = None
+_tts_tokenizer = None
+_tts_lock = threading.Lock()
+
+
+def _get_tts():
+    global _tts_model, _tts_tokenizer
+    if _tts_model is None:
+        with _tts_lock:
+            if _tts_model is None:
+                print(f"Cargando modelo TTS '{TTS_MODEL}'...")
+                _tts_tokenizer = AutoTokenizer.from_pretrained(TTS_MODEL)
+                model = VitsModel.from_pretrained(TTS_MODEL)
+                model.eval()
+                _tts_model = model
+    return _tts_model, _tts_tokenizer
+
+
+def synthesize(text):
+    """Devuelve (waveform float32 mono, sampling_rate) usando el modelo VITS ya cargado."""
+    model, tokenizer = _get_tts()
     inputs = tokenizer(text, return_tensors="pt")
 
     with torch.no_grad():
         output = model(**inputs).waveform
 
-        # Guardar el audio modificado
-        audio_dir = os.path.join(os.path.dirname(__file__), "..", "audios")
-        os.makedirs(audio_dir, exist_ok=True)
-        audio_path = os.path.join(audio_dir, AUDIO_FILE)
-        scipy.io.wavfile.write(audio_path, 18000, output[0].cpu().numpy())
+    return output[0].cpu().numpy().astype(np.float32), model.config.sampling_rate
+
+
+def encode_ogg_opus(waveform, sampling_rate):
+    """Codifica el audio a OGG/Opus en memoria (formato de las notas de voz de Telegram)."""
+    cmd = [
+        FFMPEG, "-hide_banner", "-loglevel", "error",
+        "-f", "f32le", "-ar", str(sampling_rate), "-ac", "1", "-i", "pipe:0",
+        "-c:a", "libopus", "-b:a", "32k", "-application", "voip",
+        "-f", "ogg", "pipe:1",
+    ]
+    result = subprocess.run(cmd, input=waveform.tobytes(), capture_output=True, check=True)
+    return result.stdout
+
+
+def text_to_speech(text):
+    """Sintetiza el texto y devuelve los bytes OGG/Opus listos para reply_voice."""
+    waveform, sampling_rate = synthesize(text)
+    return encode_ogg_opus(waveform, sampling_rate)
+
+
+def split_sentences(text, min_chars=TTS_MIN_SEGMENT_CHARS):
+    """Trocea el texto en frases/párrafos, agrupando las demasiado cortas."""
+    segments = []
+    current = ""
+    for part in SENTENCE_SPLIT_RE.split(text or ""):
+        part = part.strip()
+        if not part:
+            continue
+        current = f"{current} {part}" if current else part
+        if len(current) >= min_chars:
+            segments.append(current)
+            current = ""
+    if current:
+        if segments and len(current) < min_chars:
+            segments[-1] = f"{segments[-1]} {current}"
+        else:
+            segments.append(current)
+    return segments
+
+
+def text_to_speech_stream(text):
+    """Generador: devuelve el audio OGG/Opus de cada frase según se va sintetizando."""
+    for segment in split_sentences(text):
+        yield text_to_speech(segment)
+
 
+# ============== STT ==============
 
-def speech_to_text(audio_path):
-    model = whisper.load_model(WHISPER_MODEL)
+class STTBusyError(RuntimeError):
+    """La cola de transcripción está llena."""
+
+
+_stt_local = threading.local()
+_stt_executor = None
+_stt_slots = threading.BoundedSemaphore(STT_WORKERS + STT_MAX_PENDING)
+_stt_lock = threading.Lock()
+
+
+def _load_stt_worker():
+    # Se ejecuta una vez por hilo del pool: el modelo queda cargado para todos sus audios
+    print(f"Cargando modelo Whisper '{WHISPER_MODEL}'...")
+    _stt_local.model = whisper.load_model(WHISPER_MODEL)
+
+
+def _get_stt_executor():
+    global _stt_executor
+    if _stt_executor is None:
+        with _stt_lock:
+            if _stt_executor is None:
+                # Repartimos los hilos de torch entre los workers para no sobresuscribir la CPU
+                torch.set_num_threads(max(1, (os.cpu_count() or 1) // STT_WORKERS))
+                _stt_executor = ThreadPoolExecutor(
+                    max_workers=STT_WORKERS,
+                    thread_name_prefix="stt",
+                    initializer=_load_stt_worker,
+                )
+    return _stt_executor
+
+
+def warm_up_stt():
+    """Arranca los workers de STT (y carga sus modelos) antes del primer audio."""
+    executor = _get_stt_executor()
+    for _ in range(STT_WORKERS):
+        executor.submit(lambda: None)
+
+
+def decode_audio_bytes(audio_bytes, sampling_rate=whisper.audio.SAMPLE_RATE):
+    """
+    Decodifica audio comprimido (p.ej. la nota de voz OGG/Opus de Telegram) en memoria
+    a un buffer float32 mono a 16 kHz, el formato que espera Whisper. Sin ficheros temporales.
+    """
+    cmd = [
+        FFMPEG, "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sampling_rate),
+        "pipe:1",
+    ]
+    result = subprocess.run(cmd, input=bytes(audio_bytes), capture_output=True, check=True)
+    return np.frombuffer(result.stdout, np.int16).astype(np.float32) / 32768.0
+
+
+def _transcribe(audio):
+    # Acepta bytes comprimidos, un array float32 a 16 kHz o una ruta (como whisper)
+    if isinstance(audio, (bytes, bytearray)):
+        audio = decode_audio_bytes(audio)
     print("Transcribiendo audio con Whisper...")
-    result = model.transcribe(audio_path, language='es', fp16=False)
+    result = _stt_local.model.transcribe(audio, language='es', fp16=False)
     print("Transcripción completa:", result["text"])
     return result["text"]
 
 
+def submit_speech_to_text(audio) -> Future:
+    """
+    Encola una transcripción en el pool de STT.
+    Lanza STTBusyError si ya hay STT_WORKERS + STT_MAX_PENDING audios en curso.
+    """
+    if not _stt_slots.acquire(blocking=False):
+        raise STTBusyError("Cola de transcripción llena")
+    try:
+        future = _get_stt_executor().submit(_transcribe, audio)
+    except Exception:
+        _stt_slots.release()
+        raise
+    future.add_done_callback(lambda _: _stt_slots.release())
+    return future
+
+
+def speech_to_text(audio):
+    return submit_speech_to_text(audio).result()
+
+
+async def speech_to_text_async(audio):
+    """Versión para handlers async: espera la transcripción sin bloquear el event loop."""
+    return await asyncio.wrap_future(submit_speech_to_text(audio))
+
+
 def use_markitdown(file_path):
     md = MarkItDown(enable_plugins=True)
     result = md.convert(file_path)
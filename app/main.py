@@ -1,17 +1,31 @@
 from __future__ import annotations
 
-import json
 import os
 import re
+import json
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, File, HTTPException, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Los servicios RAG (modelo, Qdrant, LLM) se crean aquí o en el primer uso, nunca al importar
+    from src.services.warmup import start_warm_up
+
+    await run_in_threadpool(start_warm_up)
+    yield
 
-from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
 
-app = FastAPI(title="Dialogflow ES Webhook - Billing Demo", version="1.0.0")
+app = FastAPI(title="Dialogflow ES Webhook - Billing Demo", version="1.0.0", lifespan=lifespan)
 
 DATA_PATH = os.getenv("BILLING_DATA_PATH", os.path.join(os.path.dirname(__file__), "data", "sample_data.json"))
+BILLING_BACKEND = os.getenv("BILLING_BACKEND", "json")  # "json" o "sqlite"
+BILLING_DB_PATH = os.getenv("BILLING_DB_PATH", os.path.join(os.path.dirname(__file__), "data", "billing.db"))
 
 # Billing.SendInvoice
 from routers.billing.send_invoice import handle_send_invoice
@@ -33,6 +47,7 @@ from helpers.aux_functions import (
     make_context,
     upsert_context
 )
+from helpers.billing_store import BillingStore, create_billing_backend
 
 
 
@@ -40,9 +55,9 @@ from helpers.aux_functions import (
 # Helpers: load data
 # -----------------------------
 
-def load_data() -> Dict[str, Any]:
-    with open(DATA_PATH, "r", encoding="utf-8") as f:
-        return json.load(f)
+# Backend JSON: se carga una sola vez al arrancar y snapshot() recarga solo si cambia el fichero.
+# Backend SQLite: snapshot() devuelve el propio store y cada consulta va a la base.
+billing_backend = create_billing_backend(BILLING_BACKEND, json_path=DATA_PATH, db_path=BILLING_DB_PATH)
 
 
 # -----------------------------
@@ -63,7 +78,7 @@ MONTH_RE = re.compile(r"^\d{4}-\d{2}$")
 
 
 
-def execute_intent_handler(payload: Dict[str, Any], data: Dict[str, Any], intent_name: str, handler_params: Dict[str, Any]) -> Dict[str, Any]:
+def execute_intent_handler(payload: Dict[str, Any], data: BillingStore, intent_name: str, handler_params: Dict[str, Any]) -> Dict[str, Any]:
     """
     Ejecuta un handler por nombre de intent.
     Devuelve SIEMPRE un dict en formato Dialogflow response.
@@ -122,7 +137,7 @@ def _normalize_identity_params(params: Dict[str, Any], state: Dict[str, Any]) ->
     return merged
 
 
-def handle_business_intents(payload: Dict[str, Any], data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+def handle_business_intents(payload: Dict[str, Any], data: BillingStore) -> Optional[Dict[str, Any]]:
     """
     Maneja intents que requieren autenticación en webhook.
     - Guarda pending_action/pending_params cuando falta identidad.
@@ -265,7 +280,7 @@ def handle_business_intents(payload: Dict[str, Any], data: Dict[str, Any]) -> Op
     return build_dialogflow_response(output_msg, output_contexts=ctx)
 
 
-def handle_send_payment_link(params: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+def handle_send_payment_link(params: Dict[str, Any], data: BillingStore) -> Dict[str, Any]:
     
     if not params.get("user_id"):
         return build_dialogflow_response("No hemos podido identificar el suministro. Por favor, vuelva a intentarlo más tarde.")
@@ -312,8 +327,6 @@ async def dialogflow_fulfillment(request: Request) -> JSONResponse:
     intent = (query_result.get("intent") or {}).get("displayName", "")
     params = query_result.get("parameters", {}) or {}
 
-    data = load_data()
-
 
     # Lógica especial para Info.General: no requiere verificación, llama a RAG
     if intent == "Info.General":
@@ -333,8 +346,11 @@ async def dialogflow_fulfillment(request: Request) -> JSONResponse:
         except Exception as e:
             return JSONResponse(content=build_dialogflow_response("Ocurrió un error al consultar el agente. Intenta de nuevo."))
 
+    # El acceso a datos es síncrono (fichero/SQLite): lo sacamos del event loop
+    data = await run_in_threadpool(billing_backend.snapshot)
+
     # New business intents with identity + pending action
-    business_resp = handle_business_intents(body, data)
+    business_resp = await run_in_threadpool(handle_business_intents, body, data)
     if business_resp is not None:
         return JSONResponse(content=business_resp)
 
@@ -348,7 +364,7 @@ async def dialogflow_fulfillment(request: Request) -> JSONResponse:
         )
 
     try:
-        resp = handler(session=session, params=params, data=data)
+        resp = await run_in_threadpool(handler, session=session, params=params, data=data)
         return JSONResponse(content=resp)
     except Exception as e:
         # Avoid leaking stack traces to user
@@ -368,11 +384,138 @@ async def rag_query(request: RAGRequest):
     print(response.answer)
     return response.answer
 
+@app.post("/rag/batch")
+async def rag_query_batch(requests: List[RAGRequest], max_concurrency: Optional[int] = None):
+    """
+    Varias consultas RAG en una sola llamada. Responde en JSON Lines, una línea por
+    pregunta y en el orden de entrada: {"index", ...QueryResponse} o {"index", "error"}.
+    """
+    from src.rag.router import BATCH_ERROR_MESSAGE, rag_batch
+    from config.project_config import SETTINGS
+
+    if len(requests) > SETTINGS.rag_batch_max_questions:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo {SETTINGS.rag_batch_max_questions} preguntas por lote (recibidas {len(requests)})",
+        )
+    if max_concurrency is not None and max_concurrency < 1:
+        raise HTTPException(status_code=400, detail="max_concurrency debe ser >= 1")
+
+    async def lines():
+        # Las líneas salen en orden: si algo falla a mitad, las que faltan se emiten con error
+        emitted = 0
+        try:
+            async for index, response, error in rag_batch(requests, max_concurrency=max_concurrency):
+                if error is not None:
+                    item = {"index": index, "error": error}
+                else:
+                    item = {"index": index, **response.model_dump(mode="json")}
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+                emitted = index + 1
+        except Exception as e:
+            print(f"[rag][batch] error: {e}")
+            for index in range(emitted, len(requests)):
+                yield json.dumps({"index": index, "error": BATCH_ERROR_MESSAGE}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/rag/stream")
+async def rag_query_stream(request: RAGRequest):
+    """
+    Respuesta RAG en streaming (Server-Sent Events): un evento 'sources' con los
+    documentos recuperados, eventos 'token' con el texto según se genera y 'done' al final.
+    """
+    from src.rag.router import rag_stream
+
+    async def event_source():
+        async for event, payload in rag_stream(request):
+            yield f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False, default=str)}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/rag/cache/stats")
+def rag_cache_stats():
+    from src.rag.cache import semantic_cache
+
+    return semantic_cache.stats()
+
+
+@app.post("/rag/cache/invalidate")
+def rag_cache_invalidate():
+    from src.rag.cache import semantic_cache
+
+    semantic_cache.invalidate()
+    return semantic_cache.stats()
+
+
+@app.get("/rag/embeddings/stats")
+def rag_embeddings_stats():
+    from src.services.embeddings import get_embedding_cache, get_query_embedding_cache
+    from src.services.query_embeddings import query_embedder
+
+    cache, query_cache = get_embedding_cache(), get_query_embedding_cache()
+    return {
+        **query_embedder.stats(),
+        "disk_cache": cache.stats() if cache is not None else None,
+        "query_disk_cache": query_cache.stats() if query_cache is not None else None,
+    }
+
+
+@app.post("/rag/documents", status_code=202)
+async def rag_upload_documents(files: List[UploadFile] = File(...)):
+    """Encola PDFs / Markdown para indexarlos en segundo plano. Devuelve un job por fichero."""
+    from src.rag.ingestion import MAX_UPLOAD_BYTES, ingestion_manager, validate_upload
+
+    # Se validan todos antes de encolar ninguno
+    uploads = []
+    for upload in files:
+        # Un byte más del máximo basta para saber que se pasa, sin leer el fichero entero
+        content = await upload.read(MAX_UPLOAD_BYTES + 1)
+        try:
+            validate_upload(upload.filename, content)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        uploads.append((upload.filename, content))
+
+    jobs = [await ingestion_manager.submit(filename, content) for filename, content in uploads]
+    return {"jobs": [job.to_dict() for job in jobs]}
+
+
+@app.get("/rag/documents/jobs/{job_id}")
+def rag_document_job(job_id: str):
+    from src.rag.ingestion import ingestion_manager
+
+    job = ingestion_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' no encontrado")
+    return job.to_dict()
+
+
+@app.get("/rag/documents/stats")
+def rag_documents_stats():
+    from src.rag.ingestion import ingestion_manager
+
+    return ingestion_manager.stats()
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def ready():
+    """200 cuando los servicios RAG están inicializados; 503 (con el detalle) mientras tanto."""
+    from src.services.warmup import readiness
+
+    status = readiness.status()
+    return JSONResponse(content=status, status_code=200 if status["ready"] else 503)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8008, log_level="info", reload=True)
\ No newline at end of file
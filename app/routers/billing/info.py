@@ -1,10 +1,12 @@
-from typing import Any, Dict, List
+from typing import Any, Dict
 
 
 from helpers.aux_functions import (
     build_dialogflow_response,
     format_eur
 )
+from helpers.billing_repository import UNPAID_TOP_N
+from helpers.billing_store import BillingStore
 
 """ 
 
@@ -21,17 +23,7 @@ INTENTS
 
 """
 
-def invoice_is_unpaid(inv: Dict[str, Any]) -> bool:
-    return inv.get("status") in ("DUE", "OVERDUE")
-
-def list_unpaid_invoices(invoices: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    unpaid = [i for i in invoices if invoice_is_unpaid(i)]
-    # Keep most recent first
-    unpaid.sort(key=lambda x: (x.get("due_date", ""), x.get("issue_date", "")), reverse=True)
-    return unpaid
-
-
-def handle_check_account_status(params: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+def handle_check_account_status(params: Dict[str, Any], data: BillingStore) -> Dict[str, Any]:
     """
     Función para manejar el intent Billing.Info.AccountStatus.
     
@@ -48,23 +40,21 @@ def handle_check_account_status(params: Dict[str, Any], data: Dict[str, Any]) ->
     cups_id = params.get("cups_id")
     user_id = params.get("user_id")
 
-    # Traemos sus facturas pendientes
-    invoices = [i for i in data.get("invoices", []) if i.get("user_id") == user_id and i.get("cups_id") == cups_id]
-    unpaid = list_unpaid_invoices(invoices)
-    total_due = sum(float(i["amount"]) for i in unpaid) if unpaid else 0.0
+    # Resumen de deuda precalculado del suministro
+    debt = data.get_debt_summary(user_id, cups_id)
 
-    if not unpaid:
+    if not debt.unpaid_count:
         text = "Estás al corriente de pago. No tienes facturas pendientes."
     else:
-        if len(unpaid) == 1:
-            text = f"Tienes 1 factura pendiente por un total de {format_eur(total_due)}."
+        if debt.unpaid_count == 1:
+            text = f"Tienes 1 factura pendiente por un total de {format_eur(debt.total_due)}."
         else: 
-            text = f"Tienes {len(unpaid)} facturas pendientes por un total de {format_eur(total_due)}."
+            text = f"Tienes {debt.unpaid_count} facturas pendientes por un total de {format_eur(debt.total_due)}."
 
     return text, params
 
 
-def handle_list_unpaid_invoices(params: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+def handle_list_unpaid_invoices(params: Dict[str, Any], data: BillingStore) -> Dict[str, Any]:
     """
     Función para manejar el intent Billing.Info.UnpaidInvoices.
     
@@ -81,23 +71,22 @@ def handle_list_unpaid_invoices(params: Dict[str, Any], data: Dict[str, Any]) ->
     cups_id = params.get("cups_id")
     user_id = params.get("user_id")
 
-    # Traemos sus facturas pendientes
-    invoices = [i for i in data.get("invoices", []) if i.get("user_id") == user_id and i.get("cups") == cups_id]
-    unpaid = list_unpaid_invoices(invoices)
+    # Resumen de deuda precalculado del suministro (pendientes ya ordenadas)
+    debt = data.get_debt_summary(user_id, cups_id)
 
-    if not unpaid:
+    if not debt.unpaid_count:
         text = "No tienes facturas pendientes."
     else:
         # List max 3 for brevity
         lines = []
-        for inv in unpaid[:3]:
+        for inv in debt.top(UNPAID_TOP_N):
             lines.append(f"- {inv['period']} | {format_eur(float(inv['amount']))} | vence {inv['due_date']} | {inv['status']}")
         text = "Estas son tus facturas pendientes (máx. 3):\n" + "\n".join(lines)
 
     return text, params
 
 
-def handle_check_outstanding_amount(params: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+def handle_check_outstanding_amount(params: Dict[str, Any], data: BillingStore) -> Dict[str, Any]:
     """
     Función para manejar el intent Billing.Info.OutstandingAmount.
     
@@ -108,14 +97,12 @@ def handle_check_outstanding_amount(params: Dict[str, Any], data: Dict[str, Any]
     cups_id = params.get("cups_id")
     user_id = params.get("user_id")
 
-    # Traemos sus facturas pendientes
-    invoices = [i for i in data.get("invoices", []) if i.get("user_id") == user_id and i.get("cups") == cups_id]
-    unpaid = list_unpaid_invoices(invoices)
-    total_due = sum(float(i["amount"]) for i in unpaid) if unpaid else 0.0
+    # Resumen de deuda precalculado del suministro
+    debt = data.get_debt_summary(user_id, cups_id)
 
-    if not unpaid:
+    if not debt.unpaid_count:
         text = "No tienes importe pendiente."
     else:
-        text = f"Tu importe pendiente total es {format_eur(total_due)} ({len(unpaid)} factura(s))."
+        text = f"Tu importe pendiente total es {format_eur(debt.total_due)} ({debt.unpaid_count} factura(s))."
 
     return text, params
\ No newline at end of file
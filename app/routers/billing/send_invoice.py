@@ -5,6 +5,7 @@ from helpers.aux_functions import (
     periodo_a_texto,
     texto_a_periodo
 )
+from helpers.billing_store import BillingStore
 
 """ 
 
@@ -19,7 +20,7 @@ INTENTS
 """
 
 
-def handle_send_invoice(params: Dict[str, Any], data: Dict[str, Any]) -> Dict[str, Any]:
+def handle_send_invoice(params: Dict[str, Any], data: BillingStore) -> Dict[str, Any]:
         
     if not params.get("user_id"):
         return build_dialogflow_response("No hemos podido identificar el suministro. Por favor, vuelva a intentarlo más tarde.")
@@ -32,8 +33,7 @@ def handle_send_invoice(params: Dict[str, Any], data: Dict[str, Any]) -> Dict[st
     # Identificamos al cliente y su suministro
     cups_id = params.get("cups_id")
     user_id = params.get("user_id")
-    invoices = [i for i in data.get("invoices", []) if i.get("user_id") == user_id and i.get("cups_id") == cups_id]
-    invoices.sort(key=lambda x: (x.get("issue_date", ""), x.get("due_date", "")), reverse=True)
+    invoices = sorted(data.get_invoices(user_id, cups_id), key=lambda x: (x.get("issue_date", ""), x.get("due_date", "")), reverse=True)
 
     period = params.get("PERIODO")
     if period:
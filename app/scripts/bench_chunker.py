@@ -0,0 +1,92 @@
+import time
+import random
+import argparse
+import statistics
+from typing import Callable, List
+
+from src.rag.chunking import (
+    DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE, chunk_text, get_token_counter, normalize_text, split_text,
+)
+from config.project_config import SETTINGS
+
+
+"""
+
+BENCHMARK DEL CHUNKER
+
+    Compara, sobre el mismo texto:
+
+        - chars: split_text del indexador (ventanas de caracteres + rfind de separadores)
+        - tokens: chunk_text (src/rag/chunking.py), por tokens del modelo y fin de frase
+
+    Para cada uno: tiempo, MB/s, número de chunks, tokens por chunk y cuántos
+    chunks pasan de la ventana del modelo (esos tokens se truncan al embeber).
+
+    Uso:
+        uv run -m scripts.bench_chunker --paragraphs 20000
+        uv run -m scripts.bench_chunker --file data/contrato.txt --repeat 3
+
+"""
+
+WORDS = (
+    "factura contrato suministro tarifa potencia consumo energía cliente pago domiciliación cuenta "
+    "importe periodo lectura contador penalización cláusula baja alta titular dirección peaje "
+    "impuesto eléctrico IVA kWh mensual bimestral fecha vencimiento recibo devolución reclamación"
+).split()
+
+
+def synthetic_text(paragraphs: int, seed: int = 7) -> str:
+    """Texto tipo condiciones generales: párrafos de 1-8 frases de 6-40 palabras."""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(paragraphs):
+        sentences = []
+        for _ in range(rng.randint(1, 8)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(6, 40))]
+            sentences.append(" ".join(words).capitalize() + rng.choice([".", ".", ".", "?", ":"]))
+        out.append(" ".join(sentences))
+    return "\n\n".join(out)
+
+
+def run(name: str, chunker: Callable[[str], List[str]], text: str, repeat: int, max_tokens: int) -> None:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = chunker(text)
+        times.append(time.perf_counter() - start)
+    elapsed = min(times)
+
+    counter = get_token_counter()
+    window = max_tokens - counter.special_tokens
+    tokens = [counter.count(c) for c in chunks]
+    over = [t for t in tokens if t > window]
+    truncated = sum(t - window for t in over)
+    print(
+        f"[{name:6}] {elapsed:.3f}s | {len(text) / elapsed / 1e6:.2f} MB/s | {len(chunks)} chunks | "
+        f"tokens/chunk media {statistics.mean(tokens):.0f}, máx {max(tokens)} | "
+        f"{len(over)} chunks sobre {window} tokens ({len(over) / len(chunks):.1%}), {truncated} tokens truncados"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="split_text (caracteres) frente a chunk_text (tokens)")
+    parser.add_argument("--file", help="texto a trocear (por defecto, texto sintético)")
+    parser.add_argument("--paragraphs", type=int, default=5000, help="párrafos del texto sintético")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=DEFAULT_CHUNK_OVERLAP)
+    parser.add_argument("--max-tokens", type=int, default=SETTINGS.chunk_max_tokens)
+    parser.add_argument("--overlap-tokens", type=int, default=SETTINGS.chunk_overlap_tokens)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+    else:
+        text = synthetic_text(args.paragraphs)
+    text = normalize_text(text)
+    print(f"Texto: {len(text) / 1e6:.2f} MB | tokenizer: {SETTINGS.embedding_model_name}"
+          f"{'' if get_token_counter().tokenizer is not None else ' (aproximado)'}")
+
+    run("chars", lambda t: split_text(t, args.chunk_size, args.chunk_overlap), text, args.repeat, args.max_tokens)
+    run("tokens", lambda t: list(chunk_text(t, args.max_tokens, args.overlap_tokens)), text, args.repeat, args.max_tokens)
@@ -0,0 +1,85 @@
+import os
+import time
+import asyncio
+import argparse
+import statistics
+from typing import List
+
+from helpers.dialogflow_client import DialogflowClient, FakeSessionsAsyncClient
+
+
+"""
+
+BENCHMARK DIALOGFLOW EN EL BOT
+
+    Simula N chats simultáneos enviando M mensajes cada uno contra el
+    FakeSessionsAsyncClient (sin red) y compara:
+
+        - blocking: llamada síncrona dentro del handler async (comportamiento anterior,
+          bloquea el event loop en cada round trip)
+        - async: DialogflowClient con concurrencia acotada
+
+    Uso:
+        uv run -m scripts.bench_dialogflow --chats 50 --messages 5 --latency 0.3
+
+"""
+
+
+def _blocking_detect_intent(latency: float, text: str):
+    # Equivalente a SessionsClient.detect_intent: la latencia se "pasa" bloqueando el hilo
+    time.sleep(latency)
+    return f"(fake) {text}"
+
+
+async def _chat_blocking(chat_id: int, messages: int, latency: float, start: float, done: List[float]):
+    for i in range(messages):
+        _blocking_detect_intent(latency, f"chat {chat_id} mensaje {i}")
+        await asyncio.sleep(0)
+    done.append(time.perf_counter() - start)
+
+
+async def _chat_async(client: DialogflowClient, chat_id: int, messages: int, start: float, done: List[float]):
+    for i in range(messages):
+        await client.detect_intent_text(str(chat_id), f"chat {chat_id} mensaje {i}")
+    done.append(time.perf_counter() - start)
+
+
+async def run(mode: str, chats: int, messages: int, latency: float, concurrency: int) -> None:
+    # Tiempo hasta que cada chat recibe todas sus respuestas
+    done: List[float] = []
+    start = time.perf_counter()
+    if mode == "blocking":
+        tasks = [_chat_blocking(c, messages, latency, start, done) for c in range(chats)]
+    else:
+        client = DialogflowClient(
+            project_id="bench",
+            timeout=latency * 10 + 1,
+            max_concurrency=concurrency,
+            session_client=FakeSessionsAsyncClient(latency=latency, jitter=0.0),
+        )
+        tasks = [_chat_async(client, c, messages, start, done) for c in range(chats)]
+
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    total = chats * messages
+    done.sort()
+    p95 = done[max(0, int(len(done) * 0.95) - 1)]
+    print(
+        f"[{mode:8}] {total} mensajes en {elapsed:.2f}s | {total / elapsed:.1f} msg/s | "
+        f"chat completo p50 {statistics.median(done):.2f}s, p95 {p95:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput del bot contra un Dialogflow simulado")
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=float(os.getenv("DIALOGFLOW_FAKE_LATENCY", "0.3")))
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("DIALOGFLOW_MAX_CONCURRENCY", "32")))
+    parser.add_argument("--mode", choices=["blocking", "async", "both"], default="both")
+    args = parser.parse_args()
+
+    modes = ["blocking", "async"] if args.mode == "both" else [args.mode]
+    for m in modes:
+        asyncio.run(run(m, args.chats, args.messages, args.latency, args.concurrency))
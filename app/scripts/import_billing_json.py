@@ -0,0 +1,112 @@
+import json
+import os
+import sys
+from typing import Any, Dict, Iterator, TextIO, Tuple
+
+from helpers.sqlite_billing_store import import_json_records
+
+
+"""
+
+IMPORTADOR JSON -> SQLITE
+
+    Lee el JSON de facturación (formato de sample_data.json) en streaming y lo
+    inserta por lotes en la base SQLite: en memoria solo hay un trozo del fichero
+    y el lote en curso, no el JSON entero, así que sirve para ficheros que no
+    caben cómodamente en memoria.
+
+    Uso:
+        uv run -m scripts.import_billing_json data/sample_data.json data/billing.db
+
+"""
+
+READ_CHUNK_CHARS = 1 << 20
+
+
+def iter_json_records(f: TextIO, chunk_chars: int = READ_CHUNK_CHARS) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    (sección, registro) de cada elemento de las listas de primer nivel de un JSON
+    {"customers": [...], "supplies": [...], ...}, leyendo el fichero por trozos.
+    Los valores de primer nivel que no son listas se ignoran.
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+
+    def read_more() -> None:
+        nonlocal buf, pos, eof
+        data = f.read(chunk_chars)
+        eof = not data
+        buf, pos = buf[pos:] + data, 0
+
+    def peek() -> str:
+        # Siguiente carácter que no es espacio ("" al final del fichero)
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos].isspace():
+                pos += 1
+            if pos < len(buf) or eof:
+                return buf[pos:pos + 1]
+            read_more()
+
+    def expect(chars: str) -> str:
+        nonlocal pos
+        ch = peek()
+        if not ch or ch not in chars:
+            raise ValueError(f"JSON no válido cerca de la posición {pos}: se esperaba {' o '.join(chars)}")
+        pos += 1
+        return ch
+
+    def value() -> Any:
+        nonlocal pos
+        while True:
+            peek()
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+                # Un número al final del trozo puede seguir en el siguiente
+                if end < len(buf) or eof:
+                    pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            read_more()
+
+    expect("{")
+    if peek() == "}":
+        return
+    while True:
+        section = value()
+        expect(":")
+        if peek() == "[":
+            expect("[")
+            if peek() == "]":
+                expect("]")
+            else:
+                while True:
+                    yield section, value()
+                    if expect(",]") == "]":
+                        break
+        else:
+            value()
+        if expect(",}") == "}":
+            return
+
+
+def main(json_path: str, db_path: str) -> None:
+    print(f"📄 Leyendo: {json_path}")
+    with open(json_path, "r", encoding="utf-8") as f:
+        counts = import_json_records(iter_json_records(f), db_path)
+
+    print(
+        f"✅ Importación completada en {db_path} | clientes: {counts['customers']} | "
+        f"suministros: {counts['supplies']} | facturas: {counts['invoices']}"
+    )
+
+
+if __name__ == "__main__":
+
+    base = os.path.join(os.path.dirname(__file__), "..", "data")
+    json_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(base, "sample_data.json")
+    db_path = sys.argv[2] if len(sys.argv) > 2 else os.getenv("BILLING_DB_PATH", os.path.join(base, "billing.db"))
+
+    main(json_path, db_path)
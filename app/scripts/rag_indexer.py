@@ -1,18 +1,27 @@
 import os
-import re
+import json
+import time
 import uuid
+import queue
+import hashlib
+import itertools
+import threading
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
 from dataclasses import dataclass
-from typing import Iterable, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import numpy as np
 from tqdm import tqdm
 
 from pypdf import PdfReader
-from pdf2image import convert_from_path
-import pytesseract
 
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, PointIdsList, Filter, FieldCondition, MatchAny, HasIdCondition,
+)
+
+from src.rag.chunking import DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE, normalize_text, split_text
 
 
 # -----------------------------
@@ -20,12 +29,22 @@ from qdrant_client.models import Distance, VectorParams, PointStruct
 # -----------------------------
 COLLECTION_NAME = "clients_info_energix"
 
-DEFAULT_CHUNK_SIZE = 900      # ~caracteres, simple y estable
-DEFAULT_CHUNK_OVERLAP = 150   # solape para mantener contexto
-
 OCR_LANG = os.getenv("OCR_LANG", "spa")  # "spa" o "spa+eng"
 TESSERACT_CMD = os.getenv("TESSERACT_CMD")  # opcional: ruta binario tesseract
 
+# OCR solo en las páginas sin texto embebido (menos de OCR_MIN_PAGE_CHARS caracteres).
+# Primero se prueba a OCR_FAST_DPI; si el resultado es pobre se repite a OCR_DPI.
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+OCR_FAST_DPI = int(os.getenv("OCR_FAST_DPI", "200"))  # 0 o >= OCR_DPI: una sola pasada a OCR_DPI
+OCR_MIN_PAGE_CHARS = int(os.getenv("OCR_MIN_PAGE_CHARS", "40"))
+
+# Ficheros en vuelo por proceso del pool en modo paralelo (extracción + OCR de sus páginas)
+PDF_FILES_PER_WORKER = 2
+
+# Ids deterministas: el mismo chunk (fichero, página, posición y texto) siempre tiene el mismo id
+CHUNK_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "energix/rag-chunks")
+MANIFEST_VERSION = 1
+
 
 @dataclass
 class Chunk:
@@ -35,46 +54,17 @@ class Chunk:
     chunk_index: int
 
 
-def normalize_text(text: str) -> str:
-    text = text.replace("\u00ad", "")  # soft hyphen
-    text = re.sub(r"[ \t]+", " ", text)
-    text = re.sub(r"\n{3,}", "\n\n", text)
-    return text.strip()
-
-
-def split_text(text: str, chunk_size: int = DEFAULT_CHUNK_SIZE, overlap: int = DEFAULT_CHUNK_OVERLAP) -> List[str]:
+def split_page(text: str, chunk_size: int = DEFAULT_CHUNK_SIZE, overlap: int = DEFAULT_CHUNK_OVERLAP) -> List[str]:
     """
-    Chunker simple por caracteres, intentando cortar por saltos de línea / punto.
+    Trocea un texto con el chunker configurado (CHUNKER): "tokens" (src/rag/chunking.py,
+    por tokens del modelo y fin de frase; por defecto) o "chars" (split_text, chunk_size/overlap).
     """
-    text = normalize_text(text)
-    if not text:
-        return []
-
-    chunks = []
-    start = 0
-    n = len(text)
-
-    while start < n:
-        end = min(start + chunk_size, n)
+    from config.project_config import SETTINGS
 
-        # intenta “cerrar” el chunk en un separador razonable si no estamos al final
-        if end < n:
-            window = text[start:end]
-            cut = max(window.rfind("\n\n"), window.rfind("\n"), window.rfind(". "))
-            if cut > int(chunk_size * 0.6):
-                end = start + cut + 1
-
-        chunk = text[start:end].strip()
-        if chunk:
-            chunks.append(chunk)
-
-        # siguiente inicio con overlap
-        start = max(end - overlap, end)
-
-        if start == end:
-            break
-
-    return chunks
+    if SETTINGS.chunker == "chars":
+        return split_text(text, chunk_size=chunk_size, overlap=overlap)
+    from src.rag.chunking import chunk_text
+    return list(chunk_text(normalize_text(text)))
 
 
 def try_extract_text_pdf(pdf_path: str) -> List[Tuple[int, str]]:
@@ -92,38 +82,66 @@ def try_extract_text_pdf(pdf_path: str) -> List[Tuple[int, str]]:
     return pages_text
 
 
-def should_use_ocr(pages_text: List[Tuple[int, str]], min_chars_total: int = 200) -> bool:
-    total = sum(len(t) for _, t in pages_text)
-    return total < min_chars_total
+def pages_needing_ocr(pages_text: List[Tuple[int, str]], min_chars: int = OCR_MIN_PAGE_CHARS) -> List[int]:
+    """
+    Páginas sin texto embebido útil (escaneadas): solo estas se rasterizan.
+    """
+    return [page_num for page_num, text in pages_text if len(text) < min_chars]
+
+
+def _ocr_looks_poor(text: str, min_chars: int = OCR_MIN_PAGE_CHARS) -> bool:
+    # Poco texto o muchos "tokens" que no son palabras: señal de que hace falta más resolución
+    tokens = text.split()
+    if len(text) < min_chars or not tokens:
+        return True
+    words = sum(1 for t in tokens if len(t) > 1 and sum(ch.isalpha() for ch in t) >= len(t) * 0.7)
+    return words / len(tokens) < 0.5
 
 
-def ocr_pdf_to_text_by_page(pdf_path: str, dpi: int = 300) -> List[Tuple[int, str]]:
+def ocr_page(pdf_path: str, page_num: int, dpi: int = OCR_DPI) -> Tuple[int, str]:
     """
-    OCR página a página. Requiere poppler y tesseract.
+    OCR de una sola página (se rasteriza solo esa). Requiere poppler y tesseract.
     """
+    # Dependencias de OCR solo al usarlo: el resto del indexador no necesita poppler ni tesseract
+    from pdf2image import convert_from_path
+    import pytesseract
+
     if TESSERACT_CMD:
         pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
 
-    images = convert_from_path(pdf_path, dpi=dpi)
-    out = []
-    for i, img in enumerate(images):
-        text = pytesseract.image_to_string(img, lang=OCR_LANG)
-        out.append((i + 1, normalize_text(text)))
-    return out
+    images = convert_from_path(pdf_path, dpi=dpi, first_page=page_num, last_page=page_num)
+    text = pytesseract.image_to_string(images[0], lang=OCR_LANG) if images else ""
+    return page_num, normalize_text(text)
 
 
-def build_chunks_from_pdf(pdf_path: str, chunk_size: int, overlap: int) -> List[Chunk]:
-    pages_text = try_extract_text_pdf(pdf_path)
-    if should_use_ocr(pages_text):
-        pages_text = ocr_pdf_to_text_by_page(pdf_path)
+def ocr_page_adaptive(pdf_path: str, page_num: int) -> Tuple[int, str]:
+    """
+    Páginas sencillas (texto limpio) salen bien a OCR_FAST_DPI, con bastantes menos
+    píxeles que rasterizar y reconocer; las demás se repiten a OCR_DPI.
+    """
+    if 0 < OCR_FAST_DPI < OCR_DPI:
+        result = ocr_page(pdf_path, page_num, dpi=OCR_FAST_DPI)
+        if not _ocr_looks_poor(result[1]):
+            return result
+    return ocr_page(pdf_path, page_num, dpi=OCR_DPI)
+
+
+def merge_ocr_pages(pages_text: List[Tuple[int, str]], ocr_text: Dict[int, str]) -> List[Tuple[int, str]]:
+    # Si la página tenía algo de texto embebido (p. ej. solo la cabecera) se queda lo más completo
+    return [
+        (page_num, ocr_text[page_num] if len(ocr_text.get(page_num, "")) > len(text) else text)
+        for page_num, text in pages_text
+    ]
+
 
+def chunks_from_pages(pages_text: List[Tuple[int, str]], source_file: str, chunk_size: int, overlap: int) -> List[Chunk]:
     chunks: List[Chunk] = []
-    base = os.path.basename(pdf_path)
+    base = os.path.basename(source_file)
 
     for page_num, page_text in pages_text:
         if not page_text:
             continue
-        pieces = split_text(page_text, chunk_size=chunk_size, overlap=overlap)
+        pieces = split_page(page_text, chunk_size=chunk_size, overlap=overlap)
         for idx, piece in enumerate(pieces):
             chunks.append(
                 Chunk(
@@ -136,6 +154,130 @@ def build_chunks_from_pdf(pdf_path: str, chunk_size: int, overlap: int) -> List[
     return chunks
 
 
+def build_chunks_from_pdf(pdf_path: str, chunk_size: int, overlap: int) -> List[Chunk]:
+    pages_text = try_extract_text_pdf(pdf_path)
+    ocr_pages = pages_needing_ocr(pages_text)
+    if ocr_pages:
+        print(f"  -> OCR en {len(ocr_pages)}/{len(pages_text)} páginas de {os.path.basename(pdf_path)}")
+        pages_text = merge_ocr_pages(pages_text, dict(ocr_page_adaptive(pdf_path, n) for n in ocr_pages))
+    return chunks_from_pages(pages_text, pdf_path, chunk_size, overlap)
+
+
+def _init_ocr_worker() -> None:
+    # Un hilo de tesseract por proceso: el paralelismo lo da el pool
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+
+def iter_pdf_chunks(
+    pdf_paths: List[str], chunk_size: int, overlap: int, workers: int = 1,
+) -> Iterator[Tuple[str, List[Chunk]]]:
+    """
+    (pdf, chunks) de cada fichero. En modo secuencial, en el orden de pdf_paths.
+
+    Con workers > 1 usa un pool de procesos y devuelve cada fichero en cuanto está
+    listo (no en el orden de entrada). Hay como mucho workers * PDF_FILES_PER_WORKER
+    ficheros en vuelo: al terminar uno entra el siguiente, así que ni las tareas
+    pendientes ni el texto OCR ya reconocido crecen con el corpus. Cada página que
+    necesita OCR es una tarea independiente; dentro de un fichero las páginas se
+    juntan en orden, así que page / chunk_index son los mismos que en modo secuencial.
+    """
+    if workers <= 1 or not pdf_paths:
+        for pdf in pdf_paths:
+            yield pdf, build_chunks_from_pdf(pdf, chunk_size=chunk_size, overlap=overlap)
+        return
+
+    max_in_flight = max(1, workers * PDF_FILES_PER_WORKER)
+    todo = iter(pdf_paths)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_ocr_worker) as pool:
+        # future -> (pdf, None) para la extracción de texto, (pdf, página) para el OCR
+        owners: Dict[Future, Tuple[str, Optional[int]]] = {}
+        pages: Dict[str, List[Tuple[int, str]]] = {}    # texto embebido por fichero en vuelo
+        ocr_text: Dict[str, Dict[int, str]] = {}        # OCR ya hecho por fichero
+        ocr_left: Dict[str, int] = {}                   # páginas de OCR pendientes por fichero
+
+        def start_next() -> None:
+            pdf = next(todo, None)
+            if pdf is not None:
+                owners[pool.submit(try_extract_text_pdf, pdf)] = (pdf, None)
+
+        def finish(pdf: str) -> Tuple[str, List[Chunk]]:
+            pages_text = merge_ocr_pages(pages.pop(pdf), ocr_text.pop(pdf, {}))
+            ocr_left.pop(pdf, None)
+            start_next()
+            return pdf, chunks_from_pages(pages_text, pdf, chunk_size, overlap)
+
+        for _ in range(max_in_flight):
+            start_next()
+
+        while owners:
+            done, _ = wait(list(owners), return_when=FIRST_COMPLETED)
+            for future in done:
+                pdf, page_num = owners.pop(future)
+                if page_num is None:
+                    pages[pdf] = future.result()
+                    ocr_pages = pages_needing_ocr(pages[pdf])
+                    if not ocr_pages:
+                        yield finish(pdf)
+                        continue
+                    print(f"  -> OCR en {len(ocr_pages)}/{len(pages[pdf])} páginas de {os.path.basename(pdf)}")
+                    ocr_text[pdf], ocr_left[pdf] = {}, len(ocr_pages)
+                    for n in ocr_pages:
+                        owners[pool.submit(ocr_page_adaptive, pdf, n)] = (pdf, n)
+                else:
+                    num, text = future.result()
+                    ocr_text[pdf][num] = text
+                    ocr_left[pdf] -= 1
+                    if ocr_left[pdf] == 0:
+                        yield finish(pdf)
+
+
+def build_chunks_from_text(text: str, source_file: str, chunk_size: int, overlap: int) -> List[Chunk]:
+    """
+    Chunks de un documento de texto plano / Markdown (sin paginar: page=1).
+    """
+    pieces = split_page(text, chunk_size=chunk_size, overlap=overlap)
+    return [
+        Chunk(text=piece, source_file=os.path.basename(source_file), page=1, chunk_index=idx)
+        for idx, piece in enumerate(pieces)
+    ]
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def chunk_id(c: Chunk) -> str:
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{c.source_file}|{c.page}|{c.chunk_index}|{text_hash(c.text)}"))
+
+
+def chunk_payload(c: Chunk) -> dict:
+    return {
+        "chunk_id": chunk_id(c),
+        "text": c.text,
+        "source_file": c.source_file,
+        "page": c.page,
+        "chunk_index": c.chunk_index,
+        "collection": COLLECTION_NAME,
+    }
+
+
+def chunks_to_points(chunks: List[Chunk], vectors: Iterable[Iterable[float]]) -> List[PointStruct]:
+    points = []
+    for c, v in zip(chunks, vectors):
+        payload = chunk_payload(c)
+        # Reindexar el mismo chunk sobrescribe su punto en vez de duplicarlo
+        points.append(PointStruct(id=payload["chunk_id"], vector=np.asarray(v, dtype=np.float32).tolist(), payload=payload))
+    return points
+
+
 def ensure_collection(client: QdrantClient, collection: str, vector_size: int) -> None:
     existing = {c.name for c in client.get_collections().collections}
     if collection in existing:
@@ -148,59 +290,360 @@ def ensure_collection(client: QdrantClient, collection: str, vector_size: int) -
     )
 
 
-def batched(iterable: List[Chunk], batch_size: int) -> Iterable[List[Chunk]]:
-    for i in range(0, len(iterable), batch_size):
-        yield iterable[i : i + batch_size]
+def batched(iterable: Iterable[Chunk], batch_size: int) -> Iterator[List[Chunk]]:
+    # Perezoso: vale también para generadores (no materializa la secuencia)
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+# -----------------------------
+# Pipeline en streaming
+# -----------------------------
+# extracción + chunking -> [cola] -> embeddings por lotes -> [cola] -> subida
+# Las colas están acotadas: si una etapa va por detrás, la anterior espera, así
+# que en memoria solo hay unos pocos lotes sea cual sea el tamaño del corpus.
+
+PIPELINE_QUEUE_BATCHES = 4  # lotes en vuelo entre etapas
+
+
+class StageStats:
+    """Chunks y tiempo ocupado de una etapa, para medir su throughput."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.seconds = 0.0
+
+    @contextmanager
+    def timed(self, items: int = 0):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds += time.perf_counter() - t0
+            self.items += items
+
+    def __str__(self) -> str:
+        rate = self.items / self.seconds if self.seconds > 0 else 0.0
+        return f"{self.name}: {self.items} chunks en {self.seconds:.1f} s ({rate:.1f} chunks/s)"
+
+
+_END = object()
+
+
+def prefetch(iterable: Iterable[Any], maxsize: int, stats: Optional[StageStats] = None) -> Iterator[Any]:
+    """
+    Consume el iterable en un hilo, como mucho maxsize elementos por delante de quien lo lee.
+    Las excepciones del hilo se relanzan en el consumidor.
+    """
+    buffer: "queue.Queue" = queue.Queue(maxsize=max(1, maxsize))
+
+    def produce() -> None:
+        try:
+            iterator = iter(iterable)
+            while True:
+                t0 = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                if stats is not None:
+                    stats.seconds += time.perf_counter() - t0
+                    stats.items += 1
+                buffer.put(item)
+            buffer.put(_END)
+        except BaseException as e:
+            buffer.put(e)
+
+    threading.Thread(target=produce, name="indexer-prefetch", daemon=True).start()
+    while True:
+        item = buffer.get()
+        if item is _END:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+class BackgroundStage:
+    """
+    Hilo que aplica fn a lo que se le pasa con put(). put() bloquea cuando la cola
+    (acotada) está llena; close() espera a que termine y relanza su error, si lo hubo.
+    cancel() es para cuando ya se está propagando otra excepción: descarta lo que
+    quede en cola y para el hilo sin relanzar nada, para no tapar el error original.
+    """
+
+    def __init__(self, fn: Callable[[Any], None], maxsize: int, name: str):
+        self._fn = fn
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, maxsize))
+        self._error: Optional[BaseException] = None
+        self._cancelled = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                return
+            if self._error is None and not self._cancelled:  # tras un error se sigue vaciando la cola para no bloquear put()
+                try:
+                    self._fn(item)
+                except BaseException as e:
+                    self._error = e
+
+    def put(self, item: Any) -> None:
+        if self._error is not None:
+            raise self._error
+        self._queue.put(item)
+
+    def close(self) -> None:
+        self._queue.put(_END)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def cancel(self) -> None:
+        self._cancelled = True
+        self._queue.put(_END)
+        self._thread.join()
+
+
+# -----------------------------
+# Manifest (reindexado incremental)
+# -----------------------------
+# {"version", "config", "files": {source_file: {"sha256", "chunks": {chunk_id: sha256 del texto}}}}
+
+def load_manifest(path: Optional[str]) -> Optional[dict]:
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Manifest ilegible ({e}): reindexado completo.")
+        return None
+    return manifest if manifest.get("version") == MANIFEST_VERSION else None
+
+
+def save_manifest(path: str, config: dict, files: dict) -> None:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "config": config, "updated_at": time.time(), "files": files}, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def delete_qdrant_points(client: QdrantClient, chunk_ids: List[str], purge_files: List[str], keep_ids: List[str]) -> None:
+    if chunk_ids:
+        client.delete(collection_name=COLLECTION_NAME, points_selector=PointIdsList(points=list(chunk_ids)))
+    if purge_files:
+        # Reindexado completo: fuera cualquier punto de estos ficheros que no sea de esta pasada
+        # (incluidos los de versiones anteriores del indexador, con ids aleatorios)
+        client.delete(
+            collection_name=COLLECTION_NAME,
+            points_selector=Filter(
+                must=[FieldCondition(key="source_file", match=MatchAny(any=list(purge_files)))],
+                must_not=[HasIdCondition(has_id=list(keep_ids))] if keep_ids else None,
+            ),
+        )
+
+
+def iter_changed_chunks(
+    digests: Dict[str, str],
+    old_files: dict,
+    files: dict,
+    to_delete: List[str],
+    chunk_size: int,
+    overlap: int,
+    workers: int = 1,
+) -> Iterator[Chunk]:
+    """
+    Chunks nuevos o modificados de los ficheros de digests ({pdf: sha256}), fichero a fichero.
+    Va completando files (entradas del manifest) y to_delete (ids que ya no existen).
+    """
+    for pdf, chunks in iter_pdf_chunks(list(digests), chunk_size, overlap, workers):
+        name = os.path.basename(pdf)
+        old = old_files.get(name)
+        ids = [chunk_id(c) for c in chunks]
+        old_ids = set(old["chunks"]) if old is not None else set()
+        new_chunks = [c for c, cid in zip(chunks, ids) if cid not in old_ids]
+        to_delete.extend(old_ids - set(ids))
+        files[name] = {"sha256": digests[pdf], "chunks": {cid: text_hash(c.text) for c, cid in zip(chunks, ids)}}
+        print(f"\n📄 Procesado: {pdf} -> chunks generados: {len(chunks)} | nuevos o modificados: {len(new_chunks)}")
+        yield from new_chunks
 
 
 def main(
     pdf_paths: List[str],
-    qdrant_url: str,
-    qdrant_api_key: Optional[str] = None,
     chunk_size: int = DEFAULT_CHUNK_SIZE,
     chunk_overlap: int = DEFAULT_CHUNK_OVERLAP,
     batch_size: int = 64,
+    backend: str = "qdrant",
+    numpy_store_dir: Optional[str] = None,
+    bm25_index_path: Optional[str] = None,
+    manifest_path: Optional[str] = None,
+    full: bool = False,
+    workers: int = 1,
 ) -> None:
-    
-    from src.services.embeddings import embeddings_model, vector_size
+    """
+    Indexa los PDFs. Con manifest_path el reindexado es incremental:
+        - los ficheros con el mismo sha256 que en el manifest no se vuelven a extraer
+        - de los que cambian solo se embeben y suben los chunks nuevos o modificados
+        - se borran los puntos de chunks que ya no existen (o de ficheros quitados de pdf_paths)
+    full=True (o sin manifest, o con otro backend / chunking / modelo) reprocesa todo
+    y limpia cualquier punto anterior de esos ficheros.
+    workers > 1 reparte la extracción y el OCR (por página) en un pool de procesos.
+
+    Todo va en streaming: los chunks pasan por colas acotadas de la extracción a los
+    embeddings y de ahí a la subida (en segundo plano), así que la memoria no crece
+    con el corpus y la subida de un lote se solapa con el embedding del siguiente.
+    """
+    from config.project_config import SETTINGS
+    from src.services.embeddings import embed_documents_cached
+
+    t0 = time.perf_counter()
+    config = {
+        "backend": backend,
+        "collection": COLLECTION_NAME,
+        "chunker": SETTINGS.chunker,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "chunk_max_tokens": SETTINGS.chunk_max_tokens,
+        "chunk_overlap_tokens": SETTINGS.chunk_overlap_tokens,
+        "embedding_model": SETTINGS.embedding_model_name,
+    }
+    manifest = None if full else load_manifest(manifest_path)
+    if manifest is not None and manifest.get("config") != config:
+        print("La configuración no coincide con la del manifest: reindexado completo.")
+        manifest = None
+    incremental = manifest is not None
+    old_files = manifest["files"] if incremental else {}
+
+    files = {}
+    to_delete: List[str] = []
+
+    # Ficheros a (re)procesar: los que no están en el manifest con el mismo sha256
+    digests = {}
+    for pdf in pdf_paths:
+        name = os.path.basename(pdf)
+        digest = file_hash(pdf)
+        old = old_files.get(name)
+        if old is not None and old["sha256"] == digest:
+            print(f"\n⏭️  Sin cambios: {pdf}")
+            files[name] = old
+            continue
+        digests[pdf] = digest
 
-    # Qdrant client
-    client = QdrantClient(url=qdrant_url, api_key=qdrant_api_key)
-    ensure_collection(client, COLLECTION_NAME, vector_size)
+    names = {os.path.basename(pdf) for pdf in pdf_paths}
+    for name, old in old_files.items():
+        if name not in names:
+            print(f"\n🗑️  Fuera del corpus: {name} ({len(old['chunks'])} chunks)")
+            to_delete.extend(old["chunks"])
 
-    # Procesado
-    all_chunks: List[Chunk] = []
-    for pdf in pdf_paths:
-        print(f"\n📄 Procesando: {pdf}")
-        chunks = build_chunks_from_pdf(pdf, chunk_size=chunk_size, overlap=chunk_overlap)
-        print(f"  -> chunks generados: {len(chunks)}")
-        all_chunks.extend(chunks)
+    if incremental and not digests and not to_delete:
+        print(f"\n✅ Índice al día, nada que reindexar ({time.perf_counter() - t0:.1f} s).")
+        return
 
-    if not all_chunks:
+    # En reindexado completo se purga todo lo de estos ficheros salvo lo recién generado
+    purge_files = [] if incremental else sorted(names)
+
+    bm25 = None
+    if bm25_index_path:
+        from src.rag.bm25 import BM25Index
+        bm25 = BM25Index.load(bm25_index_path)
+        # Solo se guarda al final: se puede vaciar ya lo de los ficheros que se reprocesan enteros
+        bm25.remove(source_files=purge_files)
+
+    if backend == "numpy":
+        # Vector store local: se acumulan los vectores y se escribe el .npy una sola vez
+        from src.services.numpy_vector_store import NumpyVectorStore
+        numpy_store = NumpyVectorStore(numpy_store_dir, COLLECTION_NAME)
+        numpy_rows: List[Tuple[Chunk, List[float]]] = []
+    else:
+        # Cliente compartido de la app: QDRANT_URL / QDRANT_API_KEY, transporte (REST o gRPC),
+        # timeout y pool de conexiones salen de la misma configuración que usa la API
+        from src.services.vector_store import get_qdrant_client
+        client = get_qdrant_client()
+
+    extract_stats = StageStats("extracción")
+    embed_stats = StageStats("embeddings")
+    upload_stats = StageStats(f"subida {backend}")
+    progress = tqdm(desc=f"⬆️  Upsert {backend}", unit="chunk")
+
+    def upload(item: Tuple[List[Chunk], List[List[float]]]) -> None:
+        chunk_batch, vectors = item
+        with upload_stats.timed(len(chunk_batch)):
+            if backend == "numpy":
+                numpy_rows.extend(zip(chunk_batch, vectors))
+            else:
+                if not upload_stats.items:
+                    ensure_collection(client, COLLECTION_NAME, len(vectors[0]))
+                client.upsert(collection_name=COLLECTION_NAME, points=chunks_to_points(chunk_batch, vectors))
+            if bm25 is not None:
+                bm25.add([chunk_payload(c) for c in chunk_batch])
+        progress.update(len(chunk_batch))
+
+    # extracción (hilo + pool de procesos) -> embeddings (este hilo) -> subida (hilo)
+    chunks = prefetch(
+        iter_changed_chunks(digests, old_files, files, to_delete, chunk_size, chunk_overlap, workers),
+        maxsize=batch_size * PIPELINE_QUEUE_BATCHES,
+        stats=extract_stats,
+    )
+    uploader = BackgroundStage(upload, maxsize=PIPELINE_QUEUE_BATCHES, name="indexer-upload")
+    try:
+        for chunk_batch in batched(chunks, batch_size):
+            with embed_stats.timed(len(chunk_batch)):
+                # Caché en disco primero: el modelo solo se carga si hay textos nunca embebidos
+                vectors = embed_documents_cached([c.text for c in chunk_batch])
+            uploader.put((chunk_batch, vectors))
+        uploader.close()
+    except BaseException:
+        # Fallo embebiendo (o Ctrl-C): se relanza ese error, no el que pudiera tener la subida
+        uploader.cancel()
+        raise
+    finally:
+        progress.close()
+
+    n_indexed = upload_stats.items
+    if not incremental and n_indexed == 0:
         print("No se generaron chunks (¿PDFs vacíos o OCR fallando?).")
         return
-
-    # Upsert por lotes
-    for chunk_batch in tqdm(list(batched(all_chunks, batch_size)), desc="⬆️  Upsert Qdrant"):
-        texts = [c.text for c in chunk_batch]
-        vectors = embeddings_model.encode(texts, normalize_embeddings=True)
-        vectors = np.asarray(vectors, dtype=np.float32)
-
-        points = []
-        for c, v in zip(chunk_batch, vectors):
-            point_id = str(uuid.uuid4())
-            payload = {
-                "text": c.text,
-                "source_file": c.source_file,
-                "page": c.page,
-                "chunk_index": c.chunk_index,
-                "collection": COLLECTION_NAME,
-            }
-            points.append(PointStruct(id=point_id, vector=v.tolist(), payload=payload))
-
-        client.upsert(collection_name=COLLECTION_NAME, points=points)
-
-    print(f"\n✅ Ingest completado. Colección: {COLLECTION_NAME} | Total chunks: {len(all_chunks)}")
+    keep_ids = [cid for f in files.values() for cid in f["chunks"]]
+
+    # Borrado de chunks obsoletos, después de subir los nuevos para no dejar huecos
+    if backend == "numpy":
+        numpy_store.update(
+            [v for _, v in numpy_rows], [chunk_payload(c) for c, _ in numpy_rows],
+            delete_ids=to_delete, delete_sources=purge_files,
+        )
+    else:
+        delete_qdrant_points(client, to_delete, purge_files, keep_ids)
+
+    # Índice léxico BM25 con los mismos chunks (búsqueda híbrida en la API)
+    if bm25 is not None:
+        bm25.remove(chunk_ids=to_delete)
+        bm25.save()
+        print(f"  -> índice BM25: {len(bm25)} chunks en {bm25_index_path}")
+
+    if manifest_path:
+        save_manifest(manifest_path, config, files)
+
+    # Invalida la caché semántica de la API (respuestas calculadas con el índice anterior)
+    from src.rag.cache import mark_index_updated
+    mark_index_updated()
+
+    elapsed = time.perf_counter() - t0
+    print(f"\n⏱️  {extract_stats} | {embed_stats} | {upload_stats}")
+    print(
+        f"✅ Ingest completado ({'incremental' if incremental else 'completo'}). Colección: {COLLECTION_NAME} | "
+        f"Total chunks: {len(keep_ids)} | Embebidos: {n_indexed} | Borrados: {len(to_delete)} | "
+        f"{elapsed:.1f} s ({n_indexed / elapsed if elapsed > 0 else 0.0:.1f} chunks/s)"
+    )
 
 
 if __name__ == "__main__":
@@ -213,11 +656,21 @@ if __name__ == "__main__":
         "app/data/pdfs/FAQs_Energix (1).pdf"
     ]
 
-    QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
-    QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
+    VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "qdrant").strip().lower()
+    NUMPY_STORE_DIR = os.getenv("NUMPY_STORE_DIR", str(Path(__file__).parent.parent / "data" / "vector_store"))
+    BM25_INDEX_PATH = os.getenv("BM25_INDEX_PATH", str(Path(__file__).parent.parent / "data" / "bm25_index.json"))
+    INDEX_MANIFEST_PATH = os.getenv("INDEX_MANIFEST_PATH", str(Path(__file__).parent.parent / "data" / "index_manifest.json"))
+    # INDEX_MODE=full reprocesa todos los PDFs aunque no hayan cambiado
+    INDEX_MODE = os.getenv("INDEX_MODE", "incremental").strip().lower()
+    # Procesos para extracción / OCR (1 = secuencial)
+    INDEX_WORKERS = int(os.getenv("INDEX_WORKERS", str(os.cpu_count() or 1)))
 
     main(
         pdf_paths=pdfs,
-        qdrant_url=QDRANT_URL,
-        qdrant_api_key=QDRANT_API_KEY,
+        backend=VECTOR_STORE_BACKEND,
+        numpy_store_dir=NUMPY_STORE_DIR,
+        bm25_index_path=BM25_INDEX_PATH,
+        manifest_path=INDEX_MANIFEST_PATH,
+        full=INDEX_MODE == "full",
+        workers=INDEX_WORKERS,
     )
@@ -1,12 +1,43 @@
+from langchain_core.documents import Document
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 
-from src.services.llms import llm_langchain
-from src.services.vector_store import qdrant_langchain
+from src.services.llms import get_llm, get_cheap_llm
+from src.services.vector_store import (
+    similarity_search_with_score_by_vector,
+    asimilarity_search_with_score_by_vector, asimilarity_search_batch,
+)
+from src.services.query_embeddings import query_embedder
 
+from src.rag.bm25 import BM25Index, reciprocal_rank_fusion
 from src.agent.prompts import rag_prompt
+from config.project_config import SETTINGS
 
-answer_generation_chain = rag_prompt | llm_langchain | StrOutputParser()
+# Rutas de respuesta (se devuelven en QueryResponse.answer_path)
+ANSWER_PATH_LLM = "llm"
+ANSWER_PATH_LLM_CHEAP = "llm_cheap"
+ANSWER_PATH_NO_CONTEXT = "no_context"
+
+# Cadenas e índices se crean en el primer uso (o en el warm-up de arranque), no al importar
+_answer_chains = {}
+_bm25_index = None
+
+def get_answer_generation_chain():
+    if "default" not in _answer_chains:
+        _answer_chains["default"] = rag_prompt | get_llm() | StrOutputParser()
+    return _answer_chains["default"]
+
+def get_cheap_answer_generation_chain():
+    if "cheap" not in _answer_chains:
+        _answer_chains["cheap"] = rag_prompt | get_cheap_llm() | StrOutputParser()
+    return _answer_chains["cheap"]
+
+def get_bm25_index():
+    """Índice léxico que construye el indexador; si no existe, la búsqueda es solo densa."""
+    global _bm25_index
+    if _bm25_index is None and SETTINGS.rag_hybrid_enabled:
+        _bm25_index = BM25Index.load(SETTINGS.bm25_index_path)
+    return _bm25_index
 
 def format_docs(input_dict) -> str:
     """Formatea los documentos recuperados en una sola cadena de contexto."""
@@ -21,26 +52,159 @@ def format_docs(input_dict) -> str:
         return "\n\n".join(str(d) for d in docs)
     return "No se pudo procesar el formato de los documentos."
 
-def get_sources_info(question: str, k: int = None, threshold: float = None) -> list:
-    results = qdrant_langchain.similarity_search_with_score(question, k=k)
+def _source_dict(doc, score) -> dict:
+    metadata = doc.metadata if hasattr(doc, "metadata") else {}
+    return {
+        "score": score,
+        "chunk_id": metadata.get("_id", metadata.get("chunk_id")),
+        "page": metadata.get("page"),
+        "section": doc.page_content[:300] if hasattr(doc, "page_content") else "",
+        "source": metadata.get("source", metadata.get("source_file")),
+        "filename": metadata.get("filename"),
+        "collection_name": metadata.get("_collection_name"),
+    }
+
+def filter_sources(results: list, threshold: float = None) -> list:
+    """(Document, score) de Qdrant -> dicts de fuentes, ordenados por score y filtrados por threshold."""
     results = sorted(results, key=lambda x: x[1], reverse=True)
     if threshold is not None:
         filtered_results = [(doc, score) for doc, score in results if score >= threshold]
     else:
         filtered_results = results
-    docs_filtered = []
-    for doc, score in filtered_results:
-        metadata = doc.metadata if hasattr(doc, "metadata") else {}
-        docs_filtered.append({
-            "score": score,
-            "chunk_id": metadata.get("_id"),
-            "page": None,
-            "section": doc.page_content[:300] if hasattr(doc, "page_content") else "",
-            "source": metadata.get("source"),
-            "filename": metadata.get("filename"),
-            "collection_name": metadata.get("_collection_name"),
-        })
-    return docs_filtered
+    return [_source_dict(doc, score) for doc, score in filtered_results]
+
+def _use_hybrid() -> bool:
+    bm25_index = get_bm25_index()
+    if bm25_index is None:
+        return False
+    # El índice puede haberse creado (o vaciado) después de arrancar la API
+    bm25_index.reload_if_changed()
+    return len(bm25_index) > 0
+
+def _dense_k(k: int) -> int:
+    # En modo híbrido se piden más candidatos densos para la fusión y luego se corta a k
+    return max(k or SETTINGS.k_docs, SETTINGS.rag_hybrid_candidates) if _use_hybrid() else k
+
+def _fusion_key(metadata: dict, text: str) -> str:
+    return (metadata or {}).get("chunk_id") or text
+
+def fuse_sources(question: str, dense_results: list, k: int, threshold: float = None) -> list:
+    """
+    Combina la lista densa (ya filtrada por threshold) con BM25 mediante reciprocal rank fusion.
+    score sigue siendo la similitud densa (None si el documento solo lo encontró BM25).
+    """
+    k = k or SETTINGS.k_docs
+    dense = filter_sources(dense_results, threshold)
+    if not _use_hybrid():
+        return dense[:k]
+    lexical = get_bm25_index().search(question, k=SETTINGS.rag_hybrid_candidates, min_score=SETTINGS.rag_bm25_min_score)
+    if not lexical:
+        return dense[:k]
+
+    # Se identifica cada chunk por su chunk_id (el mismo en Qdrant, numpy y BM25); sin él, por su texto
+    by_key = {}
+    for doc, score in sorted(dense_results, key=lambda x: x[1], reverse=True):
+        if threshold is None or score >= threshold:
+            by_key.setdefault(_fusion_key(doc.metadata, doc.page_content), _source_dict(doc, score))
+    dense_ranking = list(by_key)
+    lexical_ranking = []
+    for payload, bm25_score in lexical:
+        text = payload.get("text", "")
+        key = _fusion_key(payload, text)
+        if key not in by_key:
+            metadata = {name: v for name, v in payload.items() if name != "text"}
+            by_key[key] = _source_dict(Document(page_content=text, metadata=metadata), None)
+        by_key[key]["bm25_score"] = round(bm25_score, 4)
+        lexical_ranking.append(key)
+
+    fused = reciprocal_rank_fusion([dense_ranking, lexical_ranking], rrf_k=SETTINGS.rag_rrf_k)
+    out = []
+    for key, rrf_score in sorted(fused.items(), key=lambda x: x[1], reverse=True)[:k]:
+        by_key[key]["rrf_score"] = round(rrf_score, 6)
+        out.append(by_key[key])
+    return out
+
+def get_sources_info(question: str, k: int = None, threshold: float = None, question_vector: list = None) -> list:
+    # Si ya tenemos el embedding de la pregunta no se vuelve a calcular
+    if question_vector is None:
+        question_vector = query_embedder.embed(question)
+    results = similarity_search_with_score_by_vector(question_vector, _dense_k(k))
+    return fuse_sources(question, results, k, threshold)
+
+async def aget_sources_info(question: str, k: int = None, threshold: float = None, question_vector: list = None) -> list:
+    """Versión async de get_sources_info: la búsqueda en Qdrant no bloquea el event loop."""
+    if question_vector is None:
+        question_vector = await query_embedder.aembed(question)
+    results = await asimilarity_search_with_score_by_vector(question_vector, _dense_k(k))
+    return fuse_sources(question, results, k, threshold)
+
+async def aget_sources_info_batch(questions: list, question_vectors: list, ks: list, thresholds: list) -> list:
+    if not question_vectors:
+        return []
+    results_list = await asimilarity_search_batch(question_vectors, [_dense_k(k) for k in ks])
+    return [
+        fuse_sources(question, results, k, threshold)
+        for question, results, k, threshold in zip(questions, results_list, ks, thresholds)
+    ]
+
+def top_score(docs: list):
+    """Mejor similitud densa entre las fuentes (las que solo encontró BM25 no tienen)."""
+    scores = [d["score"] for d in docs if d.get("score") is not None]
+    return max(scores) if scores else None
+
+def select_answer_path(docs: list, threshold: float = None) -> str:
+    """
+    Decide cómo responder según los documentos que han pasado el threshold:
+        - ninguno -> respuesta fija sin LLM (si RAG_SHORT_CIRCUIT)
+        - el mejor por debajo de threshold + RAG_LOW_CONFIDENCE_BAND -> modelo barato
+        - resto -> LLM normal
+    """
+    if not docs:
+        return ANSWER_PATH_NO_CONTEXT if SETTINGS.rag_short_circuit else ANSWER_PATH_LLM
+    band = SETTINGS.rag_low_confidence_band
+    best = top_score(docs)
+    if band > 0 and threshold is not None and (best is None or best < threshold + band):
+        return ANSWER_PATH_LLM_CHEAP
+    return ANSWER_PATH_LLM
+
+def get_generation_chain(input_dict: dict, path: str):
+    """
+    Cadena de generación y su entrada para la ruta elegida (None en no_context).
+    La usan generate_answer (invoke) y el endpoint de streaming (astream).
+    """
+    if path == ANSWER_PATH_NO_CONTEXT:
+        return None, input_dict
+    if path == ANSWER_PATH_LLM_CHEAP:
+        # Solo el mejor documento: menos tokens de entrada
+        return get_cheap_answer_generation_chain(), {**input_dict, "context": format_docs({"source_context": input_dict["source_context"][:1]})}
+    return get_answer_generation_chain(), input_dict
+
+def generate_answer(input_dict: dict) -> dict:
+    docs = input_dict["source_context"]
+    path = select_answer_path(docs, input_dict.get("threshold"))
+    chain, chain_input = get_generation_chain(input_dict, path)
+    answer = chain.invoke(chain_input) if chain is not None else SETTINGS.rag_no_info_answer
+    return {
+        **input_dict,
+        "answer": answer,
+        "answer_path": path,
+        "top_score": top_score(docs),
+    }
+
+async def agenerate_answer(input_dict: dict) -> dict:
+    docs = input_dict["source_context"]
+    path = select_answer_path(docs, input_dict.get("threshold"))
+    chain, chain_input = get_generation_chain(input_dict, path)
+    answer = await chain.ainvoke(chain_input) if chain is not None else SETTINGS.rag_no_info_answer
+    return {
+        **input_dict,
+        "answer": answer,
+        "answer_path": path,
+        "top_score": top_score(docs),
+    }
+
+# Paso de generación: invoke/ainvoke/abatch usan la versión sync o async según corresponda
+answer_step = RunnableLambda(generate_answer, afunc=agenerate_answer)
 
 # Cadena principal para una única intención
 rag_chain = (
@@ -49,12 +213,18 @@ rag_chain = (
             lambda input_dict: get_sources_info(
                 input_dict['question'],
                 k=input_dict.get('k_docs'),
-                threshold=input_dict.get('threshold')
-            )
+                threshold=input_dict.get('threshold'),
+                question_vector=input_dict.get('question_vector')
+            ),
+            # ainvoke/abatch: retrieval async con el cliente Qdrant compartido
+            afunc=lambda input_dict: aget_sources_info(
+                input_dict['question'],
+                k=input_dict.get('k_docs'),
+                threshold=input_dict.get('threshold'),
+                question_vector=input_dict.get('question_vector')
+            ),
         )
     )
     .assign(context=RunnableLambda(format_docs))
-    .assign(answer=RunnableLambda(
-        lambda input_dict: answer_generation_chain.invoke(input_dict)
-    ))
+    | answer_step
 ).with_types(input_type=dict, output_type=dict)
\ No newline at end of file
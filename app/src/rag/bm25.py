@@ -0,0 +1,215 @@
+import os
+import re
+import json
+import math
+import heapq
+import threading
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+"""
+
+ÍNDICE LÉXICO BM25
+
+    Complementa la búsqueda densa: los términos exactos (cláusulas del contrato,
+    nombres de tarifas, siglas) que MiniLM recupera mal sí aparecen aquí.
+
+        - lo construye scripts/rag_indexer.py (y la ingesta en segundo plano) con
+          los mismos chunks que se suben al vector store, y se guarda en un JSON
+          con el índice invertido ya calculado
+        - en la API se carga una vez y se recarga si el fichero cambia
+        - una búsqueda solo recorre las listas de los términos de la pregunta,
+          así que es barata incluso en cada consulta
+
+    Cada chunk se identifica por su chunk_id (el mismo id que el punto en el
+    vector store): añadir un chunk que ya existe lo sustituye y remove() borra
+    por id o por fichero, así que reindexar no duplica documentos.
+
+    reciprocal_rank_fusion combina varias listas ordenadas (p. ej. densa + BM25)
+    sumando 1 / (rrf_k + posición) de cada documento en cada lista.
+
+"""
+
+CHUNK_ID_KEY = "chunk_id"
+SOURCE_FILE_KEY = "source_file"
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Palabras vacías en español: no aportan al ranking léxico
+STOPWORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes como con contra cual cuales cuando de del desde
+donde durante e el ella ellas ello ellos en entre era es esa esas ese eso esos esta estas este esto estos
+fue ha hay la las le les lo los me mi mis mucho muy mas ni no nos o os otra otro para pero poco por porque
+que quien se sea segun ser si sin sobre su sus tambien tan te tiene tu tus un una uno unos y ya yo puedo
+puede quiero saber tengo
+""".split())
+
+
+# (docs, doc_lens, postings, total_len)
+State = Tuple[List[Dict[str, Any]], List[int], Dict[str, List[Tuple[int, int]]], int]
+
+
+def tokenize(text: str) -> List[str]:
+    # Minúsculas y sin tildes: "Tarifa Óptima" y "tarifa optima" son el mismo término
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return [t for t in TOKEN_RE.findall(text) if t not in STOPWORDS and (len(t) > 1 or t.isdigit())]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], rrf_k: int = 60) -> Dict[str, float]:
+    """Claves de cada ranking (mejor primero) -> score RRF combinado."""
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            fused[key] = fused.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    return fused
+
+
+class BM25Index:
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+
+        self._lock = threading.Lock()
+        # (docs, doc_lens, postings, total_len) en una sola tupla: una recarga o un
+        # rebuild la sustituyen con una asignación y search() la lee una vez, así que
+        # nunca mezcla los docs de una versión con las listas de otra
+        self._state: State = ([], [], {}, 0)
+        self._ids = set()  # chunk_id de los documentos, para sustituir sin recorrer docs
+        self._mtime = -1.0
+
+    @property
+    def docs(self) -> List[Dict[str, Any]]:
+        return self._state[0]
+
+    @property
+    def doc_lens(self) -> List[int]:
+        return self._state[1]
+
+    @property
+    def postings(self) -> Dict[str, List[Tuple[int, int]]]:
+        return self._state[2]
+
+    # --- construcción ---
+
+    def _extend(self, state: State, payloads: Sequence[Dict[str, Any]], text_key: str) -> State:
+        # Solo añade al final: los doc_id que ya ve un lector siguen siendo válidos
+        docs, doc_lens, postings, total_len = state
+        for payload in payloads:
+            doc_id = len(docs)
+            terms = Counter(tokenize(payload.get(text_key, "")))
+            docs.append(dict(payload))
+            if payload.get(CHUNK_ID_KEY) is not None:
+                self._ids.add(payload[CHUNK_ID_KEY])
+            doc_lens.append(sum(terms.values()))
+            total_len += doc_lens[-1]
+            for term, tf in terms.items():
+                postings.setdefault(term, []).append((doc_id, tf))
+        return docs, doc_lens, postings, total_len
+
+    def _rebuild(self, docs: List[Dict[str, Any]], text_key: str) -> None:
+        # Los doc_id son posiciones: al quitar documentos se recalculan las listas (en otras nuevas)
+        self._ids = set()
+        self._state = self._extend(([], [], {}, 0), docs, text_key)
+
+    def add(self, payloads: Sequence[Dict[str, Any]], text_key: str = "text") -> None:
+        """Añade chunks. Los que ya estaban (mismo chunk_id) se sustituyen."""
+        with self._lock:
+            ids = {p.get(CHUNK_ID_KEY) for p in payloads} - {None}
+            if not ids.isdisjoint(self._ids):
+                self._rebuild([d for d in self.docs if d.get(CHUNK_ID_KEY) not in ids], text_key)
+            self._state = self._extend(self._state, payloads, text_key)
+
+    def remove(self, chunk_ids: Iterable[str] = (), source_files: Iterable[str] = (), text_key: str = "text") -> int:
+        """Borra los chunks con esos chunk_id o de esos ficheros. Devuelve cuántos se han borrado."""
+        ids, sources = set(chunk_ids), set(source_files)
+        with self._lock:
+            if not sources and ids.isdisjoint(self._ids):
+                return 0
+            keep = [
+                d for d in self.docs
+                if d.get(CHUNK_ID_KEY) not in ids and d.get(SOURCE_FILE_KEY) not in sources
+            ]
+            removed = len(self.docs) - len(keep)
+            if removed:
+                self._rebuild(keep, text_key)
+            return removed
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    # --- persistencia ---
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock:
+            docs, doc_lens, postings, _ = self._state
+            data = {
+                "k1": self.k1,
+                "b": self.b,
+                "docs": docs,
+                "doc_lens": doc_lens,
+                "postings": postings,
+            }
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, path)
+            self._mtime = os.stat(path).st_mtime
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Carga el índice si existe; si no, devuelve uno vacío asociado a esa ruta."""
+        index = cls(path)
+        index.reload_if_changed()
+        return index
+
+    def reload_if_changed(self) -> None:
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except (OSError, TypeError):
+            return
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.k1 = data.get("k1", self.k1)
+            self.b = data.get("b", self.b)
+            docs, doc_lens = data["docs"], data["doc_lens"]
+            postings = {term: [tuple(p) for p in plist] for term, plist in data["postings"].items()}
+            self._ids = {d[CHUNK_ID_KEY] for d in docs if d.get(CHUNK_ID_KEY) is not None}
+            self._state = (docs, doc_lens, postings, sum(doc_lens))
+            self._mtime = mtime
+
+    # --- búsqueda ---
+
+    def search(self, query: str, k: int = 10, min_score: float = 0.0) -> List[Tuple[Dict[str, Any], float]]:
+        """Top-k (payload, score BM25) para la pregunta."""
+        self.reload_if_changed()
+        docs, doc_lens, postings, total_len = self._state
+        n = len(docs)
+        if n == 0:
+            return []
+        avgdl = (total_len / n) or 1.0
+
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            plist = postings.get(term)
+            if not plist:
+                continue
+            df = len(plist)
+            idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            for doc_id, tf in plist:
+                norm = self.k1 * (1.0 - self.b + self.b * doc_lens[doc_id] / avgdl)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1.0) / (tf + norm)
+
+        best = heapq.nlargest(k, scores.items(), key=lambda x: x[1])
+        return [(docs[doc_id], score) for doc_id, score in best if score >= min_score]
@@ -0,0 +1,178 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Optional, Sequence
+
+import numpy as np
+
+from src.rag.schema import QueryResponse
+from config.project_config import SETTINGS
+
+
+"""
+
+CACHÉ SEMÁNTICA DE RESPUESTAS RAG
+
+    Las preguntas de Info.General suelen ser paráfrasis de las mismas FAQs.
+    Antes de recuperar documentos y llamar al LLM se busca una pregunta ya
+    respondida cuyo embedding esté a distancia coseno <= max_distance; si existe,
+    se devuelve su QueryResponse.
+
+        - LRU con tamaño máximo (max_entries) y caducidad por TTL
+        - solo coinciden entradas con los mismos parámetros (k_docs, threshold)
+        - se invalida entera cuando se reindexa la colección: el indexador
+          actualiza el fichero de marca (mark_index_updated) y la caché compara
+          su mtime en cada consulta
+        - contadores de aciertos/fallos en stats()
+
+"""
+
+
+def mark_index_updated(stamp_path: str = SETTINGS.rag_index_stamp_path) -> None:
+    """Marca la colección como reindexada para que las cachés se invaliden."""
+    os.makedirs(os.path.dirname(stamp_path), exist_ok=True)
+    with open(stamp_path, "a", encoding="utf-8"):
+        pass
+    now = time.time()
+    os.utime(stamp_path, (now, now))
+
+
+def _index_stamp(stamp_path: str) -> float:
+    try:
+        return os.stat(stamp_path).st_mtime
+    except OSError:
+        return 0.0
+
+
+@dataclass
+class _CacheEntry:
+    vector: np.ndarray
+    params: Hashable
+    response: QueryResponse
+    created_at: float
+
+
+class SemanticCache:
+
+    def __init__(
+        self,
+        max_entries: int = SETTINGS.semantic_cache_max_entries,
+        ttl_seconds: float = SETTINGS.semantic_cache_ttl,
+        max_distance: float = SETTINGS.semantic_cache_max_distance,
+        stamp_path: str = SETTINGS.rag_index_stamp_path,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self.stamp_path = stamp_path
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, _CacheEntry]" = OrderedDict()
+        self._next_id = 0
+        # Matriz (n, dim) con los embeddings normalizados, reconstruida solo tras cambios
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_ids: list = []
+        self._stamp = _index_stamp(stamp_path)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(vector: Sequence[float]) -> np.ndarray:
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm > 0 else v
+
+    def _check_stamp(self) -> None:
+        stamp = _index_stamp(self.stamp_path)
+        if stamp != self._stamp:
+            self._stamp = stamp
+            self._clear()
+            self.invalidations += 1
+
+    def _clear(self) -> None:
+        self._entries.clear()
+        self._matrix = None
+        self._matrix_ids = []
+
+    def _evict_expired(self, now: float) -> None:
+        expired = [eid for eid, e in self._entries.items() if now - e.created_at > self.ttl_seconds]
+        for eid in expired:
+            del self._entries[eid]
+        if expired:
+            self.evictions += len(expired)
+            self._matrix = None
+
+    def _get_matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            self._matrix_ids = list(self._entries.keys())
+            if self._matrix_ids:
+                self._matrix = np.stack([self._entries[eid].vector for eid in self._matrix_ids])
+            else:
+                self._matrix = np.empty((0, 0), dtype=np.float32)
+        return self._matrix
+
+    def lookup(self, vector: Sequence[float], params: Hashable = None) -> Optional[QueryResponse]:
+        query = self._normalize(vector)
+        now = time.time()
+        with self._lock:
+            self._check_stamp()
+            self._evict_expired(now)
+
+            matrix = self._get_matrix()
+            if matrix.size:
+                distances = 1.0 - matrix @ query
+                # Recorremos de más cercano a más lejano hasta encontrar los mismos parámetros
+                for idx in np.argsort(distances):
+                    if distances[idx] > self.max_distance:
+                        break
+                    entry = self._entries[self._matrix_ids[idx]]
+                    if entry.params == params:
+                        self._entries.move_to_end(self._matrix_ids[idx])
+                        self.hits += 1
+                        return entry.response
+
+            self.misses += 1
+            return None
+
+    def store(self, vector: Sequence[float], response: QueryResponse, params: Hashable = None) -> None:
+        with self._lock:
+            self._check_stamp()
+            self._entries[self._next_id] = _CacheEntry(
+                vector=self._normalize(vector),
+                params=params,
+                response=response,
+                created_at=time.time(),
+            )
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._matrix = None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "max_distance": self.max_distance,
+            }
+
+
+semantic_cache = SemanticCache()
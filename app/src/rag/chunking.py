@@ -0,0 +1,233 @@
+import re
+import threading
+from collections import deque
+from typing import Deque, Iterator, List, Optional, Tuple
+
+from config.project_config import SETTINGS
+
+
+"""
+
+CHUNKER POR TOKENS
+
+    Trocea el texto midiendo el tamaño en tokens del tokenizer del modelo de
+    embeddings, no en caracteres: un chunk que pasa de la ventana del modelo
+    (256 tokens en all-MiniLM-L6-v2) se trunca en silencio al embeberlo y lo
+    que queda fuera no se puede recuperar.
+
+        - el texto se tokeniza una sola vez (offsets de cada token) y se recorre
+          una vez: cada frase o párrafo sabe cuántos tokens tiene con un puntero
+          que solo avanza, así que el coste es lineal en la longitud del texto
+        - los cortes caen en fin de frase o de párrafo; si un párrafo termina con
+          el chunk ya razonablemente lleno, se corta ahí
+        - una frase más larga que la ventana se parte por tokens (en inicio de palabra)
+        - el solape son las últimas frases del chunk anterior, hasta overlap_tokens
+        - chunk_text es un generador: no materializa la lista de chunks
+
+    Si transformers no está disponible se usa una aproximación conservadora
+    (trozos de hasta 4 caracteres por token), que sobreestima el número de tokens.
+
+    split_text es el chunker por caracteres original (CHUNKER=chars); vive aquí,
+    sin dependencias de OCR, para que el indexador y el benchmark lo compartan.
+
+"""
+
+PARAGRAPH_RE = re.compile(r"\n[ \t]*\n\s*")
+# Fin de frase: . ! ? … (con comillas o paréntesis de cierre) seguido de espacio
+SENTENCE_END_RE = re.compile(r"(?:(?<=[.!?…])|(?<=[.!?…][\"'»)\]]))\s+")
+FALLBACK_TOKEN_RE = re.compile(r"\w{1,4}|[^\w\s]", re.UNICODE)
+
+# Si termina un párrafo con el chunk por encima de esta fracción de la ventana, se corta ahí
+PARAGRAPH_CUT_FILL = 0.6
+
+DEFAULT_CHUNK_SIZE = 900      # ~caracteres, simple y estable (CHUNKER=chars)
+DEFAULT_CHUNK_OVERLAP = 150   # solape para mantener contexto
+
+
+def normalize_text(text: str) -> str:
+    text = text.replace("\u00ad", "")  # soft hyphen
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+def split_text(text: str, chunk_size: int = DEFAULT_CHUNK_SIZE, overlap: int = DEFAULT_CHUNK_OVERLAP) -> List[str]:
+    """
+    Chunker simple por caracteres, intentando cortar por saltos de línea / punto.
+    """
+    text = normalize_text(text)
+    if not text:
+        return []
+
+    chunks = []
+    start = 0
+    n = len(text)
+
+    while start < n:
+        end = min(start + chunk_size, n)
+
+        # intenta “cerrar” el chunk en un separador razonable si no estamos al final
+        if end < n:
+            window = text[start:end]
+            cut = max(window.rfind("\n\n"), window.rfind("\n"), window.rfind(". "))
+            if cut > int(chunk_size * 0.6):
+                end = start + cut + 1
+
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+
+        if end >= n:
+            break
+
+        # siguiente inicio con overlap (siempre avanzando)
+        start = max(end - overlap, start + 1)
+
+    return chunks
+
+
+
+class TokenCounter:
+    """Offsets de los tokens de un texto con el tokenizer del modelo (o una aproximación)."""
+
+    def __init__(self, model_name: Optional[str] = None):
+        self.model_name = model_name
+        self.tokenizer = None
+        self.special_tokens = 0
+        if model_name:
+            try:
+                from transformers import AutoTokenizer
+                self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+                # [CLS] / [SEP]: también ocupan ventana
+                self.special_tokens = self.tokenizer.num_special_tokens_to_add()
+            except Exception as e:
+                print(f"TokenCounter: no se pudo cargar el tokenizer de {model_name} ({e}); se usa una aproximación.")
+                self.tokenizer = None
+
+    def starts(self, text: str) -> List[int]:
+        """Posición (en caracteres) donde empieza cada token del texto."""
+        if self.tokenizer is None:
+            return [m.start() for m in FALLBACK_TOKEN_RE.finditer(text)]
+        encoding = self.tokenizer(
+            text, add_special_tokens=False, return_offsets_mapping=True, truncation=False, verbose=False,
+        )
+        return [start for start, _ in encoding["offset_mapping"]]
+
+    def count(self, text: str) -> int:
+        return len(self.starts(text))
+
+
+_counters = {}
+_counters_lock = threading.Lock()
+
+
+def get_token_counter(model_name: Optional[str] = None) -> TokenCounter:
+    """TokenCounter del modelo de embeddings (se carga una vez por proceso)."""
+    model_name = model_name or SETTINGS.embedding_model_name
+    if model_name not in _counters:
+        with _counters_lock:
+            if model_name not in _counters:
+                _counters[model_name] = TokenCounter(model_name)
+    return _counters[model_name]
+
+
+def iter_segments(text: str) -> Iterator[Tuple[int, int, bool]]:
+    """(inicio, fin, termina_párrafo) de cada frase del texto, en una sola pasada."""
+    pos = 0
+    for paragraph in PARAGRAPH_RE.finditer(text + "\n\n"):
+        end_paragraph = paragraph.start()
+        segment_start = pos
+        for sentence in SENTENCE_END_RE.finditer(text, pos, end_paragraph):
+            if sentence.start() > segment_start:
+                yield segment_start, sentence.start(), False
+            segment_start = sentence.end()
+        if end_paragraph > segment_start:
+            yield segment_start, end_paragraph, True
+        pos = min(paragraph.end(), len(text))
+
+
+def chunk_text(
+    text: str,
+    max_tokens: Optional[int] = None,
+    overlap_tokens: Optional[int] = None,
+    counter: Optional[TokenCounter] = None,
+) -> Iterator[str]:
+    """
+    Genera chunks de como mucho max_tokens tokens (incluidos los especiales del modelo)
+    cortando en fin de frase / párrafo, con overlap_tokens de solape entre chunks seguidos.
+    """
+    max_tokens = max_tokens or SETTINGS.chunk_max_tokens
+    overlap_tokens = SETTINGS.chunk_overlap_tokens if overlap_tokens is None else overlap_tokens
+    counter = counter or get_token_counter()
+
+    text = (text or "").strip()
+    if not text:
+        return
+    budget = max(1, max_tokens - counter.special_tokens)
+    overlap_tokens = max(0, min(overlap_tokens, budget // 2))
+
+    starts = counter.starts(text)
+    n_tokens = len(starts)
+    cursor = 0  # primer token que aún no se ha asignado a ningún segmento
+
+    window: Deque[Tuple[int, int, int]] = deque()  # (inicio, fin, tokens) de las frases del chunk en curso
+    total = 0
+    fresh = False  # el chunk en curso tiene algo más que el solape del anterior
+
+    def emit() -> Iterator[str]:
+        nonlocal total, fresh
+        if fresh and window:
+            yield text[window[0][0] : window[-1][1]].strip()
+        # Solape: las últimas frases del chunk, mientras quepan en overlap_tokens
+        kept, kept_tokens = [], 0
+        for segment in reversed(window):
+            if kept_tokens + segment[2] > overlap_tokens:
+                break
+            kept.append(segment)
+            kept_tokens += segment[2]
+        window.clear()
+        window.extend(reversed(kept))
+        total, fresh = kept_tokens, False
+
+    def add(start: int, end: int, tokens: int) -> Iterator[str]:
+        nonlocal total, fresh
+        if total + tokens > budget:
+            yield from emit()
+            # El solape nunca puede impedir que la frase nueva entre
+            while window and total + tokens > budget:
+                total -= window.popleft()[2]
+        window.append((start, end, tokens))
+        total += tokens
+        fresh = True
+
+    for seg_start, seg_end, ends_paragraph in iter_segments(text):
+        first = cursor
+        while cursor < n_tokens and starts[cursor] < seg_end:
+            cursor += 1
+        tokens = cursor - first
+        if tokens == 0:
+            continue
+
+        if tokens <= budget:
+            yield from add(seg_start, seg_end, tokens)
+        else:
+            # Frase más larga que la ventana: trozos de budget tokens, cortando en inicio de palabra si se puede
+            i = first
+            while i < cursor:
+                j = min(i + budget, cursor)
+                if j < cursor:
+                    k = j
+                    while k > i + budget // 2 and not text[starts[k] - 1].isspace():
+                        k -= 1
+                    if k > i + budget // 2:
+                        j = k
+                piece_start = seg_start if i == first else starts[i]
+                piece_end = seg_end if j == cursor else starts[j]
+                yield from add(piece_start, piece_end, j - i)
+                i = j
+
+        if ends_paragraph and total >= budget * PARAGRAPH_CUT_FILL:
+            yield from emit()
+
+    if fresh:
+        yield from emit()
@@ -0,0 +1,311 @@
+import os
+import time
+import uuid
+import shutil
+import asyncio
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional
+
+from config.project_config import SETTINGS
+
+
+"""
+
+INGESTA DE DOCUMENTOS EN SEGUNDO PLANO
+
+    POST /rag/documents guarda los ficheros subidos (PDF o Markdown) y encola un
+    job por fichero; la respuesta vuelve en cuanto están en cola. Los workers
+    procesan la cola con las mismas funciones que scripts/rag_indexer.py:
+
+        - extracción + chunking (build_chunks_from_pdf / split_text)
+        - embeddings y upsert en el vector store por lotes pequeños (ingest_batch_size)
+        - al terminar se añaden al índice BM25 y mark_index_updated() invalida la caché semántica
+        - los ids de los chunks son los del indexador (deterministas) y, como en el
+          indexador, al terminar se borran los chunks anteriores del mismo fichero
+          (source_file) que no estén en la versión nueva: volver a subir un documento,
+          aunque haya cambiado, sustituye sus chunks en vez de duplicarlos
+
+    Para no competir con las consultas:
+
+        - hay ingest_workers workers como máximo (1 por defecto)
+        - antes de cada lote el worker espera a que no haya ninguna /rag/query
+          en curso (query_traffic), como mucho ingest_max_yield segundos para
+          no quedarse parado indefinidamente con tráfico continuo
+        - el trabajo pesado (OCR, modelo, Qdrant) va en hilos, fuera del event loop
+
+    Cada fichero subido puede ocupar como mucho ingest_max_upload_mb (MAX_UPLOAD_BYTES).
+
+    El estado de cada job se consulta en GET /rag/documents/jobs/{job_id}.
+
+"""
+
+ALLOWED_EXTENSIONS = {".pdf", ".md", ".markdown"}
+MAX_TRACKED_JOBS = 1000
+MAX_UPLOAD_BYTES = SETTINGS.ingest_max_upload_mb * 1024 * 1024
+
+STATUS_QUEUED = "queued"
+STATUS_EXTRACTING = "extracting"
+STATUS_INDEXING = "indexing"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+def validate_upload(filename: str, content: bytes) -> str:
+    """Devuelve el nombre de fichero saneado. Lanza ValueError si no se puede ingerir."""
+    filename = os.path.basename(filename or "")
+    if os.path.splitext(filename)[1].lower() not in ALLOWED_EXTENSIONS:
+        raise ValueError(f"Tipo de fichero no soportado: '{filename}' (usa PDF o Markdown)")
+    if not content:
+        raise ValueError(f"El fichero '{filename}' está vacío")
+    if len(content) > MAX_UPLOAD_BYTES:
+        raise ValueError(f"El fichero '{filename}' supera el máximo de {SETTINGS.ingest_max_upload_mb} MB")
+    return filename
+
+
+class QueryTraffic:
+    """Cuenta las consultas RAG en curso para que la ingesta les ceda el paso."""
+
+    def __init__(self):
+        self.active = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @asynccontextmanager
+    async def track(self):
+        self.active += 1
+        self._idle.clear()
+        try:
+            yield
+        finally:
+            self.active -= 1
+            if self.active == 0:
+                self._idle.set()
+
+    async def wait_idle(self, timeout: float) -> None:
+        if self.active == 0:
+            return
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+query_traffic = QueryTraffic()
+
+
+@dataclass
+class IngestionJob:
+    job_id: str
+    filename: str
+    path: str
+    status: str = STATUS_QUEUED
+    chunks_total: int = 0
+    chunks_indexed: int = 0
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.pop("path")
+        data["progress"] = round(self.chunks_indexed / self.chunks_total, 4) if self.chunks_total else 0.0
+        return data
+
+
+def _extract_chunks(path: str) -> list:
+    from scripts.rag_indexer import (
+        DEFAULT_CHUNK_OVERLAP, DEFAULT_CHUNK_SIZE, build_chunks_from_pdf, build_chunks_from_text,
+    )
+
+    if path.lower().endswith(".pdf"):
+        return build_chunks_from_pdf(path, chunk_size=DEFAULT_CHUNK_SIZE, overlap=DEFAULT_CHUNK_OVERLAP)
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    return build_chunks_from_text(text, path, chunk_size=DEFAULT_CHUNK_SIZE, overlap=DEFAULT_CHUNK_OVERLAP)
+
+
+def _embed(chunks: list) -> list:
+    from src.services.embeddings import embed_documents_cached
+
+    return embed_documents_cached([c.text for c in chunks])
+
+
+def _upsert_qdrant(chunks: list, vectors: list) -> None:
+    from scripts.rag_indexer import chunks_to_points
+    from src.services.vector_store import get_qdrant_client
+
+    get_qdrant_client().upsert(
+        collection_name=SETTINGS.qdrant_collection,
+        points=chunks_to_points(chunks, vectors),
+    )
+
+
+def _purge_qdrant(source_file: str, keep_ids: list) -> None:
+    """Borra los puntos del fichero que no son de esta versión (chunks que ya no existen)."""
+    from qdrant_client.models import FieldCondition, Filter, HasIdCondition, MatchValue
+    from src.services.vector_store import get_qdrant_client
+
+    get_qdrant_client().delete(
+        collection_name=SETTINGS.qdrant_collection,
+        points_selector=Filter(
+            must=[FieldCondition(key="source_file", match=MatchValue(value=source_file))],
+            must_not=[HasIdCondition(has_id=list(keep_ids))],
+        ),
+    )
+
+
+def _add_numpy(rows: list, source_file: str) -> None:
+    from scripts.rag_indexer import chunk_payload
+    from src.services.vector_store import get_vector_store
+
+    # Una sola reescritura: fuera la versión anterior del fichero y dentro la nueva
+    get_vector_store().update(
+        [v for _, v in rows], [chunk_payload(c) for c, _ in rows], delete_sources=[source_file],
+    )
+
+
+_bm25_lock = threading.Lock()
+
+
+def _add_bm25(chunks: list, source_file: str) -> None:
+    from scripts.rag_indexer import chunk_payload
+    from src.rag.bm25 import BM25Index
+
+    # La API recarga el índice al cambiar el fichero; el lock evita que dos jobs se pisen
+    with _bm25_lock:
+        bm25 = BM25Index.load(SETTINGS.bm25_index_path)
+        bm25.remove(source_files=[source_file])
+        bm25.add([chunk_payload(c) for c in chunks])
+        bm25.save()
+
+
+def _ensure_collection() -> None:
+    from scripts.rag_indexer import ensure_collection
+    from src.services.embeddings import get_vector_size
+    from src.services.vector_store import get_qdrant_client
+
+    ensure_collection(get_qdrant_client(), SETTINGS.qdrant_collection, get_vector_size())
+
+
+class IngestionManager:
+
+    def __init__(
+        self,
+        workers: int = SETTINGS.ingest_workers,
+        batch_size: int = SETTINGS.ingest_batch_size,
+        max_yield: float = SETTINGS.ingest_max_yield,
+        upload_dir: str = SETTINGS.ingest_upload_dir,
+    ):
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.max_yield = max_yield
+        self.upload_dir = upload_dir
+
+        self.jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def _ensure_workers(self) -> None:
+        # Los workers se crean en el event loop de la API con el primer upload
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _save_upload(self, job_id: str, filename: str, content: bytes) -> str:
+        # Un directorio por job: el nombre original se conserva como source_file de los chunks
+        job_dir = os.path.join(self.upload_dir, job_id)
+        os.makedirs(job_dir, exist_ok=True)
+        path = os.path.join(job_dir, filename)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    async def submit(self, filename: str, content: bytes) -> IngestionJob:
+        """Guarda el fichero y encola su ingesta. Lanza ValueError si el tipo no está soportado."""
+        filename = validate_upload(filename, content)
+
+        self._ensure_workers()
+        job_id = uuid.uuid4().hex
+        path = await asyncio.to_thread(self._save_upload, job_id, filename, content)
+        job = IngestionJob(job_id=job_id, filename=filename, path=path)
+
+        self.jobs[job_id] = job
+        while len(self.jobs) > MAX_TRACKED_JOBS:
+            oldest_id, oldest = next(iter(self.jobs.items()))
+            if oldest.status not in (STATUS_DONE, STATUS_FAILED):
+                break
+            del self.jobs[oldest_id]
+
+        await self._queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        return self.jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "jobs": counts,
+            "active_queries": query_traffic.active,
+        }
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._process(job)
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, job: IngestionJob) -> None:
+        try:
+            job.status = STATUS_EXTRACTING
+            await query_traffic.wait_idle(self.max_yield)
+            chunks = await asyncio.to_thread(_extract_chunks, job.path)
+            job.chunks_total = len(chunks)
+
+            job.status = STATUS_INDEXING
+            # Backend numpy: cada escritura reescribe el .npy, así que se escribe una vez al final
+            use_numpy = SETTINGS.vector_store_backend == "numpy"
+            numpy_rows = []
+            if chunks and not use_numpy:
+                await asyncio.to_thread(_ensure_collection)
+            for i in range(0, len(chunks), self.batch_size):
+                await query_traffic.wait_idle(self.max_yield)
+                batch = chunks[i : i + self.batch_size]
+                vectors = await asyncio.to_thread(_embed, batch)
+                if use_numpy:
+                    numpy_rows.extend(zip(batch, vectors))
+                else:
+                    await asyncio.to_thread(_upsert_qdrant, batch, vectors)
+                job.chunks_indexed += len(batch)
+            # Los chunks anteriores del mismo fichero se quitan cuando la versión nueva ya está subida
+            source_file = chunks[0].source_file if chunks else job.filename
+            if numpy_rows:
+                await asyncio.to_thread(_add_numpy, numpy_rows, source_file)
+            elif chunks:
+                from scripts.rag_indexer import chunk_id
+                await asyncio.to_thread(_purge_qdrant, source_file, [chunk_id(c) for c in chunks])
+            if chunks:
+                await asyncio.to_thread(_add_bm25, chunks, source_file)
+
+            if chunks:
+                from src.rag.cache import mark_index_updated
+                mark_index_updated()
+            job.status = STATUS_DONE
+        except Exception as e:
+            job.status = STATUS_FAILED
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            await asyncio.to_thread(shutil.rmtree, os.path.dirname(job.path), True)
+
+
+ingestion_manager = IngestionManager()
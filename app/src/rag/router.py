@@ -1,45 +1,285 @@
 
+import time
+import asyncio
 from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from src.rag.schema import RAGRequest, QueryResponse, SourceInfo
-from src.agent.chain import rag_chain
+from src.rag.cache import semantic_cache
+from src.rag.ingestion import query_traffic
+from src.agent.chain import (
+    rag_chain, answer_step, aget_sources_info, aget_sources_info_batch, format_docs,
+    select_answer_path, get_generation_chain, top_score,
+)
+from src.services.query_embeddings import query_embedder
 
 from config.project_config import SETTINGS
 
 
 async def rag_invoke(request: RAGRequest) -> QueryResponse:
+    start = time.perf_counter()
+    # Mientras haya consultas en curso la ingesta en segundo plano espera
+    async with query_traffic.track():
+        response = await _rag_invoke(request)
+    latency_ms = round((time.perf_counter() - start) * 1000, 1)
+    print(f"[rag] answer_path={response.answer_path} top_score={response.top_score} latency_ms={latency_ms}")
+    return response.model_copy(update={"latency_ms": latency_ms})
+
+
+def _sources_info(docs: List[Dict[str, Any]]) -> List[SourceInfo]:
+    """Fuentes recuperadas (dicts de get_sources_info) -> SourceInfo de la respuesta."""
+    sources = []
+    for doc in docs or []:
+        where = f"página {doc['page']}" if doc.get("page") is not None else "sin página"
+        if doc.get("score") is not None:
+            reason = f"{where}, similitud {doc['score']:.3f}"
+        else:
+            reason = f"{where}, coincidencia léxica (BM25)"
+        sources.append(SourceInfo(source=str(doc.get("source") or doc.get("filename") or "desconocido"), reason=reason))
+    return sources
+
+
+def _build_response(result: Dict[str, Any]) -> QueryResponse:
+    if result.get('source'):
+        sources = [
+            SourceInfo(source=result["source"].selection, reason=result["source"].reason)
+        ]
+    else:
+        sources = _sources_info(result.get("source_context"))
+    return QueryResponse(
+        question=result["question"],
+        answer=result["answer"],
+        sources=sources,
+        timestamp=datetime.now(),
+        answer_path=result.get("answer_path", "llm"),
+        top_score=result.get("top_score"),
+    )
+
+
+def _resolve_params(request: RAGRequest) -> Tuple[int, float]:
     k = request.k_docs if request.k_docs is not None else SETTINGS.k_docs
     threshold = request.threshold if request.threshold is not None else SETTINGS.threshold
+    return k, threshold
+
+
+async def _rag_invoke(request: RAGRequest) -> QueryResponse:
+    k, threshold = _resolve_params(request)
+
+    # Embedding de la pregunta (caché LRU + micro-batching); se reutiliza en el retrieval
+    question_vector = await query_embedder.aembed(request.question)
+
+    # Caché semántica: una paráfrasis de una pregunta ya respondida no pasa por retrieval ni LLM
+    if SETTINGS.semantic_cache_enabled:
+        cached = semantic_cache.lookup(question_vector, params=(k, threshold))
+        if cached is not None:
+            return cached.model_copy(update={
+                "question": request.question,
+                "timestamp": datetime.now(),
+                "answer_path": "cache",
+            })
 
     result = await rag_chain.ainvoke({
         "question": request.question,
         "k_docs": k,
-        "threshold": threshold
+        "threshold": threshold,
+        "question_vector": question_vector,
     })
 
-    if result.get('source'):
-        sources = [
-            SourceInfo(source=result["source"].selection, reason=result["source"].reason)
-        ]
-        return QueryResponse(
-            question=result["question"],
-            answer=result["answer"],
-            sources=sources,
-            timestamp=datetime.now()
-        )
-    else:
-        return QueryResponse(
-            question=result["question"],
-            answer=result["answer"],
-            sources=[],
-            timestamp=datetime.now()
-        )
+    response = _build_response(result)
 
+    if SETTINGS.semantic_cache_enabled:
+        semantic_cache.store(question_vector, response, params=(k, threshold))
+    return response
 
 
-if __name__ == "__main__":
-    import asyncio
+# -----------------------------
+# Lotes
+# -----------------------------
+
+BATCH_ERROR_MESSAGE = "Ocurrió un error al consultar el agente."
 
+async def rag_batch(
+    requests: List[RAGRequest],
+    max_concurrency: Optional[int] = None,
+) -> AsyncIterator[Tuple[int, Optional[QueryResponse], Optional[str]]]:
+    """
+    Ejecuta varias consultas RAG y devuelve (índice, respuesta, error) en el orden de entrada:
+        - todas las preguntas se embeben en una sola pasada del modelo
+        - las búsquedas en Qdrant van en una única petición batch
+        - las generaciones corren en paralelo con max_concurrency como límite
+    Cada resultado se emite en cuanto están listos él y todos los anteriores. Un fallo
+    nunca corta el lote: las preguntas afectadas salen con error y el resto sigue.
+    """
+    max_concurrency = max_concurrency or SETTINGS.rag_batch_max_concurrency
+    start = time.perf_counter()
+
+    async with query_traffic.track():
+        params = [_resolve_params(r) for r in requests]
+        try:
+            vectors = await asyncio.to_thread(query_embedder.embed_many, [r.question for r in requests])
+        except Exception as e:
+            print(f"[rag][batch] error al embeber las preguntas: {e}")
+            for i in range(len(requests)):
+                yield i, None, BATCH_ERROR_MESSAGE
+            return
+
+        ready: Dict[int, Tuple[Optional[QueryResponse], Optional[str]]] = {}
+        pending: List[int] = []
+        for i, (vector, (k, threshold)) in enumerate(zip(vectors, params)):
+            cached = semantic_cache.lookup(vector, params=(k, threshold)) if SETTINGS.semantic_cache_enabled else None
+            if cached is not None:
+                ready[i] = (cached.model_copy(update={
+                    "question": requests[i].question,
+                    "timestamp": datetime.now(),
+                    "answer_path": "cache",
+                }), None)
+            else:
+                pending.append(i)
+
+        inputs = []
+        if pending:
+            try:
+                docs_list = await aget_sources_info_batch(
+                    [requests[i].question for i in pending],
+                    [vectors[i] for i in pending],
+                    [params[i][0] for i in pending],
+                    [params[i][1] for i in pending],
+                )
+            except Exception as e:
+                print(f"[rag][batch] error en la búsqueda: {e}")
+                ready.update((i, (None, BATCH_ERROR_MESSAGE)) for i in pending)
+                pending, docs_list = [], []
+            for i, docs in zip(pending, docs_list):
+                input_dict = {
+                    "question": requests[i].question,
+                    "k_docs": params[i][0],
+                    "threshold": params[i][1],
+                    "source_context": docs,
+                }
+                input_dict["context"] = format_docs(input_dict)
+                inputs.append(input_dict)
+
+        next_index = 0
+
+        def flush():
+            nonlocal next_index
+            while next_index in ready:
+                response, error = ready.pop(next_index)
+                if response is not None:
+                    response = response.model_copy(update={
+                        "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+                    })
+                yield next_index, response, error
+                next_index += 1
+
+        for item in flush():
+            yield item
+
+        if inputs:
+            results = answer_step.abatch_as_completed(
+                inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True,
+            )
+            async for pos, result in results:
+                i = pending[pos]
+                try:
+                    if isinstance(result, Exception):
+                        raise result
+                    response = _build_response(result)
+                    if SETTINGS.semantic_cache_enabled:
+                        semantic_cache.store(vectors[i], response, params=params[i])
+                    ready[i] = (response, None)
+                except Exception as e:
+                    print(f"[rag][batch] error en la pregunta {i}: {e}")
+                    ready[i] = (None, BATCH_ERROR_MESSAGE)
+                for item in flush():
+                    yield item
+
+    print(f"[rag][batch] {len(requests)} preguntas en {round((time.perf_counter() - start) * 1000, 1)} ms")
+
+
+# -----------------------------
+# Streaming (SSE)
+# -----------------------------
+
+def _source_event(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        k: doc.get(k)
+        for k in ("score", "bm25_score", "rrf_score", "source", "filename", "page", "chunk_id", "section")
+        if k in doc
+    }
+
+
+async def rag_stream(request: RAGRequest) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Misma consulta que rag_invoke pero por eventos (nombre, datos):
+        - sources: documentos recuperados, antes de empezar a generar
+        - token: fragmentos de la respuesta según los va generando el LLM
+        - done: answer_path, top_score y latency_ms
+        - error: si algo falla a mitad
+    """
+    start = time.perf_counter()
+    async with query_traffic.track():
+        try:
+            k, threshold = _resolve_params(request)
+            question_vector = await query_embedder.aembed(request.question)
+
+            if SETTINGS.semantic_cache_enabled:
+                cached = semantic_cache.lookup(question_vector, params=(k, threshold))
+                if cached is not None:
+                    yield "sources", {"sources": [s.model_dump() for s in cached.sources]}
+                    yield "token", {"text": cached.answer}
+                    yield "done", {
+                        "answer_path": "cache",
+                        "top_score": cached.top_score,
+                        "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+                    }
+                    return
+
+            docs = await aget_sources_info(request.question, k, threshold, question_vector)
+            yield "sources", {"sources": [_source_event(d) for d in docs]}
+
+            input_dict = {
+                "question": request.question,
+                "k_docs": k,
+                "threshold": threshold,
+                "source_context": docs,
+            }
+            input_dict["context"] = format_docs(input_dict)
+            path = select_answer_path(docs, threshold)
+            chain, chain_input = get_generation_chain(input_dict, path)
+
+            parts = []
+            if chain is None:
+                parts.append(SETTINGS.rag_no_info_answer)
+                yield "token", {"text": parts[-1]}
+            else:
+                async for token in chain.astream(chain_input):
+                    if token:
+                        parts.append(token)
+                        yield "token", {"text": token}
+
+            best_score = top_score(docs)
+            latency_ms = round((time.perf_counter() - start) * 1000, 1)
+            print(f"[rag][stream] answer_path={path} top_score={best_score} latency_ms={latency_ms}")
+            yield "done", {"answer_path": path, "top_score": best_score, "latency_ms": latency_ms}
+
+            if SETTINGS.semantic_cache_enabled:
+                response = QueryResponse(
+                    question=request.question,
+                    answer="".join(parts),
+                    sources=_sources_info(docs),
+                    timestamp=datetime.now(),
+                    answer_path=path,
+                    top_score=best_score,
+                )
+                semantic_cache.store(question_vector, response, params=(k, threshold))
+        except Exception as e:
+            print(f"[rag][stream] error: {e}")
+            yield "error", {"message": "Ocurrió un error al consultar el agente. Intenta de nuevo."}
+
+
+
+if __name__ == "__main__":
     test_request = RAGRequest(
         question="¿Cuál es el importe de mi última factura?",
         k_docs=3,
@@ -12,6 +12,9 @@ class QueryResponse(BaseModel):
     sources: List[SourceInfo] = Field(..., description="Fuentes consultadas")
     timestamp: datetime = Field(default_factory=datetime.now)
     question: str = Field(..., description="Pregunta original")
+    answer_path: str = Field(default="llm", description="Cómo se obtuvo la respuesta: llm, llm_cheap, no_context o cache")
+    top_score: Optional[float] = Field(default=None, description="Score del mejor documento recuperado")
+    latency_ms: Optional[float] = Field(default=None, description="Tiempo total de la consulta en milisegundos")
 
 class RAGRequest(BaseModel):
     """Modelo para la petición de consulta"""
@@ -0,0 +1,217 @@
+import os
+import re
+import struct
+import hashlib
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+
+"""
+
+CACHÉ PERSISTENTE DE EMBEDDINGS
+
+    Vectores ya calculados, en disco, con clave (modelo, hash del texto normalizado).
+    El indexador, la ingesta y las preguntas de la API la consultan antes de llamar
+    al modelo: reindexar con otro chunking, recrear la colección o reiniciar la API
+    no vuelve a embeber textos que ya se embebieron.
+
+        - un fichero por modelo: {cache_dir}/{modelo}.emb
+        - cabecera fija (magic, versión, dimensión) y después registros de tamaño
+          fijo: sha256 del texto (32 bytes) + vector float32
+        - solo se añade al final (un write por lote) y se lee con np.memmap, así
+          que no hay que cargar nada en memoria salvo el índice hash -> fila
+        - clave y vector van en el mismo registro: aunque escriban a la vez el
+          indexador y la API, nunca se desalinean; si otro proceso añade
+          registros, se ven en el siguiente fallo de caché
+        - los writes van con flock: si un proceso murió a mitad de uno, el
+          siguiente que escribe recorta el registro incompleto antes de añadir,
+          así que los registros nuevos no quedan desplazados (sin fcntl, un
+          fichero con un registro a medias desactiva la caché)
+
+    Al superar max_bytes deja de crecer (sigue sirviendo lo que ya tiene).
+
+"""
+
+MAGIC = b"EMBCACHE"
+VERSION = 1
+HEADER = struct.Struct("<8sII")  # magic, versión, dimensión
+KEY_BYTES = 32
+
+
+def normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFC", text or "")
+    return " ".join(text.split())
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).digest()
+
+
+def _model_slug(model_name: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "_", model_name).strip("_")
+    return f"{slug}-{hashlib.sha256(model_name.encode('utf-8')).hexdigest()[:8]}"
+
+
+class EmbeddingCache:
+
+    def __init__(self, cache_dir: str, model_name: str, max_bytes: Optional[int] = None):
+        self.model_name = model_name
+        self.path = os.path.join(cache_dir, _model_slug(model_name) + ".emb")
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._index: Dict[bytes, int] = {}
+        self._records: Optional[np.memmap] = None
+        self._dtype: Optional[np.dtype] = None
+        self._dim: Optional[int] = None
+        self._disabled = False
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    # --- lectura ---
+
+    def _set_dim(self, dim: int) -> None:
+        self._dim = dim
+        self._dtype = np.dtype([("key", np.uint8, (KEY_BYTES,)), ("vector", "<f4", (dim,))])
+
+    def _read_header(self) -> bool:
+        try:
+            with open(self.path, "rb") as f:
+                raw = f.read(HEADER.size)
+        except OSError:
+            return False
+        if len(raw) < HEADER.size:
+            return False
+        magic, version, dim = HEADER.unpack(raw)
+        if magic != MAGIC or version != VERSION or dim <= 0:
+            print(f"EmbeddingCache: {self.path} no es una caché válida, se ignora.")
+            self._disabled = True
+            return False
+        self._set_dim(dim)
+        return True
+
+    def _refresh(self) -> None:
+        """Mapea los registros nuevos del fichero (propios o de otro proceso). Llamar con el lock."""
+        if self._disabled or (self._dim is None and not self._read_header()):
+            return
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        known = len(self._records) if self._records is not None else 0
+        # Un registro a medio escribir al final se ignora hasta que esté completo
+        total = (size - HEADER.size) // self._dtype.itemsize
+        if total <= known:
+            return
+        self._records = np.memmap(self.path, dtype=self._dtype, mode="r", offset=HEADER.size, shape=(total,))
+        keys = np.ascontiguousarray(self._records["key"][known:total]).tobytes()
+        for i in range(total - known):
+            self._index.setdefault(keys[i * KEY_BYTES : (i + 1) * KEY_BYTES], known + i)
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Vector de cada texto, o None si no está en caché."""
+        keys = [text_key(t) for t in texts]
+        with self._lock:
+            if any(k not in self._index for k in keys):
+                self._refresh()
+            rows = [self._index.get(k) for k in keys]
+            out = [self._records["vector"][row].tolist() if row is not None else None for row in rows]
+        found = sum(v is not None for v in out)
+        self.hits += found
+        self.misses += len(out) - found
+        return out
+
+    # --- escritura ---
+
+    def _create(self, dim: int) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        try:
+            with open(self.path, "xb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION, dim))
+        except FileExistsError:
+            pass  # la ha creado otro proceso a la vez
+        if not self._read_header():
+            return
+        if self._dim != dim:
+            print(f"EmbeddingCache: {self.path} tiene dimensión {self._dim} y el modelo {dim}; caché desactivada.")
+            self._disabled = True
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        if not len(texts):
+            return
+        with self._lock:
+            if self._disabled:
+                return
+            if self._dim is None:
+                self._create(len(vectors[0]))
+                if self._disabled:
+                    return
+            self._refresh()
+
+            records = []
+            seen = set()
+            for text, vector in zip(texts, vectors):
+                key = text_key(text)
+                if key not in self._index and key not in seen:
+                    seen.add(key)
+                    records.append((np.frombuffer(key, dtype=np.uint8), np.asarray(vector, dtype=np.float32)))
+            if not records:
+                return
+            size = HEADER.size + (len(self._records) if self._records is not None else 0) * self._dtype.itemsize
+            if self.max_bytes is not None and size + len(records) * self._dtype.itemsize > self.max_bytes:
+                return
+
+            buf = np.array(records, dtype=self._dtype)
+            # Un solo write en modo append: los registros de otro proceso no se intercalan a medias
+            with open(self.path, "ab") as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                if not self._drop_partial_record(f):
+                    return
+                f.write(buf.tobytes())
+            self.writes += len(records)
+            self._refresh()
+
+    def _drop_partial_record(self, f) -> bool:
+        """
+        Recorta el registro a medio escribir que haya dejado un proceso caído (con el
+        flock tomado nadie más está escribiendo). Sin fcntl no se puede saber si otro
+        proceso está a mitad de un write: se desactiva la caché. Devuelve si se puede escribir.
+        """
+        size = os.fstat(f.fileno()).st_size
+        partial = (size - HEADER.size) % self._dtype.itemsize
+        if not partial:
+            return True
+        if fcntl is None:
+            print(f"EmbeddingCache: {self.path} tiene un registro incompleto; caché desactivada.")
+            self._disabled = True
+            return False
+        print(f"EmbeddingCache: {self.path} tenía un registro incompleto ({partial} bytes); se recorta.")
+        f.truncate(size - partial)
+        return True
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._index)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "path": self.path,
+            "entries": len(self._index),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "writes": self.writes,
+        }
@@ -1,6 +1,93 @@
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import threading
+from typing import Callable, List
+
 from config.project_config import SETTINGS
 
 MODEL_NAME = SETTINGS.embedding_model_name
-embeddings_model = HuggingFaceEmbeddings(model_name=MODEL_NAME)
-vector_size = len(embeddings_model.embed_query("test"))
+QUERY_PREFIX = SETTINGS.embedding_query_prefix
+QUERY_CACHE_SUFFIX = "#query"
+
+# El modelo se carga en el primer uso (o en el warm-up de arranque), no al importar
+_embeddings_model = None
+_vector_size = None
+_embedding_cache = None
+_query_embedding_cache = None
+_lock = threading.Lock()
+
+
+def get_embeddings_model():
+    global _embeddings_model
+    if _embeddings_model is None:
+        with _lock:
+            if _embeddings_model is None:
+                from langchain_community.embeddings import HuggingFaceEmbeddings
+                _embeddings_model = HuggingFaceEmbeddings(model_name=MODEL_NAME)
+    return _embeddings_model
+
+
+def get_vector_size() -> int:
+    global _vector_size
+    if _vector_size is None:
+        _vector_size = len(get_embeddings_model().embed_query("test"))
+    return _vector_size
+
+
+def _get_cache(attr: str, model_name: str):
+    cache = globals()[attr]
+    if cache is None and SETTINGS.embedding_cache_enabled:
+        with _lock:
+            cache = globals()[attr]
+            if cache is None:
+                from src.services.embedding_cache import EmbeddingCache
+                cache = EmbeddingCache(
+                    SETTINGS.embedding_cache_dir, model_name, max_bytes=SETTINGS.embedding_cache_max_mb * 1024 * 1024,
+                )
+                globals()[attr] = cache
+    return cache
+
+
+def get_embedding_cache():
+    """Caché en disco de embeddings de documentos del modelo actual (None si EMBEDDING_CACHE=0)."""
+    return _get_cache("_embedding_cache", MODEL_NAME)
+
+
+def get_query_embedding_cache():
+    """
+    Caché en disco de embeddings de preguntas. Va en un fichero aparte (y por prefijo):
+    en los modelos asimétricos (e5, bge...) la pregunta no da el mismo vector que el
+    mismo texto como documento.
+    """
+    return _get_cache("_query_embedding_cache", MODEL_NAME + QUERY_CACHE_SUFFIX + QUERY_PREFIX)
+
+
+def _embed_cached(cache, texts: List[str], embed: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+    if cache is None:
+        return embed(texts)
+
+    vectors = cache.get_many(texts)
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if missing:
+        new = embed([texts[i] for i in missing])
+        cache.put_many([texts[i] for i in missing], new)
+        for i, vector in zip(missing, new):
+            vectors[i] = vector
+    return vectors
+
+
+def embed_documents_cached(texts: List[str]) -> List[List[float]]:
+    """
+    embed_documents pasando antes por la caché en disco: solo se embeben (y se
+    guardan) los textos que no estaban. Si todos están, el modelo ni se carga.
+    """
+    return _embed_cached(get_embedding_cache(), texts, lambda batch: get_embeddings_model().embed_documents(batch))
+
+
+def embed_queries_cached(texts: List[str]) -> List[List[float]]:
+    """
+    Lo mismo para preguntas: los fallos se embeben en una sola llamada al modelo,
+    cada uno con EMBEDDING_QUERY_PREFIX delante (lo que haría embed_query).
+    """
+    def embed(batch: List[str]) -> List[List[float]]:
+        return get_embeddings_model().embed_documents([QUERY_PREFIX + text for text in batch])
+
+    return _embed_cached(get_query_embedding_cache(), texts, embed)
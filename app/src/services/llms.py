@@ -1,9 +1,39 @@
-from langchain_openai import ChatOpenAI
+import threading
+
 from config.project_config import SETTINGS
 
+# Clientes creados en el primer uso: importar este módulo no necesita OPENAI_API_KEY
+_llms = {}
+_lock = threading.Lock()
+
+
+def _get_or_create(name: str, factory):
+    llm = _llms.get(name)
+    if llm is None:
+        with _lock:
+            llm = _llms.get(name)
+            if llm is None:
+                llm = _llms[name] = factory()
+    return llm
+
+
+def get_llm():
+    from langchain_openai import ChatOpenAI
+
+    return _get_or_create("default", lambda: ChatOpenAI(
+        model=SETTINGS.llm_model_name,
+        temperature=SETTINGS.temperature,
+        max_retries=SETTINGS.llm_max_retries
+    ))
+
+
+def get_cheap_llm():
+    """Ruta barata para respuestas de baja confianza."""
+    from langchain_openai import ChatOpenAI
 
-llm_langchain = ChatOpenAI(
-    model=SETTINGS.llm_model_name,
-    temperature=SETTINGS.temperature,
-    max_retries=SETTINGS.llm_max_retries
-)
\ No newline at end of file
+    return _get_or_create("cheap", lambda: ChatOpenAI(
+        model=SETTINGS.llm_cheap_model_name,
+        temperature=SETTINGS.temperature,
+        max_retries=SETTINGS.llm_max_retries,
+        max_tokens=SETTINGS.llm_cheap_max_tokens,
+    ))
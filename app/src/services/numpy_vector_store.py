@@ -0,0 +1,207 @@
+import os
+import json
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+"""
+
+VECTOR STORE LOCAL (NUMPY)
+
+    Alternativa a Qdrant para corpus pequeños (unos miles de chunks), sin red ni
+    servidor: búsqueda exacta por fuerza bruta sobre una matriz float32 contigua.
+
+        - {collection}.npy: matriz (n, dim) con los embeddings ya normalizados,
+          abierta con mmap (solo se leen las páginas que se usan)
+        - {collection}.jsonl: payload de cada fila, en el mismo orden
+          (mismo formato que los payloads de Qdrant del indexador)
+
+    Con vectores normalizados el coseno es un producto escalar: una consulta es
+    matrix @ q y un lote de consultas, matrix @ Q.T, en una sola operación.
+
+    Cada fila se identifica por el chunk_id de su payload (el mismo id que el
+    punto en Qdrant): add() sustituye las filas con el mismo id y update() añade
+    y borra en una sola escritura, así que reindexar no duplica chunks.
+
+    Si los ficheros cambian en disco (p. ej. tras ejecutar el indexador) se
+    recargan en la siguiente búsqueda. Se activa con VECTOR_STORE_BACKEND=numpy.
+
+"""
+
+CONTENT_PAYLOAD_KEY = "text"
+CHUNK_ID_KEY = "chunk_id"
+SOURCE_FILE_KEY = "source_file"
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return 0.0
+
+
+class NumpyVectorStore:
+
+    def __init__(self, store_dir: str, collection_name: str, vector_size: Optional[int] = None):
+        self.store_dir = store_dir
+        self.collection_name = collection_name
+        self.vector_size = vector_size
+        self.vectors_path = os.path.join(store_dir, f"{collection_name}.npy")
+        self.payloads_path = os.path.join(store_dir, f"{collection_name}.jsonl")
+
+        self._lock = threading.Lock()
+        # (matriz, payloads) en una sola tupla: se publican juntos con una asignación,
+        # así que un lector nunca ve la matriz de una versión con los payloads de otra
+        self._data: Tuple[np.ndarray, List[Dict[str, Any]]] = (np.empty((0, vector_size or 0), dtype=np.float32), [])
+        self._mtimes: Tuple[float, float] = (-1.0, -1.0)
+        self._load_if_changed()
+
+    # --- carga ---
+
+    def _load_if_changed(self) -> None:
+        mtimes = (_mtime(self.vectors_path), _mtime(self.payloads_path))
+        if mtimes == self._mtimes:
+            return
+        with self._lock:
+            if mtimes == self._mtimes:
+                return
+            if not (os.path.exists(self.vectors_path) and os.path.exists(self.payloads_path)):
+                self._mtimes = mtimes
+                return
+
+            matrix = np.load(self.vectors_path, mmap_mode="r")
+            with open(self.payloads_path, "r", encoding="utf-8") as f:
+                payloads = [json.loads(line) for line in f if line.strip()]
+            if len(payloads) != matrix.shape[0]:
+                # Escritura a medias: se mantiene lo cargado y se reintenta en la siguiente búsqueda
+                print(f"NumpyVectorStore: {self.vectors_path} y {self.payloads_path} no cuadran, se ignora el cambio.")
+                return
+
+            self._data = (matrix, payloads)
+            self._mtimes = mtimes
+
+    def __len__(self) -> int:
+        return self._data[0].shape[0]
+
+    # --- escritura ---
+
+    def add(self, vectors: Sequence[Sequence[float]], payloads: Sequence[Dict[str, Any]]) -> None:
+        """Añade filas (vector + payload). Las que ya existían con el mismo chunk_id se sustituyen."""
+        self.update(vectors, payloads)
+
+    def delete(self, chunk_ids: Iterable[str] = (), source_files: Iterable[str] = ()) -> None:
+        self.update([], [], delete_ids=chunk_ids, delete_sources=source_files)
+
+    def update(
+        self,
+        vectors: Sequence[Sequence[float]],
+        payloads: Sequence[Dict[str, Any]],
+        delete_ids: Iterable[str] = (),
+        delete_sources: Iterable[str] = (),
+    ) -> None:
+        """
+        Borra las filas de delete_ids / delete_sources (y las que tengan el mismo chunk_id
+        que alguna nueva) y añade las nuevas. Reescribe ambos ficheros una sola vez, de forma atómica.
+        """
+        if len(vectors) != len(payloads):
+            raise ValueError("vectors y payloads deben tener la misma longitud")
+        drop_ids = set(delete_ids) | {p.get(CHUNK_ID_KEY) for p in payloads}
+        drop_ids.discard(None)
+        drop_sources = set(delete_sources)
+        if not len(vectors) and not drop_ids and not drop_sources:
+            return
+        new = _normalize_rows(np.asarray(vectors, dtype=np.float32)) if len(vectors) else None
+
+        self._load_if_changed()
+        with self._lock:
+            current, current_payloads = self._data
+            keep = [
+                i for i, p in enumerate(current_payloads)
+                if p.get(CHUNK_ID_KEY) not in drop_ids and p.get(SOURCE_FILE_KEY) not in drop_sources
+            ]
+            if not len(vectors) and len(keep) == len(current_payloads):
+                return
+            parts = [np.asarray(current)[keep]] if keep else []
+            if new is not None:
+                parts.append(new)
+            dim = new.shape[1] if new is not None else (current.shape[1] or self.vector_size or 0)
+            matrix = np.concatenate(parts) if parts else np.empty((0, dim), dtype=np.float32)
+            matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+            all_payloads = [current_payloads[i] for i in keep] + [dict(p) for p in payloads]
+            self._write(matrix, all_payloads)
+
+    def _write(self, matrix: np.ndarray, payloads: List[Dict[str, Any]]) -> None:
+        os.makedirs(self.store_dir, exist_ok=True)
+        tmp_payloads = self.payloads_path + ".tmp"
+        with open(tmp_payloads, "w", encoding="utf-8") as f:
+            for p in payloads:
+                f.write(json.dumps(p, ensure_ascii=False) + "\n")
+        tmp_vectors = self.vectors_path + ".tmp.npy"
+        np.save(tmp_vectors, matrix)
+        os.replace(tmp_payloads, self.payloads_path)
+        os.replace(tmp_vectors, self.vectors_path)
+
+        self._data = (np.load(self.vectors_path, mmap_mode="r"), payloads)
+        self._mtimes = (_mtime(self.vectors_path), _mtime(self.payloads_path))
+
+    # --- búsqueda (misma interfaz que QdrantVectorStore) ---
+
+    def _document(self, payloads: List[Dict[str, Any]], row: int) -> Document:
+        payload = payloads[row]
+        metadata = {k: v for k, v in payload.items() if k != CONTENT_PAYLOAD_KEY}
+        metadata["_id"] = payload.get(CHUNK_ID_KEY, row)
+        metadata["_collection_name"] = self.collection_name
+        return Document(page_content=payload.get(CONTENT_PAYLOAD_KEY) or "", metadata=metadata)
+
+    def _top_k(
+        self, payloads: List[Dict[str, Any]], scores: np.ndarray, k: int, score_threshold: Optional[float],
+    ) -> List[Tuple[Document, float]]:
+        k = min(k, scores.shape[0])
+        if k <= 0:
+            return []
+        # argpartition: O(n) para quedarnos con los k mejores, luego se ordenan solo esos
+        idx = np.argpartition(-scores, k - 1)[:k]
+        idx = idx[np.argsort(-scores[idx])]
+        return [
+            (self._document(payloads, int(i)), float(scores[i]))
+            for i in idx
+            if score_threshold is None or scores[i] >= score_threshold
+        ]
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: Sequence[float],
+        k: int = 4,
+        score_threshold: Optional[float] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vectors([embedding], [k], score_threshold)[0]
+
+    def similarity_search_with_score_by_vectors(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        ks: Sequence[int],
+        score_threshold: Optional[float] = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        """Varias consultas con una sola multiplicación de matrices."""
+        self._load_if_changed()
+        # Una sola lectura de la tupla: una recarga concurrente no mezcla matriz y payloads
+        matrix, payloads = self._data
+        n = len(matrix)
+        if not len(embeddings):
+            return []
+        if n == 0:
+            return [[] for _ in embeddings]
+
+        queries = _normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        scores = queries @ matrix.T  # (q, n)
+        return [self._top_k(payloads, row, k or 4, score_threshold) for row, k in zip(scores, ks)]
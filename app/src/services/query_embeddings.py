@@ -0,0 +1,167 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from src.services.embedding_cache import normalize_text
+from src.services.embeddings import embed_queries_cached
+from config.project_config import SETTINGS
+
+
+"""
+
+SERVICIO DE EMBEDDINGS DE PREGUNTAS
+
+    Dos capas delante del modelo de embeddings para las consultas RAG:
+
+        - caché LRU acotada, con clave la pregunta normalizada igual que los textos de
+          la caché en disco (Unicode NFC y espacios; mayúsculas y tildes se respetan,
+          como en los documentos indexados). Se embebe el propio texto normalizado,
+          así la clave y el vector siempre casan.
+        - los fallos de la LRU pasan por la caché persistente en disco de preguntas
+          (embed_queries_cached) antes de llegar al modelo, que las embebe todas en
+          una llamada, con EMBEDDING_QUERY_PREFIX delante en los modelos asimétricos.
+        - micro-batcher async: las preguntas que llegan a la vez se acumulan durante
+          batch_window_ms y se embeben juntas en una sola pasada del modelo, en un hilo
+          aparte para no bloquear el event loop.
+
+"""
+
+
+def normalize_question(text: str) -> str:
+    return normalize_text(text)
+
+
+class QueryEmbedder:
+
+    def __init__(
+        self,
+        embed_queries: Callable[[List[str]], List[List[float]]],
+        cache_size: int = SETTINGS.query_embedding_cache_size,
+        batch_window_ms: float = SETTINGS.query_embedding_batch_window_ms,
+        max_batch_size: int = SETTINGS.query_embedding_max_batch,
+    ):
+        self._embed_queries = embed_queries
+        self.cache_size = cache_size
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+
+        self._cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        # Estado del micro-batcher (solo se toca desde el event loop)
+        self._queue: List[str] = []
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.batches = 0
+        self.batched_texts = 0
+
+    # --- caché LRU ---
+
+    def _cache_get(self, key: str) -> Optional[List[float]]:
+        with self._cache_lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+            return vector
+
+    def _cache_put(self, key: str, vector: List[float]) -> None:
+        with self._cache_lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # --- API síncrona ---
+
+    def embed(self, text: str) -> List[float]:
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Embebe varias preguntas en una sola pasada del modelo (solo las que no están en caché)."""
+        keys = [normalize_question(t) for t in texts]
+        vectors: Dict[str, List[float]] = {}
+        for key in keys:
+            if key not in vectors:
+                cached = self._cache_get(key)
+                if cached is not None:
+                    vectors[key] = cached
+
+        missing = [k for k in dict.fromkeys(keys) if k not in vectors]
+        if missing:
+            self.misses += len(missing)
+            self.batches += 1
+            self.batched_texts += len(missing)
+            for key, vector in zip(missing, self._embed_queries(missing)):
+                self._cache_put(key, vector)
+                vectors[key] = vector
+        return [vectors[k] for k in keys]
+
+    # --- API async con micro-batching ---
+
+    async def aembed(self, text: str) -> List[float]:
+        key = normalize_question(text)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        loop = asyncio.get_running_loop()
+        # Misma pregunta ya en cola o en curso: se comparte el resultado
+        future = self._pending.get(key)
+        if future is None:
+            future = loop.create_future()
+            self._pending[key] = future
+            self._queue.append(key)
+            if len(self._queue) >= self.max_batch_size:
+                self._flush()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.batch_window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        keys, self._queue = self._queue, []
+        if not keys:
+            return
+        futures = [self._pending[k] for k in keys]
+        asyncio.get_running_loop().create_task(self._run_batch(keys, futures))
+
+    async def _run_batch(self, keys: List[str], futures: List[asyncio.Future]) -> None:
+        self.misses += len(keys)
+        self.batches += 1
+        self.batched_texts += len(keys)
+        try:
+            vectors = await asyncio.to_thread(self._embed_queries, keys)
+        except Exception as e:
+            for key, future in zip(keys, futures):
+                self._pending.pop(key, None)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future, vector in zip(keys, futures, vectors):
+            self._cache_put(key, vector)
+            self._pending.pop(key, None)
+            if not future.done():
+                future.set_result(vector)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "cache_entries": len(self._cache),
+            "cache_size": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "batches": self.batches,
+            "avg_batch_size": round(self.batched_texts / self.batches, 2) if self.batches else 0.0,
+        }
+
+
+# El modelo se resuelve en cada llamada: importar este módulo no lo carga
+query_embedder = QueryEmbedder(embed_queries_cached)
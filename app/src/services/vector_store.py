@@ -1,32 +1,162 @@
-from langchain_qdrant import QdrantVectorStore
-from qdrant_client.http.models import Distance, VectorParams
-from src.services.embeddings import embeddings_model, vector_size
-from qdrant_client.http.exceptions import UnexpectedResponse
+import threading
+
+from src.services.embeddings import get_embeddings_model, get_vector_size
+from src.services.numpy_vector_store import CONTENT_PAYLOAD_KEY, NumpyVectorStore
 from config.project_config import SETTINGS
 
 qdrant_url = SETTINGS.qdrant_url
 collection_name = SETTINGS.qdrant_collection
 threshold = SETTINGS.threshold
-qdrant_client = SETTINGS.qdrant_client
 k_docs = SETTINGS.k_docs
 
+# Cliente y vector store se crean en el primer uso (o en el warm-up de arranque).
+# Si Qdrant no responde, la creación falla y se reintenta en la siguiente llamada.
+_qdrant_client = None
+_async_qdrant_client = None
+_vector_store = None
+_lock = threading.RLock()
+
+def _qdrant_client_kwargs() -> dict:
+    # Mismo transporte para el cliente síncrono y el async: REST con pool de
+    # conexiones o gRPC (QDRANT_PREFER_GRPC=1, puerto 6334), con timeout por petición
+    return {
+        "url": qdrant_url,
+        "api_key": SETTINGS.qdrant_api_key,
+        "prefer_grpc": SETTINGS.qdrant_prefer_grpc,
+        "grpc_port": SETTINGS.qdrant_grpc_port,
+        "timeout": SETTINGS.qdrant_timeout,
+        "pool_size": SETTINGS.qdrant_pool_size,
+    }
+
+def get_qdrant_client():
+    """Cliente síncrono compartido: indexación, ingesta y QdrantVectorStore."""
+    global _qdrant_client
+    if _qdrant_client is None:
+        with _lock:
+            if _qdrant_client is None:
+                from qdrant_client import QdrantClient
+                _qdrant_client = QdrantClient(**_qdrant_client_kwargs())
+    return _qdrant_client
+
+def get_async_qdrant_client():
+    """
+    Cliente async compartido para las búsquedas de la API. Se crea dentro del
+    event loop que lo usa (los canales gRPC async quedan ligados a ese loop).
+    Antes se asegura, una sola vez, de que la colección existe: en un despliegue
+    nuevo la primera consulta devuelve cero resultados en vez de un error.
+    """
+    global _async_qdrant_client
+    if _async_qdrant_client is None:
+        with _lock:
+            if _async_qdrant_client is None:
+                from qdrant_client import AsyncQdrantClient
+                create_collection_if_not_exists()
+                _async_qdrant_client = AsyncQdrantClient(**_qdrant_client_kwargs())
+    return _async_qdrant_client
+
 def create_collection_if_not_exists():
-    try:
-        qdrant_client.get_collection(collection_name)
+    from qdrant_client.http.models import Distance, VectorParams
+
+    qdrant_client = get_qdrant_client()
+    if qdrant_client.collection_exists(collection_name):
         print(f"Qdrant: colección '{collection_name}' encontrada.")
-    except UnexpectedResponse:
+    else:
         print(f"Qdrant: colección '{collection_name}' no existe. Creando...")
         qdrant_client.create_collection(
             collection_name=collection_name,
-            vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE)
+            vectors_config=VectorParams(size=get_vector_size(), distance=Distance.COSINE)
         )
         print(f"Qdrant: colección '{collection_name}' creada.")
 
-create_collection_if_not_exists()
+def create_vector_store():
+    """Vector store según VECTOR_STORE_BACKEND (qdrant por defecto, numpy sin servidor)."""
+    backend = SETTINGS.vector_store_backend
+    if backend == "numpy":
+        store = NumpyVectorStore(SETTINGS.numpy_store_dir, collection_name, get_vector_size())
+        print(f"NumpyVectorStore: colección '{collection_name}' con {len(store)} vectores.")
+        return store
+    if backend == "qdrant":
+        from langchain_qdrant import QdrantVectorStore
+
+        create_collection_if_not_exists()
+        return QdrantVectorStore(
+            client=get_qdrant_client(),
+            collection_name=collection_name,
+            embedding=get_embeddings_model(),
+        )
+    raise ValueError(f"VECTOR_STORE_BACKEND no soportado: '{backend}' (usa 'qdrant' o 'numpy')")
+
+def get_vector_store():
+    global _vector_store
+    if _vector_store is None:
+        with _lock:
+            if _vector_store is None:
+                _vector_store = create_vector_store()
+    return _vector_store
+
+def _point_document(point, collection: str = None):
+    """
+    Punto de Qdrant -> Document. El indexador guarda payloads planos (text, source_file,
+    page, chunk_id...), igual que el backend numpy: el texto va a page_content y el
+    resto a metadata. Los puntos con el formato de langchain (page_content + metadata)
+    también se leen.
+    """
+    from langchain_core.documents import Document
+
+    payload = dict(point.payload or {})
+    if CONTENT_PAYLOAD_KEY in payload:
+        content = payload.pop(CONTENT_PAYLOAD_KEY) or ""
+        metadata = payload
+    else:
+        content = payload.get("page_content") or ""
+        metadata = dict(payload.get("metadata") or {})
+    metadata["_id"] = point.id
+    metadata["_collection_name"] = collection or collection_name
+    return Document(page_content=content, metadata=metadata)
+
+def _points_to_results(points, collection: str = None) -> list:
+    return [(_point_document(point, collection), point.score) for point in points]
+
+def similarity_search_with_score_by_vector(question_vector: list, k: int) -> list:
+    """Búsqueda síncrona por vector, con el mismo formato de resultados que la async."""
+    store = get_vector_store()
+    if SETTINGS.vector_store_backend == "numpy":
+        return store.similarity_search_with_score_by_vector(question_vector, k=k)
+    response = store.client.query_points(
+        collection_name=store.collection_name,
+        query=question_vector,
+        limit=k or k_docs,
+        with_payload=True,
+        with_vectors=False,
+    )
+    return _points_to_results(response.points, store.collection_name)
+
+async def asimilarity_search_with_score_by_vector(question_vector: list, k: int) -> list:
+    """Búsqueda async: con Qdrant no bloquea el event loop; con numpy es una multiplicación local."""
+    if SETTINGS.vector_store_backend == "numpy":
+        return get_vector_store().similarity_search_with_score_by_vector(question_vector, k=k)
+    response = await get_async_qdrant_client().query_points(
+        collection_name=collection_name,
+        query=question_vector,
+        limit=k or k_docs,
+        with_payload=True,
+        with_vectors=False,
+        timeout=SETTINGS.qdrant_timeout,
+    )
+    return _points_to_results(response.points)
+
+async def asimilarity_search_batch(question_vectors: list, ks: list) -> list:
+    if SETTINGS.vector_store_backend == "numpy":
+        return get_vector_store().similarity_search_with_score_by_vectors(question_vectors, ks)
 
-qdrant_langchain = QdrantVectorStore.from_existing_collection(
-    embedding=embeddings_model,
-    collection_name=collection_name,
-    url=SETTINGS.qdrant_url,
-)
+    from qdrant_client.models import QueryRequest
 
+    responses = await get_async_qdrant_client().query_batch_points(
+        collection_name=collection_name,
+        requests=[
+            QueryRequest(query=vector, limit=k or k_docs, with_payload=True, with_vector=False)
+            for vector, k in zip(question_vectors, ks)
+        ],
+        timeout=SETTINGS.qdrant_timeout,
+    )
+    return [_points_to_results(response.points) for response in responses]
@@ -0,0 +1,129 @@
+import time
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+
+from config.project_config import SETTINGS
+
+
+"""
+
+WARM-UP Y READINESS DE LOS SERVICIOS RAG
+
+    Importar la API ya no carga modelos ni conecta con Qdrant: cada servicio se
+    crea en su primer uso (get_embeddings_model, get_vector_store, get_llm...).
+    Este módulo decide cuándo se paga ese coste:
+
+        - RAG_WARMUP=background (por defecto): al arrancar, un hilo inicializa los
+          servicios mientras la API ya acepta peticiones (/health responde enseguida)
+        - RAG_WARMUP=blocking: el arranque espera al primer intento de warm-up
+          (si falla, los reintentos siguen en segundo plano)
+        - RAG_WARMUP=off: nada por adelantado, todo se carga en la primera consulta
+          (/ready responde 200 desde el principio)
+
+    Si un paso falla (p. ej. Qdrant caído) se reintenta cada RAG_WARMUP_RETRY
+    segundos. GET /ready devuelve 200 cuando todo está listo y 503 mientras
+    tanto, con el tiempo de cada paso para medir el arranque en frío.
+
+"""
+
+
+def _warm_embeddings() -> None:
+    from src.services.embeddings import get_vector_size
+    # get_vector_size carga el modelo y hace una primera inferencia
+    get_vector_size()
+
+
+def _warm_vector_store() -> None:
+    from src.services.vector_store import get_vector_store
+    get_vector_store()
+
+
+def _warm_llms() -> None:
+    from src.agent.chain import get_answer_generation_chain, get_cheap_answer_generation_chain
+    get_answer_generation_chain()
+    get_cheap_answer_generation_chain()
+
+
+def _warm_bm25() -> None:
+    from src.agent.chain import get_bm25_index
+    get_bm25_index()
+
+
+WARMUP_STEPS: List[Tuple[str, Callable[[], None]]] = [
+    ("embeddings", _warm_embeddings),
+    ("vector_store", _warm_vector_store),
+    ("bm25", _warm_bm25),
+    ("llms", _warm_llms),
+]
+
+
+class Readiness:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ready = False
+        self.started_at = None
+        self.finished_at = None
+        self.attempts = 0
+        self.timings_ms: Dict[str, float] = {}
+        self.pending: List[str] = [name for name, _ in WARMUP_STEPS]
+        self.error = None
+
+    def run(self) -> bool:
+        """Ejecuta los pasos pendientes. Los ya completados no se repiten en los reintentos."""
+        with self._lock:
+            if self.started_at is None:
+                self.started_at = time.time()
+            self.attempts += 1
+            for name, step in WARMUP_STEPS:
+                if name not in self.pending:
+                    continue
+                t0 = time.perf_counter()
+                try:
+                    step()
+                except Exception as e:
+                    self.error = f"{name}: {e}"
+                    print(f"[warmup] {self.error}")
+                    return False
+                self.timings_ms[name] = round((time.perf_counter() - t0) * 1000, 1)
+                self.pending.remove(name)
+                print(f"[warmup] {name} listo en {self.timings_ms[name]} ms")
+
+            self.error = None
+            self.ready = True
+            self.finished_at = time.time()
+            return True
+
+    def run_until_ready(self, retry_seconds: float) -> None:
+        while not self.run():
+            time.sleep(retry_seconds)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "mode": SETTINGS.rag_warmup_mode,
+            "attempts": self.attempts,
+            "pending": list(self.pending),
+            "timings_ms": dict(self.timings_ms),
+            "total_ms": round((self.finished_at - self.started_at) * 1000, 1) if self.finished_at else None,
+            "error": self.error,
+        }
+
+
+readiness = Readiness()
+
+
+def start_warm_up() -> None:
+    """Hook de arranque de la API (lifespan de FastAPI)."""
+    mode = SETTINGS.rag_warmup_mode
+    if mode == "off":
+        readiness.ready = True
+        return
+    if mode == "blocking" and readiness.run():
+        return
+    threading.Thread(
+        target=readiness.run_until_ready,
+        args=(SETTINGS.rag_warmup_retry,),
+        name="rag-warmup",
+        daemon=True,
+    ).start()
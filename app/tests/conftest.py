@@ -0,0 +1,33 @@
+import copy
+import os
+import sys
+
+import pytest
+
+# Los módulos se importan desde app/ (igual que con uvicorn main:app o uv run -m scripts...)
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+
+BILLING_DATA = {
+    "customers": [
+        {"user_id": 1, "name": "Ana", "account_dni": "12345678Z"},
+        {"user_id": 2, "name": "Luis", "account_dni": "87655678Z"},
+    ],
+    "supplies": [
+        {"cups_id": 101, "user_id": 1, "cups": "ES0000000000000000AB12CD"},
+        {"cups_id": 201, "user_id": 2, "cups": "ES0000000000000000XX12CD"},
+    ],
+    "invoices": [
+        {"invoice_id": "F1", "user_id": 1, "cups_id": 101, "period": "2025-08", "issue_date": "2025-09-05", "due_date": "2025-09-20", "amount": 40.0, "status": "PAID"},
+        {"invoice_id": "F2", "user_id": 1, "cups_id": 101, "period": "2025-09", "issue_date": "2025-10-05", "due_date": "2025-10-20", "amount": 30.5, "status": "OVERDUE"},
+        {"invoice_id": "F3", "user_id": 1, "cups_id": 101, "period": "2025-10", "issue_date": "2025-11-05", "due_date": "2025-11-20", "amount": 20.25, "status": "DUE"},
+    ],
+}
+
+
+@pytest.fixture
+def billing_data():
+    """Datos de facturación con el formato de sample_data.json (copia nueva por test)."""
+    return copy.deepcopy(BILLING_DATA)
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from helpers.billing_repository import BillingRepository, BillingSnapshot
+from routers.billing.info import handle_check_outstanding_amount, handle_list_unpaid_invoices
+
+
+@pytest.fixture
+def repo(tmp_path, billing_data):
+    path = tmp_path / "billing.json"
+    path.write_text(json.dumps(billing_data), encoding="utf-8")
+    return BillingRepository(str(path))
+
+
+def test_snapshot_indexes(billing_data):
+    snap = BillingSnapshot.from_data(billing_data)
+
+    assert snap.get_customer(2)["name"] == "Luis"
+    assert [s["cups_id"] for s in snap.get_supplies(1)] == [101]
+    assert [i["invoice_id"] for i in snap.get_invoices(1, 101)] == ["F1", "F2", "F3"]
+    # Sufijos compartidos: varios resultados
+    assert {c["user_id"] for c in snap.find_customers_by_dni_suffix("5678z")} == {1, 2}
+    assert {s["cups_id"] for s in snap.find_supplies_by_cups_suffix("ab12cd")} == {101}
+    assert snap.find_customers_by_dni_suffix("0000A") == []
+
+
+def test_debt_summary_orders_unpaid_by_due_date(billing_data):
+    debt = BillingSnapshot.from_data(billing_data).get_debt_summary(1, 101)
+
+    assert debt.unpaid_count == 2
+    assert debt.total_due == 50.75
+    assert [i["invoice_id"] for i in debt.top()] == ["F3", "F2"]
+    assert BillingSnapshot.from_data(billing_data).get_debt_summary(2, 201).unpaid_count == 0
+
+
+def test_handlers_read_invoices_by_cups_id(billing_data):
+    snap = BillingSnapshot.from_data(billing_data)
+    params = {"user_id": 1, "cups_id": 101}
+
+    text, _ = handle_list_unpaid_invoices(params, snap)
+    assert "2025-09" in text and "2025-10" in text and "2025-08" not in text
+    text, _ = handle_check_outstanding_amount(params, snap)
+    assert "50,75" in text or "50.75" in text
+
+
+def test_set_invoice_status_publishes_new_snapshot(repo):
+    before = repo.snapshot()
+
+    updated = repo.set_invoice_status("F2", "PAID")
+
+    assert updated["status"] == "PAID"
+    after = repo.snapshot()
+    assert after is not before
+    assert after.get_debt_summary(1, 101).total_due == 20.25
+    assert [i["status"] for i in after.get_invoices(1, 101)] == ["PAID", "PAID", "DUE"]
+    # Quien ya tenía el snapshot anterior sigue viendo los datos sin cambios
+    assert before.get_debt_summary(1, 101).total_due == 50.75
+    assert before.invoices_by_id["F2"]["status"] == "OVERDUE"
+
+    repo.set_invoice_status("F1", "DUE")
+    assert [i["invoice_id"] for i in repo.snapshot().get_debt_summary(1, 101).unpaid] == ["F3", "F1"]
+    assert repo.set_invoice_status("NOPE", "PAID") is None
+
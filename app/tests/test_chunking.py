@@ -0,0 +1,50 @@
+import pytest
+
+from src.rag.chunking import TokenCounter, chunk_text
+
+
+COUNTER = TokenCounter(None)  # aproximación por regex, sin transformers
+
+TEXT = "\n\n".join(
+    " ".join(f"La factura {p}.{s} incluye el término de potencia y la energía consumida." for s in range(6))
+    for p in range(8)
+)
+
+
+@pytest.mark.parametrize("max_tokens,overlap_tokens", [(60, 24), (128, 50), (200, 0)])
+def test_chunks_fit_window_and_overlap(max_tokens, overlap_tokens):
+    # Cada frase tiene 22 tokens: el solape, si lo hay, cabe al menos una
+    chunks = list(chunk_text(TEXT, max_tokens, overlap_tokens, COUNTER))
+
+    assert len(chunks) > 1
+    assert all(COUNTER.count(chunk) <= max_tokens for chunk in chunks)
+
+    for previous, current in zip(chunks, chunks[1:]):
+        # El solape es un final del chunk anterior, de como mucho overlap_tokens
+        shared = max(
+            (len(current[:i]) for i in range(1, len(current) + 1) if previous.endswith(current[:i])),
+            default=0,
+        )
+        assert COUNTER.count(current[:shared]) <= overlap_tokens
+        if overlap_tokens:
+            assert shared > 0
+
+    # No se pierde ninguna frase
+    for p in range(8):
+        for s in range(6):
+            assert any(f"La factura {p}.{s} " in chunk for chunk in chunks)
+
+
+def test_long_sentence_is_split():
+    sentence = " ".join(f"palabra{i}" for i in range(200)) + "."
+
+    chunks = list(chunk_text(sentence, 30, 5, COUNTER))
+
+    assert len(chunks) > 1
+    assert all(COUNTER.count(chunk) <= 30 for chunk in chunks)
+    assert chunks[0].startswith("palabra0 ") and chunks[-1].endswith("palabra199.")
+
+
+def test_empty_text_yields_nothing():
+    assert list(chunk_text("", 40, 10, COUNTER)) == []
+    assert list(chunk_text("  \n\n ", 40, 10, COUNTER)) == []
@@ -0,0 +1,29 @@
+import asyncio
+
+from helpers.dialogflow_client import DialogflowClient, FakeSessionsAsyncClient
+
+
+def test_detect_intent_text_with_fake_client():
+    client = DialogflowClient("demo", session_client=FakeSessionsAsyncClient(latency=0.0, jitter=0.0))
+
+    result = asyncio.run(client.detect_intent_text("42", "hola"))
+
+    assert result.fulfillment_text == "(fake) hola"
+
+
+def test_queue_wait_counts_towards_timeout():
+    fake = FakeSessionsAsyncClient(latency=0.3, jitter=0.0)
+    client = DialogflowClient("demo", timeout=0.5, max_concurrency=1, session_client=fake)
+
+    async def two_calls():
+        return await asyncio.gather(
+            client.detect_intent_text("1", "primera"),
+            client.detect_intent_text("2", "segunda"),
+            return_exceptions=True,
+        )
+
+    first, second = asyncio.run(two_calls())
+
+    assert first.fulfillment_text == "(fake) primera"
+    # 0.3 s esperando plaza + 0.3 s de llamada > 0.5 s de timeout
+    assert isinstance(second, asyncio.TimeoutError)
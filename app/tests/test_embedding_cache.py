@@ -0,0 +1,75 @@
+from src.services.embedding_cache import HEADER, EmbeddingCache
+
+
+def test_round_trip_and_normalized_keys(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "modelo")
+
+    assert cache.get_many(["hola mundo"]) == [None]
+    cache.put_many(["hola mundo", "adiós"], [[1.0, 2.0], [3.0, 4.0]])
+
+    # Mismas claves salvo espacios; las mayúsculas sí cuentan
+    assert cache.get_many(["  hola\n mundo ", "adiós", "Hola mundo"]) == [[1.0, 2.0], [3.0, 4.0], None]
+    assert len(cache) == 2
+    assert cache.stats()["hits"] == 2
+
+
+def test_persists_and_sees_other_writers(tmp_path):
+    writer = EmbeddingCache(str(tmp_path), "modelo")
+    writer.put_many(["a"], [[1.0, 0.0]])
+
+    reader = EmbeddingCache(str(tmp_path), "modelo")
+    assert reader.get_many(["a"]) == [[1.0, 0.0]]
+
+    # Registros añadidos por otra instancia (otro proceso) después de abrir la caché
+    writer.put_many(["b"], [[0.0, 1.0]])
+    assert reader.get_many(["b"]) == [[0.0, 1.0]]
+
+    # Otro modelo, otro fichero
+    assert EmbeddingCache(str(tmp_path), "otro").get_many(["a"]) == [None]
+
+
+def test_stops_growing_at_max_bytes(tmp_path):
+    record_bytes = 32 + 2 * 4
+    cache = EmbeddingCache(str(tmp_path), "modelo", max_bytes=HEADER.size + 2 * record_bytes)
+
+    cache.put_many(["a", "b"], [[1.0, 1.0], [2.0, 2.0]])
+    cache.put_many(["c"], [[3.0, 3.0]])
+
+    assert len(cache) == 2
+    assert cache.get_many(["a", "c"]) == [[1.0, 1.0], None]
+
+
+def test_dimension_mismatch_disables_cache(tmp_path):
+    EmbeddingCache(str(tmp_path), "modelo").put_many(["a"], [[1.0, 2.0]])
+
+    cache = EmbeddingCache(str(tmp_path), "modelo")
+    cache.put_many(["b"], [[1.0, 2.0, 3.0]])
+
+    assert cache.get_many(["a", "b"]) == [None, None]
+    assert len(EmbeddingCache(str(tmp_path), "modelo")) == 1
+
+
+def test_invalid_file_is_ignored(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "modelo")
+    with open(cache.path, "wb") as f:
+        f.write(b"esto no es una cache de embeddings")
+
+    cache.put_many(["a"], [[1.0, 2.0]])
+
+    assert cache.get_many(["a"]) == [None]
+    with open(cache.path, "rb") as f:
+        assert f.read() == b"esto no es una cache de embeddings"
+
+
+def test_partial_record_is_dropped_before_appending(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), "modelo")
+    cache.put_many(["a"], [[1.0, 2.0]])
+    # Un proceso que murió a mitad de un write
+    with open(cache.path, "ab") as f:
+        f.write(b"\x01" * 10)
+
+    EmbeddingCache(str(tmp_path), "modelo").put_many(["b"], [[3.0, 4.0]])
+
+    fresh = EmbeddingCache(str(tmp_path), "modelo")
+    assert fresh.get_many(["a", "b"]) == [[1.0, 2.0], [3.0, 4.0]]
+    assert len(fresh) == 2
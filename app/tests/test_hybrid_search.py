@@ -0,0 +1,106 @@
+import pytest
+from langchain_core.documents import Document
+
+from config.project_config import SETTINGS
+from src.agent import chain
+from src.rag.bm25 import BM25Index
+
+
+def payload(chunk_id, text, source_file="FAQs.pdf", page=1):
+    return {"chunk_id": chunk_id, "text": text, "source_file": source_file, "page": page}
+
+
+def dense_hit(chunk_id, text, score, **extra):
+    metadata = {"chunk_id": chunk_id, "_id": chunk_id, "source_file": "FAQs.pdf", "page": 1, **extra}
+    return Document(page_content=text, metadata=metadata), score
+
+
+@pytest.fixture
+def bm25(monkeypatch):
+    index = BM25Index()
+    monkeypatch.setattr(chain, "_bm25_index", index)
+    monkeypatch.setattr(SETTINGS, "rag_hybrid_enabled", True)
+    monkeypatch.setattr(SETTINGS, "rag_bm25_min_score", 0.0)
+    return index
+
+
+def test_fuse_sources_dedupes_by_chunk_id(bm25):
+    # Mismo chunk con distinto texto en cada backend (p. ej. espacios normalizados): un solo resultado
+    bm25.add([payload("a", "penalización por baja anticipada"), payload("b", "tarifa óptima sin permanencia")])
+    dense = [dense_hit("a", "penalización  por baja anticipada ", 0.8), dense_hit("c", "domiciliación del pago", 0.5)]
+
+    sources = chain.fuse_sources("penalización baja", dense, k=5)
+
+    ids = [s["chunk_id"] for s in sources]
+    assert ids[0] == "a"
+    assert sorted(ids) == ["a", "c"]
+    assert sources[0]["score"] == 0.8 and sources[0]["bm25_score"] > 0
+
+
+def test_fuse_sources_keeps_identical_texts_with_different_ids(bm25):
+    bm25.add([payload("a", "aviso legal", page=1), payload("b", "aviso legal", page=9)])
+    dense = [dense_hit("a", "aviso legal", 0.7)]
+
+    sources = chain.fuse_sources("aviso legal", dense, k=5)
+
+    assert sorted(s["chunk_id"] for s in sources) == ["a", "b"]
+    only_bm25 = next(s for s in sources if s["chunk_id"] == "b")
+    assert only_bm25["score"] is None and only_bm25["page"] == 9
+
+
+def test_fuse_sources_falls_back_to_text_without_chunk_id(bm25):
+    bm25.add([{"text": "lectura del contador", "source_file": "FAQs.pdf"}])
+    doc = Document(page_content="lectura del contador", metadata={"source_file": "FAQs.pdf"})
+
+    sources = chain.fuse_sources("contador", [(doc, 0.6)], k=5)
+
+    assert len(sources) == 1
+    assert sources[0]["score"] == 0.6 and "bm25_score" in sources[0]
+
+
+def test_fuse_sources_respects_threshold_and_k(bm25):
+    bm25.add([payload(str(i), f"factura mensual {i}") for i in range(10)])
+    dense = [dense_hit("x", "otro texto", 0.1)]
+
+    sources = chain.fuse_sources("factura", dense, k=3, threshold=0.5)
+
+    assert len(sources) == 3
+    assert all(s["chunk_id"] != "x" for s in sources)
+
+
+def test_hybrid_picks_up_index_created_after_startup(tmp_path, monkeypatch):
+    path = str(tmp_path / "bm25.json")
+    monkeypatch.setattr(SETTINGS, "rag_hybrid_enabled", True)
+    monkeypatch.setattr(SETTINGS, "bm25_index_path", path)
+    monkeypatch.setattr(chain, "_bm25_index", None)
+    assert not chain._use_hybrid()
+
+    index = BM25Index(path)
+    index.add([payload("a", "potencia contratada")])
+    index.save()
+
+    assert chain._use_hybrid()
+
+
+def test_bm25_add_replaces_by_chunk_id():
+    index = BM25Index()
+    index.add([payload("a", "texto viejo"), payload("b", "otro")])
+    index.add([payload("a", "texto nuevo")])
+
+    assert len(index) == 2
+    assert [d["text"] for d, _ in index.search("texto")] == ["texto nuevo"]
+    assert index.remove(chunk_ids=["zzz"]) == 0
+    assert index.remove(chunk_ids=["a"]) == 1
+    index.add([payload("a", "texto de nuevo")])
+    assert len(index) == 2
+
+
+def test_bm25_reload_keeps_chunk_ids(tmp_path):
+    path = str(tmp_path / "bm25.json")
+    writer = BM25Index(path)
+    writer.add([payload("a", "texto viejo")])
+    writer.save()
+
+    reader = BM25Index.load(path)
+    reader.add([payload("a", "texto nuevo")])
+    assert len(reader) == 1
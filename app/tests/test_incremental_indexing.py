@@ -0,0 +1,164 @@
+import hashlib
+import os
+
+import pytest
+
+from scripts import rag_indexer
+from src.rag import cache
+from src.rag.bm25 import BM25Index
+from src.services import embeddings
+from src.services.numpy_vector_store import NumpyVectorStore
+
+
+@pytest.fixture
+def indexer(tmp_path, monkeypatch):
+    """main() con backend numpy, "PDFs" de texto (una página por \\f) y embeddings de mentira."""
+    embedded = []
+
+    def fake_embed(texts):
+        embedded.extend(texts)
+        return [list(hashlib.sha256(t.encode("utf-8")).digest()[:8]) for t in texts]
+
+    def fake_extract(pdf_path):
+        with open(pdf_path, "r", encoding="utf-8") as f:
+            return [(i + 1, page.strip()) for i, page in enumerate(f.read().split("\f"))]
+
+    monkeypatch.setattr(embeddings, "embed_documents_cached", fake_embed)
+    monkeypatch.setattr(rag_indexer, "try_extract_text_pdf", fake_extract)
+    monkeypatch.setattr(rag_indexer, "pages_needing_ocr", lambda pages_text: [])
+    monkeypatch.setattr(cache, "mark_index_updated", lambda: None)
+
+    def run(pdfs):
+        embedded.clear()
+        rag_indexer.main(
+            pdf_paths=[str(tmp_path / name) for name in pdfs],
+            backend="numpy",
+            numpy_store_dir=str(tmp_path / "store"),
+            bm25_index_path=str(tmp_path / "bm25.json"),
+            manifest_path=str(tmp_path / "manifest.json"),
+        )
+        return list(embedded)
+
+    def indexed():
+        store = NumpyVectorStore(str(tmp_path / "store"), rag_indexer.COLLECTION_NAME)
+        hits = store.similarity_search_with_score_by_vector([1.0] * 8, k=100)
+        bm25 = BM25Index.load(str(tmp_path / "bm25.json"))
+        texts = sorted(d.page_content for d, _ in hits)
+        assert sorted(d["text"] for d in bm25.docs) == texts
+        return texts
+
+    def write(name, *pages):
+        (tmp_path / name).write_text("\f".join(pages), encoding="utf-8")
+
+    run.indexed, run.write = indexed, write
+    return run
+
+
+PAGE_A = "La factura se emite cada mes."
+PAGE_B1 = "El pago se domicilia en la cuenta del titular."
+PAGE_B2 = "La potencia contratada se puede cambiar una vez al año."
+PAGE_C = "La baja no tiene penalización."
+
+
+def test_incremental_reindex(indexer):
+    indexer.write("a.pdf", PAGE_A)
+    indexer.write("b.pdf", PAGE_B1, PAGE_B2)
+    indexer.write("c.pdf", PAGE_C)
+
+    assert sorted(indexer(["a.pdf", "b.pdf", "c.pdf"])) == sorted([PAGE_A, PAGE_B1, PAGE_B2, PAGE_C])
+    assert indexer.indexed() == sorted([PAGE_A, PAGE_B1, PAGE_B2, PAGE_C])
+
+    # Sin cambios: no se extrae ni se embebe nada
+    assert indexer(["a.pdf", "b.pdf", "c.pdf"]) == []
+
+    # b cambia una página y c sale del corpus: solo se embebe la página nueva
+    new_b2 = "La potencia contratada se puede cambiar dos veces al año."
+    indexer.write("b.pdf", PAGE_B1, new_b2)
+    assert indexer(["a.pdf", "b.pdf"]) == [new_b2]
+    assert indexer.indexed() == sorted([PAGE_A, PAGE_B1, new_b2])
+
+
+def test_changed_config_reindexes_everything(indexer, monkeypatch):
+    from config.project_config import SETTINGS
+
+    indexer.write("a.pdf", PAGE_A)
+    indexer(["a.pdf"])
+
+    monkeypatch.setattr(SETTINGS, "chunk_overlap_tokens", SETTINGS.chunk_overlap_tokens + 1)
+    assert indexer(["a.pdf"]) == [PAGE_A]
+    assert indexer.indexed() == [PAGE_A]
+
+
+# Funciones a nivel de módulo: el pool de procesos las recibe por referencia
+def extract_pages(pdf_path):
+    with open(pdf_path, "r", encoding="utf-8") as f:
+        return [(i + 1, page.strip()) for i, page in enumerate(f.read().split("\f"))]
+
+
+def fake_ocr(pdf_path, page_num):
+    return page_num, f"Texto reconocido de la página {page_num} de {os.path.basename(pdf_path)}."
+
+
+def test_parallel_extraction_matches_sequential(tmp_path, monkeypatch):
+    monkeypatch.setattr(rag_indexer, "try_extract_text_pdf", extract_pages)
+    monkeypatch.setattr(rag_indexer, "ocr_page_adaptive", fake_ocr)
+    monkeypatch.setattr(rag_indexer, "PDF_FILES_PER_WORKER", 1)
+
+    pdfs = []
+    for n in range(6):
+        path = tmp_path / f"doc{n}.pdf"
+        # Páginas vacías (escaneadas) intercaladas con páginas con texto
+        pages = [PAGE_B1 + " " + PAGE_B2 if p % 2 == 0 else "" for p in range(n + 1)]
+        path.write_text("\f".join(pages), encoding="utf-8")
+        pdfs.append(str(path))
+
+    def as_dict(results):
+        return {pdf: [(c.page, c.chunk_index, c.text) for c in chunks] for pdf, chunks in results}
+
+    sequential = as_dict(rag_indexer.iter_pdf_chunks(pdfs, 900, 150, workers=1))
+    parallel = list(rag_indexer.iter_pdf_chunks(pdfs, 900, 150, workers=2))
+
+    assert sorted(pdf for pdf, _ in parallel) == sorted(pdfs)
+    assert as_dict(parallel) == sequential
+
+
+def test_qdrant_backend_uses_shared_client(indexer, tmp_path, monkeypatch):
+    from qdrant_client import QdrantClient
+    from src.services import vector_store
+
+    client = QdrantClient(":memory:")
+    monkeypatch.setattr(vector_store, "_qdrant_client", client)
+
+    indexer.write("b.pdf", PAGE_B1, PAGE_B2)
+    rag_indexer.main(pdf_paths=[str(tmp_path / "b.pdf")], backend="qdrant", manifest_path=str(tmp_path / "q.json"))
+    indexer.write("b.pdf", PAGE_B1, PAGE_C)
+    rag_indexer.main(pdf_paths=[str(tmp_path / "b.pdf")], backend="qdrant", manifest_path=str(tmp_path / "q.json"))
+
+    points, _ = client.scroll(rag_indexer.COLLECTION_NAME, limit=10, with_payload=True)
+    assert sorted(p.payload["text"] for p in points) == sorted([PAGE_B1, PAGE_C])
+
+
+def test_embedding_error_is_not_masked_by_upload_error(indexer, tmp_path, monkeypatch):
+    calls = []
+
+    def failing_embed(texts):
+        calls.append(texts)
+        if len(calls) > 1:
+            raise RuntimeError("modelo caído")
+        return [[1.0] * 8 for _ in texts]
+
+    def failing_add(self, payloads):
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(embeddings, "embed_documents_cached", failing_embed)
+    monkeypatch.setattr(BM25Index, "add", failing_add)
+
+    indexer.write("b.pdf", PAGE_B1, PAGE_B2)
+    with pytest.raises(RuntimeError, match="modelo caído"):
+        rag_indexer.main(
+            pdf_paths=[str(tmp_path / "b.pdf")],
+            batch_size=1,
+            backend="numpy",
+            numpy_store_dir=str(tmp_path / "store"),
+            bm25_index_path=str(tmp_path / "bm25.json"),
+        )
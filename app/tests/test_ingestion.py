@@ -0,0 +1,57 @@
+import asyncio
+import hashlib
+
+import pytest
+
+from config.project_config import SETTINGS
+from src.rag import cache, ingestion
+from src.rag.bm25 import BM25Index
+from src.services import vector_store
+from src.services.numpy_vector_store import NumpyVectorStore
+
+
+def fake_embed(chunks):
+    return [list(hashlib.sha256(c.text.encode("utf-8")).digest()[:8]) for c in chunks]
+
+
+@pytest.fixture
+def numpy_backend(tmp_path, monkeypatch):
+    store = NumpyVectorStore(str(tmp_path / "store"), "test")
+    monkeypatch.setattr(SETTINGS, "vector_store_backend", "numpy")
+    monkeypatch.setattr(SETTINGS, "bm25_index_path", str(tmp_path / "bm25.json"))
+    monkeypatch.setattr(vector_store, "_vector_store", store)
+    monkeypatch.setattr(ingestion, "_embed", fake_embed)
+    monkeypatch.setattr(cache, "mark_index_updated", lambda: None)
+    return store
+
+
+def ingest(tmp_path, job_id, text):
+    job_dir = tmp_path / job_id
+    job_dir.mkdir()
+    path = job_dir / "tarifas.md"
+    path.write_text(text, encoding="utf-8")
+    job = ingestion.IngestionJob(job_id=job_id, filename="tarifas.md", path=str(path))
+    asyncio.run(ingestion.IngestionManager(batch_size=2)._process(job))
+    assert job.status == ingestion.STATUS_DONE, job.error
+    return job
+
+
+def test_reupload_replaces_previous_version(tmp_path, numpy_backend):
+    ingest(tmp_path, "v1", "Tarifa antigua con permanencia de doce meses.")
+    ingest(tmp_path, "v2", "Tarifa nueva sin permanencia.")
+
+    hits = numpy_backend.similarity_search_with_score_by_vector([1.0] * 8, k=10)
+    texts = [doc.page_content for doc, _ in hits]
+    assert texts == ["Tarifa nueva sin permanencia."]
+    bm25 = BM25Index.load(SETTINGS.bm25_index_path)
+    assert [d["text"] for d in bm25.docs] == texts
+    assert not (tmp_path / "v2").exists()
+
+
+def test_validate_upload_limits_size(monkeypatch):
+    monkeypatch.setattr(ingestion, "MAX_UPLOAD_BYTES", 10)
+    assert ingestion.validate_upload("dir/doc.pdf", b"x" * 10) == "doc.pdf"
+    with pytest.raises(ValueError, match="supera"):
+        ingestion.validate_upload("doc.pdf", b"x" * 11)
+    with pytest.raises(ValueError):
+        ingestion.validate_upload("doc.exe", b"x")
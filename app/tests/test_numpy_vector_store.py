@@ -0,0 +1,32 @@
+import os
+
+from src.services.numpy_vector_store import NumpyVectorStore
+
+
+def payload(chunk_id, text, source_file="FAQs.pdf"):
+    return {"chunk_id": chunk_id, "text": text, "source_file": source_file, "page": 1}
+
+
+def test_reader_reloads_matrix_and_payloads_together(tmp_path):
+    writer = NumpyVectorStore(str(tmp_path), "test")
+    reader = NumpyVectorStore(str(tmp_path), "test")
+    assert len(reader) == 0
+
+    writer.add([[1.0, 0.0], [0.0, 1.0]], [payload("a", "uno"), payload("b", "dos", "tarifas.md")])
+    # Fuerza un mtime distinto aunque el sistema de ficheros tenga poca resolución
+    for path in (writer.vectors_path, writer.payloads_path):
+        os.utime(path, (1, 1))
+
+    hits = reader.similarity_search_with_score_by_vector([0.1, 1.0], k=2)
+    assert [(d.page_content, d.metadata["_id"]) for d, _ in hits] == [("dos", "b"), ("uno", "a")]
+
+
+def test_update_replaces_ids_and_drops_sources(tmp_path):
+    store = NumpyVectorStore(str(tmp_path), "test")
+    store.add([[1.0, 0.0], [0.0, 1.0]], [payload("a", "uno"), payload("b", "dos", "tarifas.md")])
+
+    store.update([[1.0, 1.0]], [payload("a", "uno bis")], delete_sources=["tarifas.md"])
+
+    hits = store.similarity_search_with_score_by_vector([1.0, 0.0], k=5)
+    assert [d.page_content for d, _ in hits] == ["uno bis"]
+    assert len(NumpyVectorStore(str(tmp_path), "test")) == 1
@@ -0,0 +1,70 @@
+import asyncio
+
+from src.services import embeddings
+from src.services.query_embeddings import QueryEmbedder
+
+
+class FakeEmbed:
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(t)), float(sum(map(ord, t)))] for t in texts]
+
+
+def test_questions_keep_case_and_collapse_whitespace():
+    fake = FakeEmbed()
+    embedder = QueryEmbedder(fake, cache_size=8)
+
+    embedder.embed_many(["¿Qué es  la\tTarifa?", "¿Qué es la Tarifa?", "¿qué es la tarifa?"])
+
+    # Mismo texto salvo espacios -> una sola clave; las mayúsculas no se tocan
+    assert fake.calls == [["¿Qué es la Tarifa?", "¿qué es la tarifa?"]]
+
+
+def test_lru_hits_and_micro_batch():
+    fake = FakeEmbed()
+    embedder = QueryEmbedder(fake, cache_size=8, batch_window_ms=20, max_batch_size=16)
+
+    async def ask():
+        return await asyncio.gather(*(embedder.aembed(q) for q in ["uno", "dos", "uno", "tres"]))
+
+    vectors = asyncio.run(ask())
+    assert len(fake.calls) == 1 and sorted(fake.calls[0]) == ["dos", "tres", "uno"]
+    assert vectors[0] == vectors[2]
+
+    assert embedder.embed("uno") == vectors[0]
+    assert len(fake.calls) == 1
+    assert embedder.stats()["hits"] == 1
+
+
+class FakeModel:
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[1.0, float(len(t))] for t in texts]
+
+    def embed_query(self, text):
+        raise AssertionError("las preguntas se embeben por lotes, no de una en una")
+
+
+def test_embed_queries_cached_one_model_call_per_batch(tmp_path, monkeypatch):
+    from src.services.embedding_cache import EmbeddingCache
+
+    model = FakeModel()
+    cache = EmbeddingCache(str(tmp_path), "modelo#query")
+    monkeypatch.setattr(embeddings, "get_embeddings_model", lambda: model)
+    monkeypatch.setattr(embeddings, "get_query_embedding_cache", lambda: cache)
+    monkeypatch.setattr(embeddings, "QUERY_PREFIX", "query: ")
+
+    assert embeddings.embed_queries_cached(["hola", "adiós"]) == [[1.0, 11.0], [1.0, 12.0]]
+    assert model.calls == [["query: hola", "query: adiós"]]
+
+    # Solo los fallos de la caché llegan al modelo, también en una llamada
+    embeddings.embed_queries_cached(["hola", "uno", "dos"])
+    assert model.calls[1:] == [["query: uno", "query: dos"]]
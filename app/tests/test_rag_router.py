@@ -0,0 +1,106 @@
+import asyncio
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from config.project_config import SETTINGS
+from src.rag import router
+from src.rag.cache import SemanticCache
+from src.rag.schema import RAGRequest
+from src.services import embeddings
+from src.services.query_embeddings import QueryEmbedder
+
+DOCS = [{"score": 0.91, "source": "FAQs.pdf", "page": 3, "chunk_id": "a", "section": "El pago se domicilia."}]
+
+
+@pytest.fixture(autouse=True)
+def fake_services(tmp_path, monkeypatch):
+    monkeypatch.setattr(router.query_embedder, "embed_many", lambda questions: [[1.0, float(i)] for i, _ in enumerate(questions)])
+    monkeypatch.setattr(router, "semantic_cache", SemanticCache(stamp_path=str(tmp_path / "stamp")))
+    monkeypatch.setattr(SETTINGS, "semantic_cache_enabled", True)
+
+
+async def collect(aiter):
+    return [item async for item in aiter]
+
+
+def test_batch_reports_item_errors_without_breaking(monkeypatch):
+    async def sources_batch(questions, vectors, ks, thresholds):
+        return [list(DOCS) for _ in questions]
+
+    async def answer(input_dict):
+        if input_dict["question"] == "falla":
+            raise RuntimeError("LLM caído")
+        return {**input_dict, "answer": "ok", "answer_path": "llm", "top_score": 0.91}
+
+    monkeypatch.setattr(router, "aget_sources_info_batch", sources_batch)
+    monkeypatch.setattr(router, "answer_step", RunnableLambda(lambda x: x, afunc=answer))
+
+    requests = [RAGRequest(question=q) for q in ("uno", "falla", "tres")]
+    items = asyncio.run(collect(router.rag_batch(requests)))
+
+    assert [i for i, _, _ in items] == [0, 1, 2]
+    assert items[1][1] is None and items[1][2] == router.BATCH_ERROR_MESSAGE
+    assert items[0][1].answer == "ok"
+    assert items[0][1].sources[0].source == "FAQs.pdf"
+
+
+def test_batch_embeds_all_questions_in_one_model_call(monkeypatch):
+    calls = []
+
+    class FakeModel:
+        def embed_documents(self, texts):
+            calls.append(list(texts))
+            return [[1.0, float(i)] for i, _ in enumerate(texts)]
+
+    async def sources_batch(questions, vectors, ks, thresholds):
+        return [[] for _ in questions]
+
+    monkeypatch.setattr(embeddings, "get_embeddings_model", lambda: FakeModel())
+    monkeypatch.setattr(embeddings, "get_query_embedding_cache", lambda: None)
+    monkeypatch.setattr(router, "query_embedder", QueryEmbedder(embeddings.embed_queries_cached))
+    monkeypatch.setattr(router, "aget_sources_info_batch", sources_batch)
+    monkeypatch.setattr(SETTINGS, "semantic_cache_enabled", False)
+
+    questions = [f"pregunta {i}" for i in range(50)]
+    items = asyncio.run(collect(router.rag_batch([RAGRequest(question=q) for q in questions])))
+
+    assert len(items) == 50
+    assert calls == [questions]
+
+
+def test_batch_retrieval_failure_errors_every_pending_item(monkeypatch):
+    async def sources_batch(*args):
+        raise ConnectionError("Qdrant no responde")
+
+    monkeypatch.setattr(router, "aget_sources_info_batch", sources_batch)
+
+    items = asyncio.run(collect(router.rag_batch([RAGRequest(question="a"), RAGRequest(question="b")])))
+
+    assert [(i, r, e) for i, r, e in items] == [(0, None, router.BATCH_ERROR_MESSAGE), (1, None, router.BATCH_ERROR_MESSAGE)]
+
+
+def test_stream_caches_retrieved_sources(monkeypatch):
+    async def aembed(question):
+        return [1.0, 0.0]
+
+    async def sources(question, k, threshold, question_vector):
+        return list(DOCS)
+
+    class FakeChain:
+        async def astream(self, chain_input):
+            for token in ("Se ", "domicilia."):
+                yield token
+
+    monkeypatch.setattr(router.query_embedder, "aembed", aembed)
+    monkeypatch.setattr(router, "aget_sources_info", sources)
+    monkeypatch.setattr(router, "get_generation_chain", lambda input_dict, path: (FakeChain(), input_dict))
+
+    request = RAGRequest(question="¿Cómo pago?", threshold=0.5)
+    events = asyncio.run(collect(router.rag_stream(request)))
+    assert [name for name, _ in events] == ["sources", "token", "token", "done"]
+
+    cached = asyncio.run(collect(router.rag_stream(request)))
+    assert cached[-1][1]["answer_path"] == "cache"
+    assert cached[0][1]["sources"] == [{"source": "FAQs.pdf", "reason": "página 3, similitud 0.910"}]
+    assert cached[1][1]["text"] == "Se domicilia."
@@ -0,0 +1,60 @@
+import io
+import json
+
+import pytest
+
+from helpers.billing_repository import BillingSnapshot
+from helpers.sqlite_billing_store import SqliteBillingStore, import_json_data, import_json_records
+from scripts.import_billing_json import iter_json_records
+
+
+@pytest.fixture
+def store(tmp_path, billing_data):
+    db_path = str(tmp_path / "billing.db")
+    import_json_data(billing_data, db_path)
+    return SqliteBillingStore(db_path)
+
+
+def test_queries_match_json_snapshot(store, billing_data):
+    snap = BillingSnapshot.from_data(billing_data)
+
+    assert store.get_customer(1) == snap.get_customer(1)
+    assert store.get_supplies(1) == snap.get_supplies(1)
+    assert store.get_invoices(1, 101) == snap.get_invoices(1, 101)
+    assert store.get_debt_summary(1, 101) == snap.get_debt_summary(1, 101)
+    assert sorted(c["user_id"] for c in store.find_customers_by_dni_suffix("5678Z")) == [1, 2]
+    assert [s["cups_id"] for s in store.find_supplies_by_cups_suffix("ab12cd")] == [101]
+
+
+def test_set_invoice_status_updates_debt(store):
+    assert store.set_invoice_status("F2", "PAID")["status"] == "PAID"
+    debt = store.get_debt_summary(1, 101)
+    assert debt.total_due == 20.25 and [i["invoice_id"] for i in debt.unpaid] == ["F3"]
+    assert store.set_invoice_status("NOPE", "PAID") is None
+
+
+def test_reimport_replaces_dni_suffixes(store, billing_data):
+    changed = {**billing_data, "customers": [{"user_id": 1, "name": "Ana", "account_dni": "11112222K"}]}
+    import_json_data(changed, store.db_path)
+
+    assert [c["user_id"] for c in store.find_customers_by_dni_suffix("5678Z")] == [2]
+    assert [c["user_id"] for c in store.find_customers_by_dni_suffix("2222K")] == [1]
+
+
+def test_streamed_import_in_small_batches(tmp_path, billing_data):
+    text = json.dumps({"meta": {"version": 1}, **billing_data, "notes": "x"}, indent=1)
+    records = list(iter_json_records(io.StringIO(text), chunk_chars=7))
+
+    expected = [(section, r) for section in ("customers", "supplies", "invoices") for r in billing_data[section]]
+    assert records == expected
+
+    db_path = str(tmp_path / "billing.db")
+    counts = import_json_records(iter_json_records(io.StringIO(text), chunk_chars=7), db_path, batch_size=2)
+    assert counts == {"customers": 2, "supplies": 2, "invoices": 3}
+    assert SqliteBillingStore(db_path).get_debt_summary(1, 101).total_due == 50.75
+
+
+@pytest.mark.parametrize("text", ['{"customers": [1, 2', '{"customers": [1 2]}', '[1]'])
+def test_streamed_reader_rejects_invalid_json(text):
+    with pytest.raises(ValueError):
+        list(iter_json_records(io.StringIO(text), chunk_chars=3))
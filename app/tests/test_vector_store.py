@@ -0,0 +1,49 @@
+from qdrant_client import QdrantClient
+
+from scripts.rag_indexer import Chunk, chunks_to_points, ensure_collection
+from src.services import vector_store
+from src.services.vector_store import _points_to_results
+
+
+def test_points_from_indexer_round_trip():
+    client = QdrantClient(":memory:")
+    ensure_collection(client, "test", 4)
+    chunks = [
+        Chunk(text="El pago se domicilia cada mes.", source_file="FAQs.pdf", page=2, chunk_index=0),
+        Chunk(text="La tarifa óptima no tiene permanencia.", source_file="CONDICIONES.pdf", page=5, chunk_index=1),
+    ]
+    client.upsert("test", points=chunks_to_points(chunks, [[1.0, 0.0, 0.0, 0.0], [0.0, 1.0, 0.0, 0.0]]))
+
+    points = client.query_points("test", query=[1.0, 0.1, 0.0, 0.0], limit=2, with_payload=True).points
+    results = _points_to_results(points, "test")
+
+    doc, score = results[0]
+    assert doc.page_content == "El pago se domicilia cada mes."
+    assert doc.metadata["source_file"] == "FAQs.pdf"
+    assert doc.metadata["page"] == 2
+    assert doc.metadata["_id"] == doc.metadata["chunk_id"] == points[0].id
+    assert doc.metadata["_collection_name"] == "test"
+    assert "text" not in doc.metadata
+    assert score > results[1][1]
+    assert results[1][0].page_content == "La tarifa óptima no tiene permanencia."
+
+
+def test_langchain_payload_layout_still_read():
+    from qdrant_client.models import ScoredPoint
+
+    point = ScoredPoint(id=1, version=0, score=0.9, payload={"page_content": "hola", "metadata": {"page": 3}})
+    doc, score = _points_to_results([point], "test")[0]
+    assert (doc.page_content, doc.metadata["page"], score) == ("hola", 3, 0.9)
+
+
+def test_async_client_creates_missing_collection(monkeypatch):
+    client = QdrantClient(":memory:")
+    monkeypatch.setattr(vector_store, "_qdrant_client", client)
+    monkeypatch.setattr(vector_store, "_async_qdrant_client", None)
+    monkeypatch.setattr(vector_store, "_qdrant_client_kwargs", lambda: {"location": ":memory:"})
+    monkeypatch.setattr(vector_store, "get_vector_size", lambda: 4)
+
+    vector_store.get_async_qdrant_client()
+    vector_store.get_async_qdrant_client()
+
+    assert client.collection_exists(vector_store.collection_name)